@@ -1,132 +1,269 @@
-from flask import Flask, render_template, request, jsonify, send_file, Response
+from flask import Flask, render_template, request, jsonify, Response
 from pymongo import MongoClient
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import os
 from dotenv import load_dotenv
 from flask_cors import CORS
 import json
 import csv
-from io import StringIO, BytesIO
+from io import StringIO
 from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from bson import ObjectId
 import math
+import atexit
+import zlib
+import base64
+import threading
+import time
+from ingest_buffer import IngestBuffer
+from indexes import ensure_indexes, index_report
+from memory_store import MemoryDatabase
+from live_stats import LiveStats, strip_id
+from readings_store import bump_readings_version, configure_readings_storage, readings_window_version
+from rollups import Rollups
+from downsample import MODES as DOWNSAMPLE_MODES, downsample
+from report_engine import combine_stats, stream_stats
+from event_stream import ChangeStreamSource, EventBroker
+from http_cache import conditional, make_etag
+from retention import Retention
+from json_provider import DATETIME_FORMATS, NDJSON_MIMETYPE, FastJSONProvider, ndjson_chunks
+from export_formats import (ARROW_FORMATS, EXTENSIONS as EXPORT_EXTENSIONS, FORMATS as EXPORT_FORMATS,
+                            MIMETYPES as EXPORT_MIMETYPES, column_batches, columnar_chunks, require_pyarrow)
+from itertools import chain
+from seed_data import build_devices, seed
 
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
+# orjson-backed JSON; JSON_DATETIME_FORMAT=iso skips the RFC 822 date formatting
+app.json = FastJSONProvider(app)
+app.json.datetime_format = os.getenv('JSON_DATETIME_FORMAT', 'http')
+if app.json.datetime_format not in DATETIME_FORMATS:
+    raise ValueError(f"JSON_DATETIME_FORMAT tidak dikenal: {app.json.datetime_format}")
 CORS(app)
 
 # MongoDB connection
 MONGO_URI = os.getenv('MONGO_URI', 'mongodb://localhost:27017/')
 
-try:
-    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-    # Test connection
-    client.server_info()
-    db = client['iot_monitoring']
-    print("✅ MongoDB terhubung!")
-except Exception as e:
-    print(f"⚠️  MongoDB tidak terhubung: {e}")
-    print("💡 Sistem akan berjalan dengan data in-memory")
+# Maximum number of readings accepted by a single batch request
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', 10000))
+
+REQUIRED_READING_FIELDS = ['device_id', 'sensor_id', 'sensor_type', 'value', 'unit']
+
+# Ingest mode: 'write-through' writes every request straight to MongoDB,
+# 'write-behind' queues readings and flushes them in bulk in the background
+INGEST_MODE = os.getenv('INGEST_MODE', 'write-through')
+INGEST_BATCH_SIZE = int(os.getenv('INGEST_BATCH_SIZE', 500))
+INGEST_FLUSH_INTERVAL = float(os.getenv('INGEST_FLUSH_INTERVAL', 1.0))
+INGEST_QUEUE_SIZE = int(os.getenv('INGEST_QUEUE_SIZE', 50000))
+INGEST_PUT_TIMEOUT = float(os.getenv('INGEST_PUT_TIMEOUT', 0.5))
+INGEST_MAX_RETRIES = int(os.getenv('INGEST_MAX_RETRIES', 5))
+
+# Rows fetched per cursor batch and written per chunk by streaming exports
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', 2000))
+
+# Window used by downsampled series requests that give no start_time
+DOWNSAMPLE_DEFAULT_HOURS = float(os.getenv('DOWNSAMPLE_DEFAULT_HOURS', 24))
+
+# Seconds a cached count_documents result is reused by paginated routes
+COUNT_CACHE_TTL = float(os.getenv('COUNT_CACHE_TTL', 30))
+
+# Seconds between /api/stats resyncs from the database (picks up writes of other processes)
+STATS_RESYNC_INTERVAL = float(os.getenv('STATS_RESYNC_INTERVAL', 60))
+
+# Maintain 1m/1h/1d rollups on ingest and answer the stats endpoints from them
+ROLLUPS_ENABLED = os.getenv('ROLLUPS_ENABLED', '1') == '1'
+
+# Source of /api/stream events: 'local' (readings written by this process) or 'changestream'
+# (MongoDB change stream, also sees other writers; needs a replica set and the documents layout)
+STREAM_SOURCE = os.getenv('STREAM_SOURCE', 'local')
+STREAM_MAX_CLIENTS = int(os.getenv('STREAM_MAX_CLIENTS', 100))
+# Seconds between keep-alive comments on idle streams
+STREAM_HEARTBEAT = float(os.getenv('STREAM_HEARTBEAT', 15))
+# Set by the pre-fork server (run_system.py serve) in every worker
+PREFORK_WORKER = os.getenv('WORKER_ID') is not None
+if PREFORK_WORKER:
+    # Every open stream holds one of the worker's request threads, keep half for other requests
+    STREAM_MAX_CLIENTS = min(STREAM_MAX_CLIENTS, int(os.getenv('WEB_THREADS', 8)) // 2)
+
+# Archive readings older than RETENTION_DAYS days to RETENTION_ARCHIVE_DIR (0 = keep everything)
+RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', 0))
+# After archiving: 'delete' (batched deletes per device and day) or 'ttl' (TTL index expiry)
+RETENTION_MODE = os.getenv('RETENTION_MODE', 'delete')
+RETENTION_ARCHIVE_DIR = os.getenv('RETENTION_ARCHIVE_DIR', 'archive')
+RETENTION_INTERVAL_HOURS = float(os.getenv('RETENTION_INTERVAL_HOURS', 24))
+# Days of archive read before the hot data when a request has no start bound
+ARCHIVE_LOOKBACK_DAYS = int(os.getenv('ARCHIVE_LOOKBACK_DAYS', 7))
+
+# Create the managed index set on startup (idempotent)
+ENSURE_INDEXES = os.getenv('ENSURE_INDEXES', '1') == '1'
+
+# Storage backend: 'mongo' (fallback ke in-memory jika MongoDB tidak terhubung) atau 'memory'
+STORAGE_BACKEND = os.getenv('STORAGE_BACKEND', 'mongo')
+
+# Readings layout: 'documents' (one document per reading), 'buckets' (one document per sensor per hour)
+# or 'timeseries' (MongoDB time-series collection, granularity seconds|minutes|hours)
+READINGS_STORAGE = os.getenv('READINGS_STORAGE', 'documents')
+READINGS_TS_GRANULARITY = os.getenv('READINGS_TS_GRANULARITY', 'minutes')
+
+db = None
+if STORAGE_BACKEND != 'memory':
+    try:
+        client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
+        # Test connection
+        client.server_info()
+        db = client['iot_monitoring']
+        print("✅ MongoDB terhubung!")
+    except Exception as e:
+        print(f"⚠️  MongoDB tidak terhubung: {e}")
+        print("💡 Sistem akan berjalan dengan data in-memory")
+
+if db is None:
     # Fallback ke in-memory storage
-    db = None
+    db = MemoryDatabase('iot_monitoring')
+
+memory_backend = isinstance(db, MemoryDatabase)
+db = configure_readings_storage(db, READINGS_STORAGE, READINGS_TS_GRANULARITY)
+
+if ENSURE_INDEXES:
+    ensure_indexes(db)
+
+# In-memory storage only sees writes from this process, so it never needs a resync
+live_stats = LiveStats(db, 0 if memory_backend else STATS_RESYNC_INTERVAL)
+# Warm the latest-value cache and counters before serving requests
+live_stats.refresh()
+
+rollups = Rollups(db) if ROLLUPS_ENABLED else None
+if rollups:
+    # Readings stored before rollups were on are only covered after `rollups.py rebuild`
+    rollups.ensure_coverage()
+else:
+    # Readings written from now on are missing from the rollups
+    Rollups(db).invalidate()
+
+retention = None
+if RETENTION_DAYS > 0:
+    # In-memory storage has no TTL monitor, archived readings are always deleted
+    retention = Retention(db, RETENTION_DAYS, RETENTION_ARCHIVE_DIR,
+                          'delete' if memory_backend else RETENTION_MODE, RETENTION_INTERVAL_HOURS,
+                          rollups=rollups, lookback_days=ARCHIVE_LOOKBACK_DAYS)
+    if retention.mode == 'ttl':
+        retention.ensure_ttl()
+    # Under the pre-fork server only one worker runs the archive job
+    if os.getenv('BACKGROUND_JOBS', '1') == '1':
+        # Counters and latest values are reloaded after readings left the hot collection
+        retention.start(on_run=lambda summary: live_stats.refresh())
+
+event_broker = EventBroker(max_subscribers=STREAM_MAX_CLIENTS)
+change_stream = None
+if STREAM_SOURCE == 'changestream':
+    if memory_backend or READINGS_STORAGE != 'documents':
+        print("⚠️  STREAM_SOURCE=changestream butuh MongoDB dengan layout documents, memakai sumber local")
+    else:
+        change_stream = ChangeStreamSource(db.sensor_readings, event_broker.publish)
+# With several workers the local broker would miss readings posted to the other workers
+stream_enabled = change_stream is not None or not PREFORK_WORKER or int(os.getenv('WEB_WORKERS', 1)) == 1
+if not stream_enabled and os.getenv('WORKER_ID') == '0':
+    print("⚠️  /api/stream nonaktif: lebih dari satu worker butuh STREAM_SOURCE=changestream")
+
+def on_readings_written(readings):
+    """Update ingest-maintained state after readings were stored"""
+    if readings:
+        bump_readings_version(db, readings)
+    live_stats.record(readings)
+    if rollups:
+        rollups.record(readings)
+    if change_stream is None:
+        event_broker.publish(readings)
+
+def write_readings(readings, retried=False):
+    """Write a batch of readings to storage with one unordered insert_many
+
+    On a retry the _ids are the ones assigned by the first attempt, so a
+    duplicate key error means that attempt already stored the reading.
+    """
+    try:
+        result = db.sensor_readings.insert_many(readings, ordered=False)
+    except BulkWriteError as e:
+        failed = {error['index'] for error in e.details.get('writeErrors', [])
+                  if not (retried and error.get('code') == 11000)}
+        on_readings_written([r for i, r in enumerate(readings) if i not in failed])
+        raise
+    on_readings_written(readings)
+    return result
+
+ingest_buffer = None
+if INGEST_MODE == 'write-behind':
+    ingest_buffer = IngestBuffer(
+        write_readings,
+        batch_size=INGEST_BATCH_SIZE,
+        flush_interval=INGEST_FLUSH_INTERVAL,
+        max_queue=INGEST_QUEUE_SIZE,
+        put_timeout=INGEST_PUT_TIMEOUT,
+        max_retries=INGEST_MAX_RETRIES
+    )
+
+def shutdown():
+    """Flush readings still queued for writing; pre-fork workers call this before exiting"""
+    if ingest_buffer:
+        ingest_buffer.stop()
+
+# Drain queued readings before the process exits
+atexit.register(shutdown)
+
+def bump_registry_version():
+    """Invalidate cached device responses after the registry changed"""
+    db.metadata.update_one(
+        {'_id': 'devices'},
+        {'$inc': {'version': 1}, '$set': {'updated_at': datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+def registry_validators(*parts):
+    """ETag and Last-Modified of the device registry, from its version counter"""
+    meta = db.metadata.find_one({'_id': 'devices'}) or {}
+    return make_etag('devices', meta.get('version', 0), *parts), meta.get('updated_at')
+
+def readings_validators(query):
+    """ETag and Last-Modified of a readings response, from the versions of its window
+
+    Every write bumps the (sensor, day) versions it touches, including older
+    timestamps (backfill), so only responses whose device/sensor and days
+    overlap a write are revalidated. Seeds and retention change all of them.
+    """
+    parts, changed = readings_window_version(db, query)
+    return make_etag(request.full_path, *parts), changed
+
+# Registry version document used by the device route validators
+db.metadata.update_one(
+    {'_id': 'devices'},
+    {'$setOnInsert': {'version': 0, 'updated_at': datetime.now(timezone.utc)}},
+    upsert=True
+)
+
+def queue_full_response():
+    """Backpressure response when the write-behind queue has no room"""
+    response = jsonify({"error": "Ingest queue full, retry later"})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
 
 # Initialize database with sample data
-def init_database():
-    """Initialize database with sample IoT devices and sensor data"""
-    
-    # Clear existing data
-    db.devices.drop()
-    db.sensor_readings.drop()
-    
-    # Sample devices
-    devices = [
-        {
-            "device_id": "dev001",
-            "device_name": "Sensor Udara Ruang Lab",
-            "location": "Ruang Lab",
-            "description": "Sensor pemantauan kualitas udara di ruang laboratorium",
-            "sensors": [
-                {
-                    "sensor_id": "temp001",
-                    "type": "temperature",
-                    "unit": "°C",
-                    "description": "Sensor suhu"
-                },
-                {
-                    "sensor_id": "hum001", 
-                    "type": "humidity",
-                    "unit": "%",
-                    "description": "Sensor kelembapan"
-                },
-                {
-                    "sensor_id": "co2_001",
-                    "type": "co2",
-                    "unit": "ppm",
-                    "description": "Sensor CO2"
-                }
-            ]
-        },
-        {
-            "device_id": "dev002",
-            "device_name": "Sensor Udara Ruang Server",
-            "location": "Ruang Server",
-            "description": "Sensor pemantauan suhu dan kelembapan di ruang server",
-            "sensors": [
-                {
-                    "sensor_id": "temp002",
-                    "type": "temperature",
-                    "unit": "°C",
-                    "description": "Sensor suhu"
-                },
-                {
-                    "sensor_id": "hum002",
-                    "type": "humidity", 
-                    "unit": "%",
-                    "description": "Sensor kelembapan"
-                }
-            ]
-        }
-    ]
+def init_database(reset=True, devices=2, days=1, interval=300):
+    """Seed sample IoT devices and sensor data (see seed_data.py for large backfills)
+
+    With reset=False existing data is kept and only missing readings are added.
+    """
+    summary = seed(db, build_devices(devices), days, interval, reset=reset, rollups=rollups)
+    bump_registry_version()
+    bump_readings_version(db)
     
-    # Insert devices
-    db.devices.insert_many(devices)
-    
-    # Generate sample sensor readings for the last 24 hours
-    now = datetime.now()
-    sensor_readings = []
-    
-    for device in devices:
-        for sensor in device['sensors']:
-            # Generate readings every 5 minutes for the last 24 hours
-            for i in range(288):  # 24 hours * 12 readings per hour
-                timestamp = now - timedelta(minutes=5*i)
-                
-                # Generate realistic sensor values
-                if sensor['type'] == 'temperature':
-                    base_temp = 25 if device['device_id'] == 'dev001' else 22
-                    value = base_temp + (i % 10) * 0.5  # Varying temperature
-                elif sensor['type'] == 'humidity':
-                    base_humidity = 60 if device['device_id'] == 'dev001' else 45
-                    value = base_humidity + (i % 15) * 2  # Varying humidity
-                elif sensor['type'] == 'co2':
-                    base_co2 = 400 + (i % 20) * 10  # Varying CO2 levels
-                    value = base_co2
-                
-                reading = {
-                    "device_id": device['device_id'],
-                    "sensor_id": sensor['sensor_id'],
-                    "sensor_type": sensor['type'],
-                    "timestamp": timestamp,
-                    "value": round(value, 2),
-                    "unit": sensor['unit']
-                }
-                sensor_readings.append(reading)
-    
-    # Insert sensor readings
-    db.sensor_readings.insert_many(sensor_readings)
-    
-    print("Database initialized with sample data!")
+    # Collections were (re)built, reload the ingest-maintained stats
+    live_stats.refresh()
+    
+    print(f"Database initialized with sample data! ({summary['inserted']} readings added)")
 
 # Routes
 @app.route('/')
@@ -137,12 +274,18 @@ def dashboard():
 @app.route('/api/devices')
 def get_devices():
     """Get all devices"""
+    cached = conditional(*registry_validators())
+    if cached:
+        return cached
     devices = list(db.devices.find({}, {'_id': 0}))
     return jsonify(devices)
 
 @app.route('/api/devices/<device_id>')
 def get_device(device_id):
     """Get specific device by ID"""
+    cached = conditional(*registry_validators(device_id))
+    if cached:
+        return cached
     device = db.devices.find_one({"device_id": device_id}, {'_id': 0})
     if device:
         return jsonify(device)
@@ -167,21 +310,127 @@ def get_sensor_readings(sensor_id):
         else:
             query["timestamp"] = {"$lte": datetime.fromisoformat(end_time)}
     
-    readings = list(db.sensor_readings.find(
-        query, 
-        {'_id': 0}
-    ).sort("timestamp", -1).limit(limit))
+    # Validator murah (versi jendela waktu) dicek sebelum query utama
+    cached = conditional(*readings_validators(query))
+    if cached:
+        return cached
+    
+    max_points = request.args.get('max_points', type=int)
+    if max_points is not None:
+        return get_sensor_readings_downsampled(query, max_points, request.args.get('mode', 'lttb'))
     
-    return jsonify(readings)
+    readings = newest_readings(query, limit)
+    if wants_ndjson():
+        return ndjson_response(readings)
+    return jsonify(list(readings))
+
+def newest_readings(query, limit):
+    """Newest readings first, completed from the archive when the hot collection runs out"""
+    found = 0
+    for reading in db.sensor_readings.find(query, {'_id': 0}).sort("timestamp", -1).limit(limit):
+        found += 1
+        yield reading
+    if retention and found < limit:
+        # Rentang sebelum jendela data aktif dilengkapi dari arsip
+        for reading in retention.archived(query, descending=True, limit=limit - found):
+            yield strip_id(reading)
+
+def wants_ndjson():
+    """Whether the client prefers newline-delimited JSON over a JSON array"""
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+def ndjson_response(documents):
+    """Stream documents from a cursor as NDJSON, one per line"""
+    return Response(ndjson_chunks(app.json, documents, EXPORT_BATCH_SIZE), mimetype=NDJSON_MIMETYPE)
+
+def get_sensor_readings_downsampled(query, max_points, mode):
+    """Whole window reduced to at most max_points points, newest first like the raw series"""
+    if max_points < 3:
+        return jsonify({"error": "max_points must be at least 3"}), 400
+    if mode not in DOWNSAMPLE_MODES:
+        return jsonify({"error": f"mode must be one of: {', '.join(DOWNSAMPLE_MODES)}"}), 400
+    bounds = query.setdefault("timestamp", {})
+    if "$gte" not in bounds:
+        bounds["$gte"] = bounds.get("$lte", datetime.now()) - timedelta(hours=DOWNSAMPLE_DEFAULT_HOURS)
+    cursor = db.sensor_readings.find(
+        query,
+        {'_id': 0, 'timestamp': 1, 'value': 1}
+    ).sort("timestamp", ASCENDING).batch_size(EXPORT_BATCH_SIZE)
+    if retention:
+        cursor = chain(retention.archived(query), cursor)
+    points = downsample(cursor, max_points, mode)
+    points.reverse()
+    return jsonify(points)
+
+count_cache = {}
+count_cache_lock = threading.Lock()
+
+def cached_count(query):
+    """count_documents result reused for COUNT_CACHE_TTL seconds"""
+    key = repr(query)
+    now = time.monotonic()
+    with count_cache_lock:
+        cached = count_cache.get(key)
+    if cached and now - cached[1] < COUNT_CACHE_TTL:
+        return cached[0]
+    total = db.sensor_readings.count_documents(query)
+    with count_cache_lock:
+        if len(count_cache) > 1000:
+            count_cache.clear()
+        count_cache[key] = (total, now)
+    return total
+
+def count_readings(query, mode):
+    """Total for a paginated query: 'exact', 'cached' or 'none'"""
+    if mode == 'exact':
+        return db.sensor_readings.count_documents(query)
+    if mode == 'cached':
+        return cached_count(query)
+    return None
+
+def encode_cursor(reading):
+    """Opaque pagination token holding the (timestamp, _id) of a reading"""
+    _id = reading['_id']
+    payload = {
+        "t": reading['timestamp'].isoformat(),
+        "id": str(_id),
+        "oid": isinstance(_id, ObjectId)
+    }
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+def decode_cursor(token):
+    """Inverse of encode_cursor; raises ValueError for a malformed token"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')))
+        timestamp = datetime.fromisoformat(payload['t'])
+        _id = ObjectId(payload['id']) if payload.get('oid') else payload['id']
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return timestamp, _id
+
+def keyset_query(query, timestamp, _id, older):
+    """Restrict query to readings strictly after (timestamp, _id) in sort order"""
+    query = dict(query)
+    bounds = dict(query.get("timestamp", {}))
+    # Batas timestamp dipakai sebagai range index, $or hanya memilah timestamp yang sama
+    if older:
+        bounds["$lte"] = min(bounds.get("$lte", timestamp), timestamp)
+        query["$or"] = [{"timestamp": {"$lt": timestamp}}, {"_id": {"$lt": _id}}]
+    else:
+        bounds["$gte"] = max(bounds.get("$gte", timestamp), timestamp)
+        query["$or"] = [{"timestamp": {"$gt": timestamp}}, {"_id": {"$gt": _id}}]
+    query["timestamp"] = bounds
+    return query
 
 @app.route('/api/devices/<device_id>/readings')
 def get_device_readings(device_id):
-    """Get all sensor readings for a device, with pagination support"""
+    """Get all sensor readings for a device, with page or cursor pagination"""
     start_time = request.args.get('start_time')
     end_time = request.args.get('end_time')
     limit = int(request.args.get('limit', 100))
     page = int(request.args.get('page', 1))
     per_page = int(request.args.get('per_page', 10))
+    cursor = request.args.get('cursor')
     
     query = {"device_id": device_id}
     
@@ -193,13 +442,20 @@ def get_device_readings(device_id):
         else:
             query["timestamp"] = {"$lte": datetime.fromisoformat(end_time)}
     
+    cached = conditional(*readings_validators(query))
+    if cached:
+        return cached
+    
+    if cursor is not None:
+        return get_device_readings_keyset(query, cursor, per_page)
+    
     skip = (page - 1) * per_page
     readings_cursor = db.sensor_readings.find(
         query, 
         {'_id': 0}
     ).sort("timestamp", -1).skip(skip).limit(per_page)
     readings = list(readings_cursor)
-    total = db.sensor_readings.count_documents(query)
+    total = count_readings(query, request.args.get('count', 'exact')) or 0
     
     return jsonify({
         "data": readings,
@@ -209,41 +465,180 @@ def get_device_readings(device_id):
         "total_pages": (total + per_page - 1) // per_page
     })
 
+def get_device_readings_keyset(query, cursor, per_page):
+    """Cursor mode: seek to (timestamp, _id) through the index instead of skip()"""
+    direction = request.args.get('direction', 'next')
+    older = direction != 'prev'
+    page_query = query
+    if cursor:
+        try:
+            timestamp, _id = decode_cursor(cursor)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        page_query = keyset_query(query, timestamp, _id, older)
+    
+    order = -1 if older else 1
+    readings = list(db.sensor_readings.find(page_query).sort(
+        [("timestamp", order), ("_id", order)]
+    ).limit(per_page + 1))
+    has_more = len(readings) > per_page
+    readings = readings[:per_page]
+    if not older:
+        readings.reverse()
+    
+    has_next = has_more if older else bool(readings)
+    has_prev = bool(cursor) and bool(readings) if older else has_more
+    next_cursor = encode_cursor(readings[-1]) if readings and has_next else None
+    prev_cursor = encode_cursor(readings[0]) if readings and has_prev else None
+    for r in readings:
+        del r['_id']
+    
+    return jsonify({
+        "data": readings,
+        "per_page": per_page,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+        "total": count_readings(query, request.args.get('count', 'cached'))
+    })
+
 @app.route('/api/sensors/<sensor_id>/latest')
 def get_latest_reading(sensor_id):
-    reading = db.sensor_readings.find(
-        {"sensor_id": sensor_id},
-        {'_id': 0}
-    ).sort("timestamp", -1).limit(1)
-    reading = list(reading)
+    """Get latest reading of a sensor from the latest-value cache"""
+    reading = live_stats.latest(sensor_id)
     if reading:
-        return jsonify(reading[0])
+        return jsonify(reading)
     return jsonify({"error": "No readings found"}), 404
 
-@app.route('/api/readings', methods=['POST'])
-def add_reading():
-    """Add new sensor reading"""
-    data = request.json
+@app.route('/api/latest')
+def get_all_latest_readings():
+    """Get the latest reading of every sensor, optionally of one device"""
+    device_id = request.args.get('device_id')
+    return jsonify(live_stats.latest(device_id=device_id))
+
+def build_reading(data):
+    """Validate an incoming reading payload and build the document to store.
+
+    Returns a ``(reading, error)`` tuple where exactly one of the two is set.
+    """
+    if not isinstance(data, dict):
+        return None, "Reading must be a JSON object"
     
-    required_fields = ['device_id', 'sensor_id', 'sensor_type', 'value', 'unit']
-    for field in required_fields:
+    for field in REQUIRED_READING_FIELDS:
         if field not in data:
-            return jsonify({"error": f"Missing required field: {field}"}), 400
+            return None, f"Missing required field: {field}"
+    
+    try:
+        value = float(data['value'])
+    except (TypeError, ValueError):
+        return None, "Field 'value' must be a number"
+    # NaN/Infinity (accepted by the JSON parser and float()) would poison stats and rollups
+    if not math.isfinite(value):
+        return None, "Field 'value' must be a finite number"
+    
+    # Optional device/replay timestamp, stored as naive local time like server-side timestamps
+    timestamp = datetime.now()
+    if data.get('timestamp') is not None:
+        try:
+            timestamp = datetime.fromisoformat(data['timestamp'])
+        except (TypeError, ValueError):
+            return None, "Field 'timestamp' must be an ISO 8601 date"
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone().replace(tzinfo=None)
     
     reading = {
         "device_id": data['device_id'],
         "sensor_id": data['sensor_id'],
         "sensor_type": data['sensor_type'],
-        "timestamp": datetime.now(),
-        "value": float(data['value']),
+        "timestamp": timestamp,
+        "value": value,
         "unit": data['unit']
     }
+    return reading, None
+
+@app.route('/api/readings', methods=['POST'])
+def add_reading():
+    """Add new sensor reading"""
+    reading, error = build_reading(request.json)
+    if error:
+        return jsonify({"error": error}), 400
+    
+    if ingest_buffer:
+        reading['_id'] = ObjectId()
+        if not ingest_buffer.put([reading]):
+            return queue_full_response()
+        return jsonify(dict(reading, _id=str(reading['_id']))), 202
     
     result = db.sensor_readings.insert_one(reading)
+    on_readings_written([reading])
     reading['_id'] = str(result.inserted_id)
     
     return jsonify(reading), 201
 
+@app.route('/api/readings/batch', methods=['POST'])
+def add_readings_batch():
+    """Add many sensor readings with a single unordered insert_many"""
+    data = request.json
+    items = data.get('readings') if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return jsonify({"error": "Request body must be an array of readings"}), 400
+    if not items:
+        return jsonify({"error": "Empty batch, send at least one reading"}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({"error": f"Batch too large, maximum is {MAX_BATCH_SIZE} readings"}), 413
+    
+    readings = []
+    positions = []  # original index of every valid reading
+    errors = []
+    for index, item in enumerate(items):
+        reading, error = build_reading(item)
+        if error:
+            errors.append({"index": index, "error": error})
+        else:
+            readings.append(reading)
+            positions.append(index)
+    
+    if ingest_buffer and readings:
+        try:
+            queued = ingest_buffer.put(readings)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 413
+        if not queued:
+            return queue_full_response()
+        return jsonify({
+            "received": len(items),
+            "queued": len(readings),
+            "failed": len(errors),
+            "errors": errors
+        }), 202
+    
+    inserted = 0
+    if readings:
+        try:
+            result = write_readings(readings)
+            inserted = len(result.inserted_ids)
+        except BulkWriteError as e:
+            inserted = e.details.get('nInserted', 0)
+            for write_error in e.details.get('writeErrors', []):
+                errors.append({
+                    "index": positions[write_error['index']],
+                    "error": write_error.get('errmsg', 'Write error')
+                })
+    
+    errors.sort(key=lambda e: e['index'])
+    if inserted == 0:
+        status = 400
+    elif errors:
+        status = 207
+    else:
+        status = 201
+    
+    return jsonify({
+        "received": len(items),
+        "inserted": inserted,
+        "failed": len(items) - inserted,
+        "errors": errors
+    }), status
+
 @app.route('/api/devices', methods=['POST'])
 def add_device():
     """Add new device"""
@@ -265,45 +660,146 @@ def add_device():
         "sensors": data.get('sensors', [])
     }
     
-    result = db.devices.insert_one(device)
+    try:
+        result = db.devices.insert_one(device)
+    except DuplicateKeyError:
+        # Unique index on device_id catches concurrent inserts of the same ID
+        return jsonify({"error": "Device ID already exists"}), 409
     device['_id'] = str(result.inserted_id)
     
+    bump_registry_version()
+    event_broker.notify('devices')
     return jsonify(device), 201
 
 @app.route('/api/stats')
 def get_stats():
-    """Get system statistics"""
-    total_devices = db.devices.count_documents({})
-    total_readings = db.sensor_readings.count_documents({})
-    
-    # Get latest readings for each sensor type
-    latest_readings = {}
-    sensor_types = db.sensor_readings.distinct("sensor_type")
-    
-    for sensor_type in sensor_types:
-        latest = db.sensor_readings.find(
-            {"sensor_type": sensor_type}, 
-            {'_id': 0}
-        ).sort("timestamp", -1).limit(1)
-        latest = list(latest)
-        if latest:
-            latest = latest[0]
-        else:
-            latest = None
-        if latest:
-            latest_readings[sensor_type] = latest
-    
-    stats = {
-        "total_devices": total_devices,
-        "total_readings": total_readings,
-        "latest_readings": latest_readings
-    }
+    """Get system statistics from counters maintained on ingest"""
+    stats = live_stats.snapshot()
+    stats["total_devices"] = db.devices.estimated_document_count()
     
     return jsonify(stats)
 
+def sse_event(event, data):
+    """One Server-Sent Events message"""
+    return f"event: {event}\ndata: {app.json.dumps(data)}\n\n"
+
+def readings_events(readings):
+    """New readings, newest reading per sensor and the counter delta of one ingest batch"""
+    readings = [strip_id(r) for r in readings]
+    latest = {}
+    for reading in readings:
+        current = latest.get(reading['sensor_id'])
+        if current is None or reading['timestamp'] >= current['timestamp']:
+            latest[reading['sensor_id']] = reading
+    yield sse_event('readings', readings)
+    yield sse_event('latest', latest)
+    yield sse_event('stats', {'total_readings_delta': len(readings)})
+
+@app.route('/api/stream')
+def stream_events():
+    """Push new readings, latest values and stat deltas as they are ingested"""
+    if not stream_enabled:
+        return jsonify({"error": "Streaming with several workers needs STREAM_SOURCE=changestream"}), 503
+    device_ids = [d for d in request.args.get('device_id', '').split(',') if d]
+    sensor_ids = [s for s in request.args.get('sensor_id', '').split(',') if s]
+    subscription = event_broker.subscribe(device_ids, sensor_ids)
+    if subscription is None:
+        response = jsonify({"error": "Too many stream clients, retry later"})
+        response.status_code = 503
+        response.headers['Retry-After'] = '5'
+        return response
+    if change_stream:
+        change_stream.start()
+
+    def generate():
+        yield 'retry: 5000\n\n'
+        while True:
+            item = subscription.get(STREAM_HEARTBEAT)
+            if subscription.lagged:
+                # Event terlewat karena client lambat: minta client memuat ulang via REST
+                subscription.lagged = False
+                yield sse_event('resync', {})
+            if item is None:
+                yield ': keepalive\n\n'
+                continue
+            event, payload = item
+            if event == 'readings':
+                yield from readings_events(payload)
+            else:
+                yield sse_event(event, payload or {})
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Nonaktifkan buffering reverse proxy (nginx) agar event langsung terkirim
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(lambda: event_broker.unsubscribe(subscription))
+    return response
+
+@app.route('/api/admin/indexes')
+def get_index_report():
+    """Report managed indexes and whether each route query is served by one"""
+    return jsonify(index_report(db))
+
+def csv_chunks(header, rows):
+    """Yield CSV text in chunks of EXPORT_BATCH_SIZE rows"""
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for count, row in enumerate(rows, 1):
+        writer.writerow(row)
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+    yield buffer.getvalue()
+
+def gzip_chunks(chunks):
+    """Gzip-compress a stream of text chunks on the fly"""
+    # wbits=31 menghasilkan format gzip (header + trailer)
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+def csv_response(chunks, filename):
+    """Stream CSV chunks, gzip-compressed when the request asks for compress=gzip"""
+    headers = {"Content-Disposition": f"attachment;filename={filename}"}
+    if request.args.get('compress') != 'gzip':
+        return Response(chunks, mimetype="text/csv", headers=headers)
+    
+    if 'gzip' in request.accept_encodings:
+        # Client mendekompresi sendiri, file tetap tersimpan sebagai .csv
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+        return Response(gzip_chunks(chunks), mimetype="text/csv", headers=headers)
+    headers["Content-Disposition"] = f"attachment;filename={filename}.gz"
+    return Response(gzip_chunks(chunks), mimetype="application/gzip", headers=headers)
+
+def columnar_response(fmt, documents, fields, name):
+    """Stream documents as Parquet, Arrow IPC or .npz built from cursor batches"""
+    if fmt in ARROW_FORMATS:
+        try:
+            require_pyarrow()
+        except ImportError as e:
+            return jsonify({"error": str(e)}), 501
+    batches = column_batches(documents, fields, EXPORT_BATCH_SIZE)
+    headers = {"Content-Disposition": f"attachment;filename={name}.{EXPORT_EXTENSIONS[fmt]}"}
+    return Response(columnar_chunks(fmt, batches, fields), mimetype=EXPORT_MIMETYPES[fmt], headers=headers)
+
+def invalid_export_format(fmt):
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+    return None
+
 @app.route('/api/devices/<device_id>/readings/export')
 def export_device_readings_csv(device_id):
-    """Export all sensor readings for a device as CSV"""
+    """Export all sensor readings for a device as a streamed CSV, Parquet, Arrow or .npz file"""
+    fmt = request.args.get('format', 'csv')
+    error = invalid_export_format(fmt)
+    if error:
+        return error
     start_time = request.args.get('start_time')
     end_time = request.args.get('end_time')
     query = {"device_id": device_id}
@@ -314,52 +810,87 @@ def export_device_readings_csv(device_id):
             query["timestamp"]["$lte"] = datetime.fromisoformat(end_time)
         else:
             query["timestamp"] = {"$lte": datetime.fromisoformat(end_time)}
-    readings = list(db.sensor_readings.find(query, {'_id': 0}).sort("timestamp", -1))
-    # Prepare CSV
-    si = StringIO()
-    writer = csv.DictWriter(si, fieldnames=["device_id", "sensor_id", "sensor_type", "timestamp", "value", "unit"])
-    writer.writeheader()
-    for r in readings:
-        # Convert timestamp to ISO string if needed
-        if isinstance(r["timestamp"], (str, bytes)):
-            pass
-        else:
-            r["timestamp"] = r["timestamp"].isoformat()
-        writer.writerow(r)
-    output = si.getvalue()
-    si.close()
-    return Response(
-        output,
-        mimetype="text/csv",
-        headers={
-            "Content-Disposition": f"attachment;filename=readings_{device_id}.csv"
-        }
-    )
+    fields = ["device_id", "sensor_id", "sensor_type", "timestamp", "value", "unit"]
+    cursor = db.sensor_readings.find(
+        query,
+        dict({'_id': 0}, **{field: 1 for field in fields})
+    ).sort("timestamp", -1).batch_size(EXPORT_BATCH_SIZE)
+    if retention:
+        cursor = chain(cursor, retention.archived(query, descending=True))
+    if fmt != 'csv':
+        return columnar_response(fmt, cursor, fields, f"readings_{device_id}")
+    
+    def rows():
+        for r in cursor:
+            timestamp = r.get("timestamp")
+            # Convert timestamp to ISO string if needed
+            if not isinstance(timestamp, (str, bytes)):
+                timestamp = timestamp.isoformat()
+            yield [r.get("device_id"), r.get("sensor_id"), r.get("sensor_type"),
+                   timestamp, r.get("value"), r.get("unit")]
+    
+    return csv_response(csv_chunks(fields, rows()), f"readings_{device_id}.csv")
 
 @app.route('/api/devices/<device_id>/readings/range')
 def get_readings_in_range(device_id):
-    start = request.args.get('start')
-    end = request.args.get('end')
+    try:
+        start, end = parse_time_range(request.args.get('start'), request.args.get('end'))
+    except ValueError:
+        return jsonify({"error": "start and end must be ISO 8601 dates"}), 400
     query = {'device_id': device_id}
-    if start and end:
-        query['timestamp'] = {'$gte': start, '$lte': end}
-    readings = list(db.sensor_readings.find(query))
-    for r in readings:
-        r['_id'] = str(r['_id'])
-    return jsonify(readings)
+    if start:
+        query['timestamp'] = {'$gte': start, '$lt': end}
+    cached = conditional(*readings_validators(query))
+    if cached:
+        return cached
+    # ObjectId ditulis sebagai string oleh JSON provider
+    readings = db.sensor_readings.find(query).batch_size(EXPORT_BATCH_SIZE)
+    if retention:
+        readings = chain(retention.archived(query), readings)
+    if wants_ndjson():
+        return ndjson_response(readings)
+    return jsonify(list(readings))
 
-@app.route('/api/devices/<device_id>/sensors/<sensor_id>/stats')
-def get_sensor_stats(device_id, sensor_id):
-    start = request.args.get('start')
-    end = request.args.get('end')
-    match = {
-        'device_id': device_id,
-        'sensor_id': sensor_id
-    }
-    if start and end:
-        match['timestamp'] = {'$gte': start, '$lte': end}
+def parse_time_range(start, end):
+    """Parse ISO 8601 start/end query parameters into a half-open [start, end) window.
+
+    A date-only end (YYYY-MM-DD) covers that whole day. Returns (None, None)
+    unless both bounds are given; raises ValueError on malformed values.
+    """
+    if not (start and end):
+        return None, None
+    start_time = datetime.fromisoformat(start)
+    end_time = datetime.fromisoformat(end)
+    if len(end) == 10:
+        end_time += timedelta(days=1)
+    else:
+        # end is inclusive in the API
+        end_time += timedelta(microseconds=1)
+    # Stored timestamps are naive, compare in the same form
+    return start_time.replace(tzinfo=None), end_time.replace(tzinfo=None)
+
+def archived_window(query):
+    """Archived readings of a stats window; aggregates read the archive only for an explicit start"""
+    if not retention or 'timestamp' not in query:
+        return iter(())
+    return retention.archived(query)
+
+def sensor_window_stats(device_id, sensor_id, start=None, end=None):
+    """avg/min/max/stddev/count of one sensor in [start, end), None without readings
+
+    Rollups answer only windows they fully cover, otherwise the raw readings are grouped.
+    Readings archived before the hot data are added when the window starts earlier.
+    """
+    query = {'device_id': device_id, 'sensor_id': sensor_id}
+    if start:
+        query['timestamp'] = {'$gte': start, '$lt': end}
+    archived = stream_stats(archived_window(query))
+    if rollups and rollups.covers(start):
+        # Wide windows are answered from rollups, raw readings only at the edges
+        stats = rollups.sensor_stats(device_id, sensor_id, start, end)
+        return combine_stats(stats, archived) if archived['count'] else stats
     pipeline = [
-        {'$match': match},
+        {'$match': query},
         {'$group': {
             '_id': None,
             'avg': {'$avg': '$value'},
@@ -370,83 +901,126 @@ def get_sensor_stats(device_id, sensor_id):
         }}
     ]
     result = list(db.sensor_readings.aggregate(pipeline))
-    return jsonify(result[0] if result else {})
+    if result:
+        result[0].pop('_id', None)
+    if archived['count']:
+        return combine_stats(result[0] if result else None, archived)
+    return result[0] if result else None
+
+@app.route('/api/devices/<device_id>/sensors/<sensor_id>/stats')
+def get_sensor_stats(device_id, sensor_id):
+    try:
+        start, end = parse_time_range(request.args.get('start'), request.args.get('end'))
+    except ValueError:
+        return jsonify({"error": "start and end must be ISO 8601 dates"}), 400
+    query = {'device_id': device_id, 'sensor_id': sensor_id}
+    if start:
+        query['timestamp'] = {'$gte': start, '$lt': end}
+    cached = conditional(*readings_validators(query))
+    if cached:
+        return cached
+    stats = sensor_window_stats(device_id, sensor_id, start, end)
+    return jsonify(dict(stats, _id=None) if stats else {})
 
 @app.route('/api/alerts/threshold')
 def get_devices_exceeding_threshold():
     sensor_type = request.args.get('type')
     threshold = float(request.args.get('threshold'))
-    start = request.args.get('start')
-    end = request.args.get('end')
+    try:
+        start, end = parse_time_range(request.args.get('start'), request.args.get('end'))
+    except ValueError:
+        return jsonify({"error": "start and end must be ISO 8601 dates"}), 400
     match = {'sensor_type': sensor_type, 'value': {'$gt': threshold}}
-    if start and end:
-        match['timestamp'] = {'$gte': start, '$lte': end}
-    pipeline = [
-        {'$match': match},
-        {'$group': {'_id': '$device_id', 'max_value': {'$max': '$value'}}}
-    ]
-    result = list(db.sensor_readings.aggregate(pipeline))
-    return jsonify(result)
+    if start:
+        match['timestamp'] = {'$gte': start, '$lt': end}
+    if rollups and rollups.covers(start):
+        result = rollups.max_by_device(sensor_type, threshold, start, end)
+    else:
+        pipeline = [
+            {'$match': match},
+            {'$group': {'_id': '$device_id', 'max_value': {'$max': '$value'}}}
+        ]
+        result = list(db.sensor_readings.aggregate(pipeline))
+    maxima = {row['_id']: row['max_value'] for row in result}
+    for reading in archived_window(match):
+        # Archive partitions hold every sensor type; type and threshold are filtered here
+        if reading['sensor_type'] == sensor_type and reading['value'] > maxima.get(reading['device_id'], threshold):
+            maxima[reading['device_id']] = reading['value']
+    return jsonify([{'_id': device, 'max_value': value} for device, value in maxima.items()])
 
 @app.route('/api/report')
 def api_report():
     device_id = request.args.get('device_id')
     sensor_id = request.args.get('sensor_id')
-    start = request.args.get('start')
-    end = request.args.get('end')
     threshold = request.args.get('threshold', type=float)
-    # Query readings
+    try:
+        start, end = parse_time_range(request.args.get('start'), request.args.get('end'))
+    except ValueError:
+        return jsonify({"error": "start and end must be ISO 8601 dates"}), 400
     query = {'device_id': device_id, 'sensor_id': sensor_id}
-    if start and end:
-        query['timestamp'] = {'$gte': start, '$lte': end}
-    readings = list(db.sensor_readings.find(query)) # Changed db.readings to db.sensor_readings
-    # Stats
-    values = [r['value'] for r in readings]
-    stats = {
-        'avg': sum(values)/len(values) if values else None,
-        'min': min(values) if values else None,
-        'max': max(values) if values else None,
-        'stddev': (sum((v - (sum(values)/len(values)))**2 for v in values)/len(values))**0.5 if values else None,
-        'count': len(values)
-    }
+    if start:
+        query['timestamp'] = {'$gte': start, '$lt': end}
+    if rollups and rollups.covers(start):
+        # Same rollup path as the stats endpoint, plus readings archived before the hot data
+        stats = combine_stats(rollups.sensor_stats(device_id, sensor_id, start, end),
+                              stream_stats(archived_window(query)))
+    else:
+        # One pass over a value-only cursor, constant memory whatever the window size
+        cursor = db.sensor_readings.find(query, {'_id': 0, 'value': 1}).batch_size(EXPORT_BATCH_SIZE)
+        stats = stream_stats(chain(archived_window(query), cursor))
     # Exceed threshold
     exceed = []
-    if threshold is not None:
-        max_value = max(values) if values else None
-        if max_value and max_value > threshold:
-            exceed.append({'device_id': device_id, 'max_value': max_value})
-    # Format readings
-    for r in readings:
-        r['_id'] = str(r['_id'])
-    return jsonify({'stats': stats, 'exceed': exceed, 'readings': readings})
+    if threshold is not None and stats['max'] is not None and stats['max'] > threshold:
+        exceed.append({'device_id': device_id, 'max_value': stats['max']})
+    report = {'stats': stats, 'exceed': exceed}
+    # Raw readings are opt-in and paged, newest first
+    if request.args.get('include_readings') in ('1', 'true'):
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('per_page', 100, type=int), 1), 1000)
+        readings = db.sensor_readings.find(query).sort(
+            [('timestamp', -1), ('_id', -1)]
+        ).skip((page - 1) * per_page).limit(per_page)
+        if wants_ndjson():
+            # Baris pertama berisi ringkasan laporan, lalu satu pembacaan per baris
+            summary = dict(report, page=page, per_page=per_page,
+                           total_pages=math.ceil(stats['count'] / per_page))
+            return ndjson_response(chain([summary], readings))
+        report['readings'] = list(readings)
+        report['page'] = page
+        report['per_page'] = per_page
+        report['total_pages'] = math.ceil(stats['count'] / per_page)
+    return jsonify(report)
 
 @app.route('/api/report/download')
 def api_report_download():
+    fmt = request.args.get('format', 'csv')
+    error = invalid_export_format(fmt)
+    if error:
+        return error
     device_id = request.args.get('device_id')
     sensor_id = request.args.get('sensor_id')
-    start = request.args.get('start')
-    end = request.args.get('end')
-    threshold = request.args.get('threshold', type=float)
+    try:
+        start, end = parse_time_range(request.args.get('start'), request.args.get('end'))
+    except ValueError:
+        return jsonify({"error": "start and end must be ISO 8601 dates"}), 400
     query = {'device_id': device_id, 'sensor_id': sensor_id}
-    if start and end:
-        query['timestamp'] = {'$gte': start, '$lte': end}
-    readings = list(db.sensor_readings.find(query))
-    # CSV
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['timestamp', 'value'])
-    for r in readings:
-        writer.writerow([r['timestamp'], r['value']])
-    # ENCODE ke BytesIO sebelum dikirim
-    mem = BytesIO()
-    mem.write(output.getvalue().encode('utf-8'))
-    mem.seek(0)
-    output.close()
-    return send_file(mem, mimetype='text/csv', as_attachment=True, download_name='laporan.csv')
+    if start:
+        query['timestamp'] = {'$gte': start, '$lt': end}
+    cursor = db.sensor_readings.find(
+        query,
+        {'_id': 0, 'timestamp': 1, 'value': 1}
+    ).batch_size(EXPORT_BATCH_SIZE)
+    if fmt != 'csv':
+        return columnar_response(fmt, cursor, ['timestamp', 'value'], 'laporan')
+    # CSV di-stream per chunk, tanpa menampung seluruh data di memori
+    rows = ([r['timestamp'], r['value']] for r in cursor)
+    return csv_response(csv_chunks(['timestamp', 'value'], rows), 'laporan.csv')
 
 if __name__ == '__main__':
-    # Initialize database with sample data
-    init_database()
+    # Seed sample data only into an empty database, or when SEED=1 / SEED_RESET=1 asks for it
+    seed_reset = os.getenv('SEED_RESET', '0') == '1'
+    if seed_reset or os.getenv('SEED', '0') == '1' or db.sensor_readings.find_one({}, {'_id': 1}) is None:
+        init_database(reset=seed_reset)
     
     # Run the application
     app.run(debug=True, host='0.0.0.0', port=5000) 
\ No newline at end of file
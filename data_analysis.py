@@ -4,37 +4,92 @@ Analisis Data Sensor IoT - Sistem Pemantauan Lingkungan
 Menganalisis data sensor dan generate laporan statistik
 """
 
+import argparse
+import os
 import requests
 import pandas as pd
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import matplotlib.pyplot as plt
 import seaborn as sns
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import json
+import bson
+from dotenv import load_dotenv
+from pymongo.collection import Collection
 
-class SensorDataAnalyzer:
-    def __init__(self, api_base_url: str = "http://localhost:5000/api"):
+# Batas pembacaan per sensor pada endpoint /sensors/{id}/readings
+API_READINGS_LIMIT = 1000
+MONGO_BATCH_SIZE = 10000
+FRAME_COLUMNS = ['device_id', 'sensor_id', 'sensor_type', 'timestamp', 'unit', 'value']
+# Tipe elemen BSON berukuran tetap: kode tipe -> dtype NumPy (date = int64 milidetik UTC)
+BSON_FIXED_TYPES = {0x01: '<f8', 0x09: '<i8', 0x10: '<i4', 0x12: '<i8'}
+
+
+def raw_batch_columns(batch: bytes) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """(timestamps, values) of a raw BSON batch of ``{timestamp, value}`` documents.
+
+    When every document has the layout of the first one (same field order and
+    fixed-width types) the batch is read through one NumPy structured view
+    instead of one dict per row. Returns None otherwise; the caller then
+    decodes the batch with bson.
+    """
+    if len(batch) < 5:
+        return None
+    size = int.from_bytes(batch[:4], 'little')
+    fields, offset = [('size', '<i4')], 4
+    while offset < size - 1:
+        kind = batch[offset]
+        end = batch.index(b'\0', offset + 1)
+        name = batch[offset + 1:end].decode()
+        if kind not in BSON_FIXED_TYPES or name not in ('timestamp', 'value'):
+            return None
+        fields += [(f'kind_{name}', 'u1'), (f'name_{name}', f'S{end - offset}'), (name, BSON_FIXED_TYPES[kind])]
+        offset = end + 1 + np.dtype(BSON_FIXED_TYPES[kind]).itemsize
+    fields.append(('terminator', 'u1'))
+    dtype = np.dtype(fields)
+    if dtype.itemsize != size or len(batch) % size or {'timestamp', 'value'} - set(dtype.names):
+        return None
+    rows = np.frombuffer(batch, dtype=dtype)
+    # Semua dokumen harus berbagi header yang sama (tipe dan nama field)
+    if any((rows[name] != rows[name][0]).any() for name in dtype.names if name not in ('timestamp', 'value')):
+        return None
+    if rows['kind_timestamp'][0] != 0x09:
+        return None
+    return rows['timestamp'].astype('datetime64[ms]').astype('datetime64[us]'), rows['value'].astype(np.float64)
+
+
+class ApiLoader:
+    """Readings through the HTTP API, one request per sensor, capped at ``limit`` readings each"""
+    
+    name = "api"
+    
+    def __init__(self, api_base_url: str = "http://localhost:5000/api", limit: int = API_READINGS_LIMIT):
         self.api_base_url = api_base_url
-        
-    def get_sensor_data(self, sensor_id: str, hours: int = 24) -> pd.DataFrame:
-        """Mengambil data sensor dari API dan convert ke DataFrame"""
+        self.limit = limit
+    
+    def devices(self) -> List[Dict]:
+        response = requests.get(f"{self.api_base_url}/devices")
+        response.raise_for_status()
+        return response.json()
+    
+    def load(self, sensor: Dict, start_time: datetime, end_time: datetime) -> pd.DataFrame:
+        sensor_id = sensor['sensor_id']
         try:
-            # Hitung waktu mulai dan selesai
-            end_time = datetime.now()
-            start_time = end_time - timedelta(hours=hours)
-            
-            # Ambil data dari API
             params = {
                 'start_time': start_time.isoformat(),
                 'end_time': end_time.isoformat(),
-                'limit': 1000
+                'limit': self.limit
             }
-            
             response = requests.get(f"{self.api_base_url}/sensors/{sensor_id}/readings", params=params)
             
             if response.status_code == 200:
                 data = response.json()
+                if len(data) >= self.limit:
+                    # API hanya mengembalikan pembacaan terbaru sampai limit
+                    print(f"⚠️  Data sensor {sensor_id} terpotong: hanya {len(data)} pembacaan terbaru dalam "
+                          f"jendela waktu. Gunakan --source mongo untuk data lengkap.")
                 
                 # Convert ke DataFrame
                 df = pd.DataFrame(data)
@@ -52,33 +107,151 @@ class SensorDataAnalyzer:
             print(f"❌ Error: {e}")
             return pd.DataFrame()
     
+    def load_all(self, sensors: List[Dict], start_time: datetime, end_time: datetime) -> Dict[str, pd.DataFrame]:
+        return {sensor['sensor_id']: self.load(sensor, start_time, end_time) for sensor in sensors}
+
+
+class MongoLoader:
+    """Readings straight from MongoDB, without the API's per-sensor limit.
+
+    Each sensor is read with a projected, batched cursor over the
+    (sensor_id, timestamp) index; sensors are read concurrently on a thread
+    pool. On a plain collection the cursor returns raw BSON batches that are
+    turned into NumPy columns without a dict per row (``raw_batch_columns``);
+    other storage layouts go through their documents. Windows older than the
+    retention cutoff are completed from the archive.
+    """
+    
+    name = "mongo"
+    
+    def __init__(self, db, workers: int = 8, batch_size: int = MONGO_BATCH_SIZE, retention=None):
+        self.db = db
+        self.workers = workers
+        self.batch_size = batch_size
+        self.retention = retention
+    
+    @classmethod
+    def from_env(cls, workers: int = 8) -> "MongoLoader":
+        from pymongo import MongoClient
+        from readings_store import configure_readings_storage
+        from retention import Retention
+        
+        client = MongoClient(os.getenv('MONGO_URI', 'mongodb://localhost:27017/'),
+                             serverSelectionTimeoutMS=5000, maxPoolSize=max(100, workers))
+        db = configure_readings_storage(client['iot_monitoring'], os.getenv('READINGS_STORAGE', 'documents'),
+                                        os.getenv('READINGS_TS_GRANULARITY', 'minutes'))
+        retention_days = int(os.getenv('RETENTION_DAYS', 0) or 0)
+        retention = Retention(db, retention_days, os.getenv('RETENTION_ARCHIVE_DIR', 'archive')) \
+            if retention_days > 0 else None
+        return cls(db, workers, retention=retention)
+    
+    def devices(self) -> List[Dict]:
+        return list(self.db.devices.find({}, {'_id': 0}))
+    
+    def load(self, sensor: Dict, start_time: datetime, end_time: datetime) -> pd.DataFrame:
+        query = {'sensor_id': sensor['sensor_id'], 'timestamp': {'$gte': start_time, '$lte': end_time}}
+        if sensor.get('device_id'):
+            query['device_id'] = sensor['device_id']
+        projection = {'_id': 0, 'timestamp': 1, 'value': 1}
+        archived = self.retention.archived(query) if self.retention and sensor.get('device_id') else ()
+        # Pembacaan arsip lebih tua dari data aktif, jadi ditaruh di depan
+        columns = [self._columns(archived)]
+        if isinstance(self.db.sensor_readings, Collection):
+            batches = self.db.sensor_readings.find_raw_batches(query, projection).sort('timestamp', 1) \
+                .batch_size(self.batch_size)
+            for batch in batches:
+                columns.append(raw_batch_columns(batch) or self._columns(bson.decode_all(batch)))
+        else:
+            cursor = self.db.sensor_readings.find(query, projection).sort('timestamp', 1).batch_size(self.batch_size)
+            columns.append(self._columns(cursor))
+        timestamps = np.concatenate([c[0] for c in columns])
+        if not len(timestamps):
+            return pd.DataFrame()
+        
+        df = pd.DataFrame({
+            'timestamp': timestamps,
+            'value': np.concatenate([c[1] for c in columns])
+        })
+        # Kolom konstan per sensor, sama seperti DataFrame dari API
+        df.insert(0, 'device_id', sensor.get('device_id'))
+        df.insert(1, 'sensor_id', sensor['sensor_id'])
+        df.insert(2, 'sensor_type', sensor.get('type'))
+        df.insert(4, 'unit', sensor.get('unit'))
+        return df
+    
+    @staticmethod
+    def _columns(readings) -> Tuple[np.ndarray, np.ndarray]:
+        timestamps, values = [], []
+        for reading in readings:
+            timestamps.append(reading['timestamp'])
+            values.append(reading['value'])
+        return np.array(timestamps, dtype='datetime64[us]'), np.array(values, dtype=np.float64)
+    
+    def load_all(self, sensors: List[Dict], start_time: datetime, end_time: datetime) -> Dict[str, pd.DataFrame]:
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            frames = executor.map(lambda sensor: self.load(sensor, start_time, end_time), sensors)
+            return {sensor['sensor_id']: df for sensor, df in zip(sensors, frames)}
+
+
+class SensorDataAnalyzer:
+    def __init__(self, api_base_url: str = "http://localhost:5000/api", loader=None):
+        self.api_base_url = api_base_url
+        self.loader = loader or ApiLoader(api_base_url)
+        # Data yang sudah dimuat dipakai ulang selama satu run (laporan lalu plot)
+        self.frames: Dict[Tuple[str, int], pd.DataFrame] = {}
+        self.windows: Dict[int, Tuple[datetime, datetime]] = {}
+        self.sensors: Optional[Dict[str, Dict]] = None
+    
+    def window(self, hours: int) -> Tuple[datetime, datetime]:
+        """Analysis window for ``hours``, fixed at its first use so every sensor covers the same period"""
+        if hours not in self.windows:
+            end_time = datetime.now()
+            self.windows[hours] = (end_time - timedelta(hours=hours), end_time)
+        return self.windows[hours]
+    
+    def sensor_index(self) -> Dict[str, Dict]:
+        """Registry sensors by sensor_id, each with its device_id"""
+        if self.sensors is None:
+            self.sensors = {}
+            for device in self.loader.devices():
+                for sensor in device.get('sensors', []):
+                    self.sensors[sensor['sensor_id']] = dict(sensor, device_id=device['device_id'],
+                                                             device_name=device.get('device_name'))
+        return self.sensors
+        
+    def get_sensor_data(self, sensor_id: str, hours: int = 24) -> pd.DataFrame:
+        """Mengambil data sensor dan convert ke DataFrame"""
+        key = (sensor_id, hours)
+        if key not in self.frames:
+            try:
+                sensor = self.sensor_index().get(sensor_id, {'sensor_id': sensor_id, 'device_id': None})
+            except Exception as e:
+                print(f"❌ Error: {e}")
+                return pd.DataFrame()
+            self.frames[key] = self.loader.load(sensor, *self.window(hours))
+        return self.frames[key]
+    
     def get_all_devices_data(self, hours: int = 24) -> Dict[str, pd.DataFrame]:
         """Mengambil data dari semua perangkat"""
         try:
-            # Ambil daftar perangkat
-            response = requests.get(f"{self.api_base_url}/devices")
-            if response.status_code != 200:
-                print("❌ Error mengambil daftar perangkat")
-                return {}
-            
-            devices = response.json()
-            all_data = {}
-            
-            for device in devices:
-                device_id = device['device_id']
-                print(f"📊 Mengambil data untuk perangkat: {device['device_name']}")
-                
-                for sensor in device['sensors']:
-                    sensor_id = sensor['sensor_id']
-                    df = self.get_sensor_data(sensor_id, hours)
-                    if not df.empty:
-                        all_data[sensor_id] = df
-            
-            return all_data
-            
+            sensors = self.sensor_index()
         except Exception as e:
-            print(f"❌ Error: {e}")
+            print(f"❌ Error mengambil daftar perangkat: {e}")
             return {}
+        
+        missing = [sensor for sensor_id, sensor in sensors.items() if (sensor_id, hours) not in self.frames]
+        if missing:
+            devices = len({sensor['device_id'] for sensor in missing})
+            print(f"📊 Mengambil data {len(missing)} sensor dari {devices} perangkat (sumber: {self.loader.name})")
+            for sensor_id, df in self.loader.load_all(missing, *self.window(hours)).items():
+                self.frames[(sensor_id, hours)] = df
+        
+        all_data = {}
+        for sensor_id in sensors:
+            df = self.frames[(sensor_id, hours)]
+            if not df.empty:
+                all_data[sensor_id] = df
+        return all_data
     
     def calculate_statistics(self, df: pd.DataFrame) -> Dict:
         """Menghitung statistik dasar dari data sensor"""
@@ -288,16 +461,30 @@ class SensorDataAnalyzer:
             print(f"   🔄 Tren: {trends.get('trend_direction', 'unknown')}")
             print(f"   ⚠️  Anomali: {analysis.get('anomalies_count', 0)}")
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Analisis data sensor IoT")
+    parser.add_argument('--source', choices=['api', 'mongo'], default=os.getenv('ANALYSIS_SOURCE', 'api'),
+                        help=f"api: lewat HTTP, hanya {API_READINGS_LIMIT} pembacaan terbaru per sensor karena "
+                             f"/sensors/<id>/readings tidak berhalaman, jendela yang lebih panjang terpotong; "
+                             f"mongo: langsung dari MongoDB, lengkap")
+    parser.add_argument('--api-url', default="http://localhost:5000/api")
+    parser.add_argument('--hours', type=int, default=24, help="Periode analisis (jam)")
+    parser.add_argument('--workers', type=int, default=8, help="Sensor yang dibaca bersamaan (mongo)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main function untuk menjalankan analisis data"""
+    load_dotenv()
+    args = parse_args(argv)
     print("🔬 Sensor Data Analyzer - Sistem Pemantauan Lingkungan IoT")
     print("=" * 60)
     
-    analyzer = SensorDataAnalyzer()
+    loader = MongoLoader.from_env(args.workers) if args.source == 'mongo' else ApiLoader(args.api_url)
+    analyzer = SensorDataAnalyzer(args.api_url, loader)
     
     # Generate laporan
     print("📊 Menggenerate laporan analisis data...")
-    report = analyzer.generate_report(hours=24)
+    report = analyzer.generate_report(hours=args.hours)
     
     if report:
         # Print ringkasan
@@ -309,7 +496,7 @@ def main():
         # Plot beberapa sensor sebagai contoh
         print("\n📈 Menggenerate plot untuk beberapa sensor...")
         for sensor_id in list(report.get('sensors', {}).keys())[:3]:  # Plot 3 sensor pertama
-            analyzer.plot_sensor_data(sensor_id, hours=24, 
+            analyzer.plot_sensor_data(sensor_id, hours=args.hours, 
                                    save_path=f"plot_{sensor_id}.png")
         
         print("\n✅ Analisis data selesai!")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Downsampling deret waktu untuk grafik Sistem Pemantauan Lingkungan IoT
+Mengurangi deret pembacaan menjadi paling banyak ``max_points`` titik dengan
+Largest-Triangle-Three-Buckets (bentuk kurva tetap terjaga) atau dengan
+min/max/rata-rata per bucket waktu. Perhitungan memakai NumPy.
+"""
+
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+MODES = ("lttb", "bucket")
+
+
+def load_series(readings: Iterable[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """Timestamps (int64 microseconds) and values (float64) of time-ordered readings"""
+    timestamps, values = [], []
+    for reading in readings:
+        timestamps.append(reading["timestamp"])
+        values.append(reading["value"])
+    return (np.array(timestamps, dtype="datetime64[us]").astype(np.int64),
+            np.array(values, dtype=np.float64))
+
+
+def _to_datetimes(timestamps: np.ndarray) -> List:
+    return timestamps.astype("datetime64[us]").tolist()
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the points kept by Largest-Triangle-Three-Buckets.
+
+    The first and last points are always kept; the points between them are split
+    into ``threshold - 2`` buckets and from each bucket the point forming the
+    largest triangle with the previously kept point and the next bucket's
+    average is selected.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = x.astype(np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        average_x, average_y = x[next_start:next_end].mean(), y[next_start:next_end].mean()
+        areas = np.abs(
+            (x[previous] - average_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (average_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[i + 1] = previous
+    return selected
+
+
+def lttb(timestamps: np.ndarray, values: np.ndarray, max_points: int) -> List[Dict]:
+    """Downsampled series of real readings ({timestamp, value})"""
+    indices = lttb_indices(timestamps, values, max_points)
+    return [
+        {"timestamp": timestamp, "value": value}
+        for timestamp, value in zip(_to_datetimes(timestamps[indices]), values[indices].tolist())
+    ]
+
+
+def bucket_stats(timestamps: np.ndarray, values: np.ndarray, max_points: int) -> List[Dict]:
+    """Min/max/average per equal-width time bucket ({timestamp, value, min, max, count})"""
+    if not len(timestamps):
+        return []
+    edges = np.linspace(timestamps[0], timestamps[-1], max_points + 1)
+    # Data terurut waktu: tiap bucket adalah potongan kontigu; bucket kosong dilewati
+    starts = np.unique(np.concatenate(([0], np.searchsorted(timestamps, edges[1:-1], side="left"))))
+    starts = starts[starts < len(timestamps)]
+    counts = np.diff(np.append(starts, len(timestamps)))
+    averages = np.add.reduceat(values, starts) / counts
+    minimums = np.minimum.reduceat(values, starts)
+    maximums = np.maximum.reduceat(values, starts)
+    buckets = np.minimum(np.searchsorted(edges, timestamps[starts], side="right") - 1, max_points - 1)
+    bucket_starts = edges[buckets].astype(np.int64)
+    return [
+        {"timestamp": timestamp, "value": average, "min": minimum, "max": maximum, "count": count}
+        for timestamp, average, minimum, maximum, count in zip(
+            _to_datetimes(bucket_starts), averages.tolist(), minimums.tolist(),
+            maximums.tolist(), counts.tolist())
+    ]
+
+
+def downsample(readings: Iterable[Dict], max_points: int, mode: str = "lttb") -> List[Dict]:
+    """Reduce time-ordered readings to at most ``max_points`` points"""
+    timestamps, values = load_series(readings)
+    if mode == "bucket":
+        return bucket_stats(timestamps, values, max_points)
+    return lttb(timestamps, values, max_points)
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Push event untuk dashboard Sistem Pemantauan Lingkungan IoT
+Broker in-process yang meneruskan pembacaan baru ke subscriber Server-Sent
+Events (/api/stream), dengan sumber opsional dari MongoDB change stream agar
+tulisan proses lain (worker lain, ingest gateway) ikut terkirim.
+"""
+
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+from pymongo.errors import PyMongoError
+
+
+class Subscription:
+    """Bounded event queue of one stream client, filtered by device and sensor ids"""
+
+    def __init__(self, device_ids: Optional[Iterable[str]] = None, sensor_ids: Optional[Iterable[str]] = None,
+                 max_queue: int = 1000):
+        self.device_ids = set(device_ids) if device_ids else None
+        self.sensor_ids = set(sensor_ids) if sensor_ids else None
+        self.queue = queue.Queue(max_queue)
+        # Set ketika event dibuang karena antrian penuh; client perlu memuat ulang
+        self.lagged = False
+
+    def accepts(self, reading: Dict) -> bool:
+        return (self.device_ids is None or reading.get("device_id") in self.device_ids) and \
+            (self.sensor_ids is None or reading.get("sensor_id") in self.sensor_ids)
+
+    def offer(self, event: str, payload):
+        try:
+            self.queue.put_nowait((event, payload))
+        except queue.Full:
+            self.lagged = True
+
+    def get(self, timeout: float):
+        """Next (event, payload), or None when nothing arrived within ``timeout``"""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBroker:
+    """Fan-out of ingest events to stream subscribers.
+
+    ``publish`` is called on the ingest path, so it only filters and enqueues
+    without blocking; building and serializing the events happens in the
+    thread serving each stream.
+    """
+
+    def __init__(self, max_subscribers: int = 100, max_queue: int = 1000):
+        self.max_subscribers = max_subscribers
+        self.max_queue = max_queue
+        self.lock = threading.Lock()
+        self.subscribers: List[Subscription] = []
+
+    def subscribe(self, device_ids=None, sensor_ids=None) -> Optional[Subscription]:
+        """New subscription, or None when ``max_subscribers`` streams are open"""
+        with self.lock:
+            if len(self.subscribers) >= self.max_subscribers:
+                return None
+            subscription = Subscription(device_ids, sensor_ids, self.max_queue)
+            self.subscribers.append(subscription)
+            return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self.lock:
+            if subscription in self.subscribers:
+                self.subscribers.remove(subscription)
+
+    def subscriber_count(self) -> int:
+        with self.lock:
+            return len(self.subscribers)
+
+    def publish(self, readings: List[Dict]):
+        """Deliver stored readings to every subscriber whose filters match"""
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            matched = [r for r in readings if subscription.accepts(r)]
+            if matched:
+                subscription.offer("readings", matched)
+
+    def notify(self, event: str, payload=None):
+        """Deliver an unfiltered event (e.g. a device registry change) to every subscriber"""
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscription in subscribers:
+            subscription.offer(event, payload)
+
+
+class ChangeStreamSource:
+    """Feeds a broker from a MongoDB change stream on inserts (needs a replica set).
+
+    Inserts that arrive together are published as one batch. The stream resumes
+    from the last seen token after errors.
+    """
+
+    def __init__(self, collection, publish: Callable[[List[Dict]], None], batch_size: int = 500):
+        self.collection = collection
+        self.publish = publish
+        self.batch_size = batch_size
+        self.resume_token = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        with self.lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._run, name="change-stream", daemon=True)
+            self.thread.start()
+
+    def _run(self):
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        while True:
+            try:
+                with self.collection.watch(pipeline, resume_after=self.resume_token,
+                                           max_await_time_ms=500) as stream:
+                    batch = []
+                    while stream.alive:
+                        change = stream.try_next()
+                        if change is not None:
+                            self.resume_token = stream.resume_token
+                            batch.append(change["fullDocument"])
+                            if len(batch) < self.batch_size:
+                                continue
+                        if batch:
+                            self.publish(batch)
+                            batch = []
+            except PyMongoError as e:
+                print(f"⚠️  Change stream terputus, mencoba lagi: {e}")
+                time.sleep(1)
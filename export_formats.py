@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Format export kolumnar untuk Sistem Pemantauan Lingkungan IoT
+Mengubah batch cursor pembacaan menjadi kolom lalu men-stream hasilnya sebagai
+Parquet, Arrow IPC stream, atau NumPy .npz. Parquet dan Arrow membutuhkan
+pyarrow (diimport saat dipakai); .npz hanya membutuhkan NumPy.
+"""
+
+import io
+import tempfile
+import zipfile
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List
+
+import numpy as np
+
+FORMATS = ("csv", "parquet", "arrow", "npz")
+COLUMNAR_FORMATS = ("parquet", "arrow", "npz")
+ARROW_FORMATS = ("parquet", "arrow")
+
+MIMETYPES = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream",
+    "npz": "application/octet-stream",
+}
+EXTENSIONS = {"parquet": "parquet", "arrow": "arrows", "npz": "npz"}
+
+# Satu row group Parquet mengumpulkan beberapa batch cursor
+PARQUET_ROW_GROUP_SIZE = 65536
+
+
+def require_pyarrow():
+    """Import pyarrow, raising ImportError with an install hint when it is missing"""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("format parquet/arrow requires pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+def column_batches(documents: Iterable[Dict], fields: List[str], batch_size: int) -> Iterator[Dict[str, List]]:
+    """Transpose consecutive cursor batches into {field: values} columns"""
+    iterator = iter(documents)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield {field: [document.get(field) for document in batch] for field in fields}
+
+
+class _Sink:
+    """Write-only file object whose bytes are handed out as they are produced"""
+
+    closed = False
+
+    def __init__(self):
+        self.parts: List[bytes] = []
+        self.position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.parts.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _arrow_type(pa, field: str):
+    if field == "timestamp":
+        return pa.timestamp("us")
+    if field == "value":
+        return pa.float64()
+    return pa.string()
+
+
+def _record_batch(pa, schema, columns: Dict[str, List]):
+    return pa.record_batch([pa.array(columns[f.name], type=f.type) for f in schema], schema=schema)
+
+
+def arrow_chunks(batches: Iterable[Dict[str, List]], fields: List[str]) -> Iterator[bytes]:
+    """Arrow IPC stream, one record batch per cursor batch"""
+    pa = require_pyarrow()
+    schema = pa.schema([(field, _arrow_type(pa, field)) for field in fields])
+    sink = _Sink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for columns in batches:
+            writer.write_batch(_record_batch(pa, schema, columns))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def parquet_chunks(batches: Iterable[Dict[str, List]], fields: List[str],
+                   row_group_size: int = PARQUET_ROW_GROUP_SIZE) -> Iterator[bytes]:
+    """Zstd-compressed Parquet, written row group by row group"""
+    pa = require_pyarrow()
+    schema = pa.schema([(field, _arrow_type(pa, field)) for field in fields])
+    sink = _Sink()
+    with pa.parquet.ParquetWriter(sink, schema, compression="zstd") as writer:
+        pending, rows = [], 0
+        for columns in batches:
+            pending.append(_record_batch(pa, schema, columns))
+            rows += pending[-1].num_rows
+            if rows >= row_group_size:
+                writer.write_table(pa.Table.from_batches(pending, schema))
+                pending, rows = [], 0
+                yield sink.drain()
+        if pending:
+            writer.write_table(pa.Table.from_batches(pending, schema))
+    yield sink.drain()
+
+
+def npz_chunks(batches: Iterable[Dict[str, List]], fields: List[str]) -> Iterator[bytes]:
+    """Compressed .npz with one array per field.
+
+    Text fields are dictionary-encoded: ``<field>`` holds int32 codes into
+    ``<field>_categories``. Columns are staged in temporary files while the
+    cursor is read, because every .npy member needs its final length up front.
+    """
+    staged = {field: tempfile.TemporaryFile() for field in fields}
+    categories: Dict[str, Dict[str, int]] = {field: {} for field in fields
+                                             if field not in ("timestamp", "value")}
+    dtypes = {field: np.dtype("int32") for field in categories}
+    dtypes.update({"timestamp": np.dtype("datetime64[us]"), "value": np.dtype("float64")})
+    count = 0
+    try:
+        for columns in batches:
+            count += len(columns[fields[0]])
+            for field in fields:
+                if field in categories:
+                    codes = categories[field]
+                    array = np.array([codes.setdefault(v, len(codes)) for v in columns[field]], dtype=np.int32)
+                else:
+                    array = np.array(columns[field], dtype=dtypes[field])
+                staged[field].write(array.tobytes())
+
+        sink = _Sink()
+        with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            for field in fields:
+                with archive.open(f"{field}.npy", "w", force_zip64=True) as member:
+                    np.lib.format.write_array_header_1_0(member, {
+                        "descr": np.lib.format.dtype_to_descr(dtypes[field]),
+                        "fortran_order": False,
+                        "shape": (count,),
+                    })
+                    staged[field].seek(0)
+                    for data in iter(lambda: staged[field].read(io.DEFAULT_BUFFER_SIZE * 64), b""):
+                        member.write(data)
+                        yield sink.drain()
+                if field in categories:
+                    with archive.open(f"{field}_categories.npy", "w") as member:
+                        np.save(member, np.array(list(categories[field]), dtype=str))
+            yield sink.drain()
+        yield sink.drain()
+    finally:
+        for handle in staged.values():
+            handle.close()
+
+
+def columnar_chunks(fmt: str, batches: Iterable[Dict[str, List]], fields: List[str]) -> Iterator[bytes]:
+    if fmt == "parquet":
+        return parquet_chunks(batches, fields)
+    if fmt == "arrow":
+        return arrow_chunks(batches, fields)
+    return npz_chunks(batches, fields)
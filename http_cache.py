@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+HTTP conditional caching untuk Sistem Pemantauan Lingkungan IoT
+Helper ETag / Last-Modified: route menghitung validator murah (versi registry
+atau versi jendela waktu pembacaan) lebih dulu, lalu membalas 304 tanpa
+menjalankan query utama jika validator client masih cocok.
+"""
+
+import hashlib
+from datetime import datetime, timezone
+from typing import Optional
+
+from flask import Response, after_this_request, request
+
+DEFAULT_CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Short opaque tag derived from the given validator parts"""
+    return hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:20]
+
+
+def _as_utc(value: datetime) -> datetime:
+    # updated_at ditulis dalam UTC; pymongo membacanya kembali sebagai datetime naive
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def is_fresh(etag: str, last_modified: Optional[datetime] = None) -> bool:
+    """Whether the client's cached copy is still valid (If-None-Match wins over If-Modified-Since)"""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        # HTTP-date hanya presisi detik
+        return _as_utc(last_modified).replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def add_validators(response: Response, etag: str, last_modified: Optional[datetime] = None,
+                   cache_control: str = DEFAULT_CACHE_CONTROL) -> Response:
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = _as_utc(last_modified)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def not_modified(etag: str, last_modified: Optional[datetime] = None,
+                 cache_control: str = DEFAULT_CACHE_CONTROL) -> Response:
+    """Empty 304 response carrying the current validators"""
+    return add_validators(Response(status=304), etag, last_modified, cache_control)
+
+
+def conditional(etag: str, last_modified: Optional[datetime] = None,
+                cache_control: str = DEFAULT_CACHE_CONTROL) -> Optional[Response]:
+    """304 response if the client's copy is still valid, else None.
+
+    When None is returned the route runs normally and its 200 response gets the
+    validators and Cache-Control header attached.
+    """
+    if is_fresh(etag, last_modified):
+        return not_modified(etag, last_modified, cache_control)
+
+    @after_this_request
+    def tag(response):
+        if response.status_code == 200:
+            add_validators(response, etag, last_modified, cache_control)
+        return response
+
+    return None
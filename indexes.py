@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Manajemen index MongoDB untuk Sistem Pemantauan Lingkungan IoT
+Mendeklarasikan index yang dibutuhkan route API, membuatnya saat startup,
+dan memverifikasi rencana query tiap route dengan explain()
+"""
+
+from typing import Dict, List
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+# Index yang dikelola aplikasi, per collection
+MANAGED_INDEXES = {
+    "sensor_readings": [
+        IndexModel([("sensor_id", ASCENDING), ("timestamp", DESCENDING)], name="sensor_id_timestamp"),
+        # _id sebagai tie-breaker untuk keyset pagination di get_device_readings
+        IndexModel([("device_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)],
+                   name="device_id_timestamp_id"),
+        IndexModel([("sensor_type", ASCENDING), ("timestamp", DESCENDING)], name="sensor_type_timestamp"),
+    ],
+    "devices": [
+        IndexModel([("device_id", ASCENDING)], name="device_id_unique", unique=True),
+    ],
+    "sensor_rollups": [
+        IndexModel([("sensor_id", ASCENDING), ("resolution", ASCENDING), ("start", ASCENDING)],
+                   name="sensor_id_resolution_start"),
+        IndexModel([("sensor_type", ASCENDING), ("resolution", ASCENDING), ("start", ASCENDING)],
+                   name="sensor_type_resolution_start"),
+    ],
+    # Validator HTTP per jendela waktu (readings_store.readings_window_version)
+    "readings_versions": [
+        IndexModel([("device_id", ASCENDING), ("day", ASCENDING)], name="device_id_day"),
+        IndexModel([("sensor_id", ASCENDING), ("day", ASCENDING)], name="sensor_id_day"),
+    ],
+}
+
+# Index lama yang sudah digantikan index lain dan dihapus saat startup
+RETIRED_INDEXES = {
+    "sensor_readings": ["device_id_timestamp"],
+}
+
+# Query representatif tiap route: (route, collection, filter, sort)
+ROUTE_QUERIES = [
+    ("get_sensor_readings", "sensor_readings",
+     {"sensor_id": "{sensor_id}"}, [("timestamp", DESCENDING)]),
+    ("get_device_readings", "sensor_readings",
+     {"device_id": "{device_id}"}, [("timestamp", DESCENDING), ("_id", DESCENDING)]),
+    ("get_latest_reading", "sensor_readings",
+     {"sensor_id": "{sensor_id}"}, [("timestamp", DESCENDING)]),
+    ("get_stats", "sensor_readings",
+     {"sensor_type": "{sensor_type}"}, [("timestamp", DESCENDING)]),
+    ("export_device_readings_csv", "sensor_readings",
+     {"device_id": "{device_id}"}, [("timestamp", DESCENDING)]),
+    ("get_readings_in_range", "sensor_readings",
+     {"device_id": "{device_id}"}, None),
+    ("get_sensor_stats", "sensor_readings",
+     {"device_id": "{device_id}", "sensor_id": "{sensor_id}"}, None),
+    ("get_sensor_stats", "sensor_rollups",
+     {"sensor_id": "{sensor_id}", "resolution": "1d"}, None),
+    ("get_devices_exceeding_threshold", "sensor_readings",
+     {"sensor_type": "{sensor_type}", "value": {"$gt": 0}}, None),
+    ("get_devices_exceeding_threshold", "sensor_rollups",
+     {"sensor_type": "{sensor_type}", "resolution": "1d", "max": {"$gt": 0}}, None),
+    ("api_report", "sensor_readings",
+     {"device_id": "{device_id}", "sensor_id": "{sensor_id}"}, None),
+    ("get_device", "devices",
+     {"device_id": "{device_id}"}, None),
+]
+
+
+def ensure_indexes(db) -> Dict[str, List[str]]:
+    """Create every managed index; safe to call on every startup"""
+    created = {}
+    for collection_name, indexes in MANAGED_INDEXES.items():
+        try:
+            created[collection_name] = db[collection_name].create_indexes(indexes)
+        except OperationFailure as e:
+            # Contoh: device_id duplikat mencegah index unique dibuat
+            print(f"⚠️  Gagal membuat index pada {collection_name}: {e}")
+            created[collection_name] = []
+    # Hapus index lama setelah penggantinya tersedia
+    for collection_name, names in RETIRED_INDEXES.items():
+        existing = db[collection_name].index_information()
+        for name in names:
+            if name in existing:
+                db[collection_name].drop_index(name)
+    return created
+
+
+def _sample_values(db) -> Dict[str, str]:
+    """Pick real ids from the registry so explain() sees realistic values"""
+    values = {"device_id": "dev001", "sensor_id": "temp001", "sensor_type": "temperature"}
+    device = db.devices.find_one({}, {"_id": 0, "device_id": 1, "sensors": 1})
+    if device:
+        values["device_id"] = device["device_id"]
+        if device.get("sensors"):
+            values["sensor_id"] = device["sensors"][0].get("sensor_id", values["sensor_id"])
+            values["sensor_type"] = device["sensors"][0].get("type", values["sensor_type"])
+    return values
+
+
+def _fill(query: Dict, values: Dict[str, str]) -> Dict:
+    filled = {}
+    for key, value in query.items():
+        if isinstance(value, str):
+            filled[key] = value.format(**values)
+        else:
+            filled[key] = value
+    return filled
+
+
+def _plan_stages(plan: Dict, stages: List[str], index_names: List[str]):
+    """Collect stage names and index names from a (possibly nested) plan"""
+    if not isinstance(plan, dict):
+        return
+    if "stage" in plan:
+        stages.append(plan["stage"])
+    if "indexName" in plan:
+        index_names.append(plan["indexName"])
+    for key in ("queryPlan", "inputStage"):
+        _plan_stages(plan.get(key), stages, index_names)
+    for child in plan.get("inputStages", []):
+        _plan_stages(child, stages, index_names)
+
+
+def explain_route_queries(db) -> List[Dict]:
+    """Explain the query of every route and report whether an index serves it"""
+    values = _sample_values(db)
+    report = []
+    for route, collection_name, query, sort in ROUTE_QUERIES:
+        query = _fill(query, values)
+        cursor = db[collection_name].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.limit(1).explain().get("queryPlanner", {}).get("winningPlan", {})
+        stages, index_names = [], []
+        _plan_stages(plan, stages, index_names)
+        uses_index = "IXSCAN" in stages or "IDHACK" in stages or "EXPRESS_IXSCAN" in stages
+        report.append({
+            "route": route,
+            "collection": collection_name,
+            "filter": query,
+            "sort": sort,
+            "stages": stages,
+            "indexes": index_names,
+            # Covered: dilayani index tanpa COLLSCAN dan tanpa sort di memori
+            "covered": uses_index and "COLLSCAN" not in stages and "SORT" not in stages,
+        })
+    return report
+
+
+def index_report(db) -> Dict:
+    """Existing indexes per collection together with the route coverage report"""
+    return {
+        "indexes": {
+            name: sorted(db[name].index_information().keys())
+            for name in MANAGED_INDEXES
+        },
+        "routes": explain_route_queries(db),
+    }
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Buffer ingest write-behind untuk Sistem Pemantauan Lingkungan IoT
+Menampung pembacaan sensor di memori lalu menulisnya ke MongoDB secara bulk
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List
+
+from pymongo.errors import BulkWriteError, ConnectionFailure, ExecutionTimeout, WTimeoutError
+
+# Error yang biasanya hilang sendiri (failover, jaringan, timeout); error lain tidak diulang
+TRANSIENT_ERRORS = (ConnectionFailure, ExecutionTimeout, WTimeoutError)
+
+
+class IngestBuffer:
+    """Bounded in-process queue of readings flushed in bulk by a background thread.
+
+    A batch is flushed once ``batch_size`` readings are waiting or the oldest
+    waiting reading is ``flush_interval`` seconds old. When the queue is full,
+    ``put`` blocks for at most ``put_timeout`` seconds and then refuses the
+    readings so the caller can push back on the client.
+
+    A batch that fails with a transient error is retried up to ``max_retries``
+    times; after that, or on any other error, it is moved to ``dead_letters``
+    (the most recent ``dead_letter_size`` batches) and the flusher moves on.
+
+    ``write_fn(batch, retried)`` is told whether the batch is being re-sent:
+    readings of an earlier attempt may already be stored, so duplicate key
+    errors on a retry mean "written", not "failed".
+    """
+
+    def __init__(self, write_fn: Callable[[List[Dict], bool], object], batch_size: int = 500,
+                 flush_interval: float = 1.0, max_queue: int = 50000, put_timeout: float = 0.5,
+                 max_retries: int = 5, dead_letter_size: int = 100):
+        self.write_fn = write_fn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.put_timeout = put_timeout
+        self.max_retries = max_retries
+        self.dead_letters = deque(maxlen=dead_letter_size)
+        self.dropped = 0
+        self.queue = deque()
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+        self.oldest_at = None
+
+    def start(self):
+        """Start the background flusher thread"""
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self._flush_loop, name="ingest-flusher", daemon=True)
+        self.thread.start()
+
+    def put(self, readings: List[Dict]) -> bool:
+        """Queue readings for writing; returns False if the queue stayed full.
+
+        Raises ValueError for more readings than the queue can ever hold.
+        """
+        if len(readings) > self.max_queue:
+            raise ValueError(f"Batch of {len(readings)} readings exceeds the ingest queue size {self.max_queue}")
+        if not self.running:
+            self.start()
+        deadline = time.monotonic() + self.put_timeout
+        with self.condition:
+            while len(self.queue) + len(readings) > self.max_queue:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+            was_empty = not self.queue
+            if was_empty:
+                self.oldest_at = time.monotonic()
+            self.queue.extend(readings)
+            # Wake the flusher to arm its timer or flush a full batch
+            if was_empty or len(self.queue) >= self.batch_size:
+                self.condition.notify_all()
+        return True
+
+    def pending(self) -> int:
+        """Number of readings waiting to be written"""
+        with self.condition:
+            return len(self.queue)
+
+    def _take_batch(self) -> List[Dict]:
+        """Pop up to ``batch_size`` readings; caller must hold the condition"""
+        count = min(self.batch_size, len(self.queue))
+        batch = [self.queue.popleft() for _ in range(count)]
+        self.oldest_at = time.monotonic() if self.queue else None
+        # Wake up producers waiting for free space
+        self.condition.notify_all()
+        return batch
+
+    def _flush_loop(self):
+        while True:
+            with self.condition:
+                while self.running and len(self.queue) < self.batch_size:
+                    if self.queue:
+                        timeout = self.oldest_at + self.flush_interval - time.monotonic()
+                        if timeout <= 0:
+                            break
+                    else:
+                        timeout = None
+                    self.condition.wait(timeout)
+                if not self.running and not self.queue:
+                    return
+                batch = self._take_batch()
+            try:
+                self._write(batch)
+            except Exception as e:
+                # Flusher tidak boleh mati: batch yang gagal dipindah ke dead letter
+                self._dead_letter(batch, e)
+
+    def _write(self, batch: List[Dict]):
+        attempt = 0
+        while True:
+            try:
+                self.write_fn(batch, attempt > 0)
+                return
+            except BulkWriteError as e:
+                # Unordered insert: the rest of the batch was written, only report the failures
+                errors = e.details.get("writeErrors", [])
+                if attempt:
+                    # Duplikat pada retry sudah tersimpan oleh percobaan sebelumnya
+                    errors = [error for error in errors if error.get("code") != 11000]
+                if errors:
+                    print(f"⚠️  {len(errors)} pembacaan gagal ditulis: {e}")
+                return
+            except TRANSIENT_ERRORS as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                print(f"❌ Gagal menulis batch ({len(batch)} pembacaan), "
+                      f"percobaan {attempt}/{self.max_retries}: {e}")
+                # Backoff bertahap; producer tertahan oleh batas antrian selama retry
+                time.sleep(min(self.flush_interval * 2 ** (attempt - 1), 30))
+
+    def _dead_letter(self, batch: List[Dict], error: Exception):
+        self.dead_letters.append((batch, error))
+        self.dropped += len(batch)
+        print(f"❌ Batch ({len(batch)} pembacaan) dibuang ke dead letter: {error!r}")
+
+    def stop(self, timeout: float = 30.0):
+        """Stop accepting work and drain everything still queued"""
+        with self.condition:
+            if not self.running:
+                return
+            self.running = False
+            self.condition.notify_all()
+        if self.thread:
+            self.thread.join(timeout=timeout)
+        remaining = self.pending()
+        if remaining:
+            print(f"⚠️  {remaining} pembacaan belum tersimpan saat shutdown")
@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+Gateway ingest line protocol untuk Sistem Pemantauan Lingkungan IoT
+Menerima pembacaan sensor lewat TCP atau UDP dalam format baris ala InfluxDB,
+banyak koneksi persisten dilayani satu event loop asyncio. Setiap baris
+divalidasi terhadap registry perangkat, dikumpulkan per batch, lalu ditulis
+ke sensor_readings dengan insert_many di thread pool.
+
+Format satu baris (dipisah newline, satu datagram UDP boleh berisi banyak baris):
+    <device_id>,<sensor_id>,<sensor_type> <value> <unit> [timestamp]
+
+timestamp berupa epoch integer (presisi --precision, default ns seperti
+InfluxDB) atau ISO 8601; tanpa timestamp dipakai waktu gateway. Contoh:
+    dev001,temp001,temperature 25.4 °C 1718000000000000000
+
+Menjalankan:
+    python ingest_gateway.py --tcp-port 8094 --udp-port 8094
+"""
+
+import argparse
+import asyncio
+import math
+import os
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from pymongo.errors import BulkWriteError, PyMongoError
+
+from indexes import ensure_indexes
+from readings_store import bump_readings_version, configure_readings_storage
+from rollups import Rollups
+
+# Nanodetik per satuan epoch
+PRECISIONS = {"s": 1000000000, "ms": 1000000, "us": 1000, "ns": 1}
+
+
+class LineError(ValueError):
+    """A line that cannot be turned into a reading"""
+
+
+def parse_timestamp(text: str, precision: str) -> datetime:
+    """Epoch or ISO 8601 timestamp as naive local time, like datetime.now() in the API"""
+    try:
+        if text.lstrip("-").isdigit():
+            seconds, micros = divmod(int(text) * PRECISIONS[precision] // 1000, 1000000)
+            return datetime.fromtimestamp(seconds) + timedelta(microseconds=micros)
+        timestamp = datetime.fromisoformat(text)
+    except (ValueError, OverflowError, OSError):
+        raise LineError(f"timestamp tidak valid: {text}")
+    # Timestamp dengan zona waktu dikonversi ke waktu lokal sebelum disimpan naive
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone().replace(tzinfo=None)
+    return timestamp
+
+
+def parse_line(line: str, precision: str = "ns") -> Dict:
+    """Parse one ``device,sensor,type value unit [ts]`` line into a reading document"""
+    parts = line.split()
+    if len(parts) not in (3, 4):
+        raise LineError("baris harus berisi 'device,sensor,type value unit [timestamp]'")
+    keys = parts[0].split(",")
+    if len(keys) != 3 or not all(keys):
+        raise LineError(f"kunci harus 'device_id,sensor_id,sensor_type': {parts[0]}")
+    try:
+        value = float(parts[1])
+    except ValueError:
+        raise LineError(f"nilai bukan angka: {parts[1]}")
+    if not math.isfinite(value):
+        raise LineError(f"nilai tidak hingga: {parts[1]}")
+    return {
+        "device_id": keys[0],
+        "sensor_id": keys[1],
+        "sensor_type": keys[2],
+        "timestamp": parse_timestamp(parts[3], precision) if len(parts) == 4 else datetime.now(),
+        "value": value,
+        "unit": parts[2],
+    }
+
+
+class Registry:
+    """(device_id, sensor_id) -> (sensor type, unit) snapshot of the device registry"""
+
+    def __init__(self, db):
+        self.db = db
+        self.sensors: Dict[Tuple[str, str], Tuple[str, str]] = {}
+
+    def load(self):
+        sensors = {}
+        for device in self.db.devices.find({}, {"_id": 0, "device_id": 1, "sensors": 1}):
+            for sensor in device.get("sensors", []):
+                sensors[(device["device_id"], sensor.get("sensor_id"))] = (sensor.get("type"), sensor.get("unit"))
+        self.sensors = sensors
+
+    def check(self, reading: Dict) -> Optional[str]:
+        """Reason the reading does not match the registry, or None"""
+        expected = self.sensors.get((reading["device_id"], reading["sensor_id"]))
+        if expected is None:
+            return f"sensor {reading['sensor_id']} pada {reading['device_id']} tidak terdaftar"
+        if reading["sensor_type"] != expected[0]:
+            return f"tipe {reading['sensor_type']} tidak sesuai registry ({expected[0]})"
+        if expected[1] is not None and reading["unit"] != expected[1]:
+            return f"satuan {reading['unit']} tidak sesuai registry ({expected[1]})"
+        return None
+
+
+class Gateway:
+    """Batches parsed readings and writes them with insert_many on a thread pool.
+
+    A batch is written once ``batch_size`` readings are waiting or every
+    ``flush_interval`` seconds. While more than ``max_pending`` readings wait
+    for the database, TCP connections stop being read (the kernel buffers and
+    TCP flow control push back on devices) and UDP datagrams are dropped.
+    """
+
+    def __init__(self, db, registry: Registry, rollups: Optional[Rollups] = None, batch_size: int = 5000,
+                 flush_interval: float = 0.5, max_pending: int = 200000, writers: int = 2,
+                 precision: str = "ns", max_line: int = 65536):
+        self.db = db
+        self.registry = registry
+        self.rollups = rollups
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.precision = precision
+        # Batas byte satu baris TCP; baris yang lebih panjang memutus koneksi
+        self.max_line = max_line
+        self.executor = ThreadPoolExecutor(max_workers=writers, thread_name_prefix="gateway-writer")
+        self.batch: List[Dict] = []
+        self.pending = 0
+        self.writes: Set[asyncio.Future] = set()
+        self.paused: Set[asyncio.Transport] = set()
+        self.stats = {"received": 0, "rejected": 0, "written": 0, "failed": 0, "dropped": 0}
+        # written/failed juga diperbarui dari thread writer
+        self.stats_lock = threading.Lock()
+        self.last_error = None
+
+    @property
+    def overloaded(self) -> bool:
+        return self.pending >= self.max_pending
+
+    def feed(self, data: bytes):
+        """Parse complete lines and queue the valid readings"""
+        for raw in data.split(b"\n"):
+            line = raw.strip()
+            if not line or line.startswith(b"#"):
+                continue
+            self.stats["received"] += 1
+            try:
+                reading = parse_line(line.decode("utf-8"), self.precision)
+            except (LineError, UnicodeDecodeError) as e:
+                self.reject(e)
+                continue
+            error = self.registry.check(reading)
+            if error:
+                self.reject(error)
+                continue
+            self.batch.append(reading)
+            if len(self.batch) >= self.batch_size:
+                self.flush()
+
+    def reject(self, reason):
+        self.stats["rejected"] += 1
+        self.last_error = str(reason)
+
+    def flush(self):
+        if not self.batch:
+            return
+        batch, self.batch = self.batch, []
+        self.pending += len(batch)
+        future = asyncio.get_running_loop().run_in_executor(self.executor, self.write, batch)
+        self.writes.add(future)
+        future.add_done_callback(lambda f, size=len(batch): self._written(f, size))
+
+    def _written(self, future: asyncio.Future, size: int):
+        self.writes.discard(future)
+        self.pending -= size
+        if not self.overloaded:
+            for transport in list(self.paused):
+                if not transport.is_closing():
+                    transport.resume_reading()
+            self.paused.clear()
+
+    def write(self, batch: List[Dict]):
+        """Insert one batch (runs on the writer thread pool)"""
+        try:
+            self.db.sensor_readings.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            failed = {error["index"] for error in e.details.get("writeErrors", [])}
+            with self.stats_lock:
+                self.stats["failed"] += len(failed)
+            batch = [r for i, r in enumerate(batch) if i not in failed]
+        except PyMongoError as e:
+            with self.stats_lock:
+                self.stats["failed"] += len(batch)
+            print(f"⚠️  Gagal menulis {len(batch)} pembacaan: {e}")
+            return
+        with self.stats_lock:
+            self.stats["written"] += len(batch)
+        if self.rollups:
+            self.rollups.record(batch)
+        bump_readings_version(self.db, batch)
+
+    def pause(self, transport: asyncio.Transport):
+        transport.pause_reading()
+        self.paused.add(transport)
+
+    async def flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush()
+
+    async def registry_loop(self, interval: float):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await loop.run_in_executor(self.executor, self.registry.load)
+            except PyMongoError as e:
+                print(f"⚠️  Gagal memuat ulang registry: {e}")
+
+    async def report_loop(self, interval: float):
+        previous, started = dict(self.stats), time.monotonic()
+        while True:
+            await asyncio.sleep(interval)
+            now = time.monotonic()
+            rate = (self.stats["written"] - previous["written"]) / (now - started)
+            print(f"📥 {rate:,.0f} pembacaan/detik | diterima {self.stats['received']} "
+                  f"ditulis {self.stats['written']} ditolak {self.stats['rejected']} "
+                  f"gagal {self.stats['failed']} dibuang {self.stats['dropped']} antri {self.pending}"
+                  + (f" | error terakhir: {self.last_error}" if self.stats["rejected"] > previous["rejected"] else ""))
+            previous, started = dict(self.stats), now
+
+    async def drain(self):
+        """Write what is buffered and wait for every outstanding insert"""
+        self.flush()
+        if self.writes:
+            await asyncio.gather(*self.writes, return_exceptions=True)
+
+
+class LineProtocol(asyncio.Protocol):
+    """One TCP connection; incomplete trailing lines wait for the next segment.
+
+    A partial line longer than ``gateway.max_line`` closes the connection, and
+    a partial line left when the client disconnects is dropped, not parsed.
+    """
+
+    def __init__(self, gateway: Gateway):
+        self.gateway = gateway
+        self.transport = None
+        self.buffer = b""
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def data_received(self, data: bytes):
+        data = self.buffer + data
+        end = data.rfind(b"\n")
+        self.buffer = data[end + 1:]
+        if len(self.buffer) > self.gateway.max_line:
+            # Client tanpa newline tidak boleh menumbuhkan buffer tanpa batas
+            self.buffer = b""
+            self.gateway.reject(f"baris melebihi {self.gateway.max_line} byte, koneksi ditutup")
+            self.transport.close()
+        if end < 0:
+            return
+        self.gateway.feed(data[:end])
+        if self.gateway.overloaded:
+            self.gateway.pause(self.transport)
+
+    def connection_lost(self, exc):
+        if self.buffer:
+            # Baris terakhir tanpa newline bisa terpotong di tengah nilai
+            self.gateway.stats["dropped"] += 1
+            self.buffer = b""
+        self.gateway.paused.discard(self.transport)
+
+
+class DatagramLineProtocol(asyncio.DatagramProtocol):
+    """UDP datagrams of one or more complete lines"""
+
+    def __init__(self, gateway: Gateway):
+        self.gateway = gateway
+
+    def datagram_received(self, data: bytes, addr):
+        if self.gateway.overloaded:
+            self.gateway.stats["dropped"] += data.count(b"\n") or 1
+            return
+        self.gateway.feed(data)
+
+
+async def serve(gateway: Gateway, host: str, tcp_port: int, udp_port: int,
+                registry_interval: float, report_interval: float):
+    loop = asyncio.get_running_loop()
+    servers, transports = [], []
+    if tcp_port:
+        servers.append(await loop.create_server(lambda: LineProtocol(gateway), host, tcp_port,
+                                                reuse_address=True, backlog=1024))
+        print(f"🔌 TCP line protocol di {host}:{tcp_port}")
+    if udp_port:
+        transport, _ = await loop.create_datagram_endpoint(lambda: DatagramLineProtocol(gateway),
+                                                           local_addr=(host, udp_port))
+        transports.append(transport)
+        print(f"🔌 UDP line protocol di {host}:{udp_port}")
+
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signum, stop.set)
+        except NotImplementedError:
+            # Windows: Ctrl+C tetap menghentikan loop lewat KeyboardInterrupt
+            pass
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in (
+        gateway.flush_loop(), gateway.registry_loop(registry_interval), gateway.report_loop(report_interval))]
+    try:
+        await stop.wait()
+    finally:
+        for server in servers:
+            server.close()
+        for transport in transports:
+            transport.close()
+        for task in tasks:
+            task.cancel()
+        await gateway.drain()
+        gateway.executor.shutdown(wait=True)
+        print(f"👋 Gateway berhenti, {gateway.stats['written']} pembacaan ditulis")
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Gateway ingest line protocol (TCP/UDP)")
+    parser.add_argument("--host", default=os.getenv("GATEWAY_HOST", "0.0.0.0"))
+    parser.add_argument("--tcp-port", type=int, default=int(os.getenv("GATEWAY_TCP_PORT", 8094)),
+                        help="0 untuk mematikan TCP")
+    parser.add_argument("--udp-port", type=int, default=int(os.getenv("GATEWAY_UDP_PORT", 8094)),
+                        help="0 untuk mematikan UDP")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("GATEWAY_BATCH_SIZE", 5000)))
+    parser.add_argument("--flush-interval", type=float, default=float(os.getenv("GATEWAY_FLUSH_INTERVAL", 0.5)))
+    parser.add_argument("--max-pending", type=int, default=int(os.getenv("GATEWAY_MAX_PENDING", 200000)))
+    parser.add_argument("--writers", type=int, default=int(os.getenv("GATEWAY_WRITERS", 2)),
+                        help="Jumlah insert_many yang berjalan bersamaan")
+    parser.add_argument("--precision", choices=list(PRECISIONS), default=os.getenv("GATEWAY_PRECISION", "ns"))
+    parser.add_argument("--max-line", type=int, default=int(os.getenv("GATEWAY_MAX_LINE", 65536)),
+                        help="Byte maksimal satu baris TCP sebelum koneksi ditutup")
+    parser.add_argument("--registry-interval", type=float, default=30.0,
+                        help="Detik antar pemuatan ulang registry perangkat")
+    parser.add_argument("--report-interval", type=float, default=10.0)
+    args = parser.parse_args(argv)
+
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"), serverSelectionTimeoutMS=5000)
+    try:
+        client.server_info()
+    except PyMongoError as e:
+        print(f"❌ MongoDB tidak dapat dihubungi: {e}")
+        return 1
+    db = configure_readings_storage(client["iot_monitoring"], os.getenv("READINGS_STORAGE", "documents"),
+                                    os.getenv("READINGS_TS_GRANULARITY", "minutes"))
+    if os.getenv("ENSURE_INDEXES", "1") == "1":
+        ensure_indexes(db)
+    registry = Registry(db)
+    registry.load()
+    print(f"📋 {len(registry.sensors)} sensor terdaftar")
+    rollups = Rollups(db) if os.getenv("ROLLUPS_ENABLED", "1") == "1" else None
+    if rollups:
+        rollups.ensure_coverage()
+    else:
+        Rollups(db).invalidate()
+
+    gateway = Gateway(db, registry, rollups, args.batch_size, args.flush_interval, args.max_pending,
+                      args.writers, args.precision, args.max_line)
+    try:
+        asyncio.run(serve(gateway, args.host, args.tcp_port, args.udp_port,
+                          args.registry_interval, args.report_interval))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
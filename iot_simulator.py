@@ -4,13 +4,45 @@ Simulator Perangkat IoT untuk Sistem Pemantauan Lingkungan
 Mengirim data sensor secara periodik ke API
 """
 
+import argparse
+import asyncio
+import os
+import signal
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import random
 import json
-from datetime import datetime
+import csv
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
 import threading
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+# Pola harian per tipe sensor: (jam mulai, jam selesai, offset), inklusif, jendela
+# boleh melewati tengah malam; jendela pertama yang cocok yang dipakai
+DIURNAL_PATTERNS = {
+    "temperature": [(22, 6, -2), (10, 16, 3)],   # lebih dingin malam, lebih panas siang
+    "humidity": [(6, 8, 10), (22, 6, 15)],       # lebih lembap pagi dan malam
+    "co2": [(8, 18, 100)],                       # lebih tinggi di jam kerja
+}
+# Amplitudo noise tetap per tipe; tipe lain memakai variation sensor
+NOISE_AMPLITUDE = {"humidity": 5, "co2": 20}
+# Kolom file export yang dibutuhkan mode replay
+RECORDED_FIELDS = ("device_id", "sensor_id", "sensor_type", "timestamp", "value", "unit")
+
+
+def diurnal_offset(sensor_type: str, hour: int) -> float:
+    """Offset added to a sensor's base value at the given hour of the day"""
+    for start, end, offset in DIURNAL_PATTERNS.get(sensor_type, []):
+        if (start <= hour <= end) if start <= end else (hour >= start or hour <= end):
+            return offset
+    return 0
+
+
+def noise_amplitude(sensor_type: str, variation: float) -> float:
+    return NOISE_AMPLITUDE.get(sensor_type, variation)
+
 
 class IoTSimulator:
     def __init__(self, api_base_url: str = "http://localhost:5000/api"):
@@ -18,6 +50,8 @@ class IoTSimulator:
         self.devices = []
         self.running = False
         self.threads = []
+        # Satu session keep-alive untuk semua thread, pool diperbesar saat simulasi dimulai
+        self.session = requests.Session()
         
     def add_device(self, device_config: Dict):
         """Menambah perangkat IoT ke simulator"""
@@ -26,36 +60,26 @@ class IoTSimulator:
     
     def generate_sensor_value(self, sensor_type: str, base_value: float, variation: float = 0.1) -> float:
         """Generate nilai sensor yang realistis"""
-        if sensor_type == "temperature":
-            # Suhu bervariasi antara base_value ± variation
-            value = base_value + random.uniform(-variation, variation)
-            # Tambahkan tren harian (lebih dingin di malam hari)
-            hour = datetime.now().hour
-            if 22 <= hour or hour <= 6:  # Malam hari
-                value -= 2
-            elif 10 <= hour <= 16:  # Siang hari
-                value += 3
-        elif sensor_type == "humidity":
-            # Kelembapan bervariasi dengan pola yang lebih kompleks
-            value = base_value + random.uniform(-5, 5)
-            # Kelembapan lebih tinggi di pagi dan malam
-            hour = datetime.now().hour
-            if 6 <= hour <= 8:  # Pagi
-                value += 10
-            elif 22 <= hour or hour <= 6:  # Malam
-                value += 15
-        elif sensor_type == "co2":
-            # CO2 bervariasi berdasarkan aktivitas
-            value = base_value + random.uniform(-20, 20)
-            # CO2 lebih tinggi di jam kerja
-            hour = datetime.now().hour
-            if 8 <= hour <= 18:  # Jam kerja
-                value += 100
-        else:
-            value = base_value + random.uniform(-variation, variation)
-        
+        amplitude = noise_amplitude(sensor_type, variation)
+        value = base_value + random.uniform(-amplitude, amplitude)
+        # Tren harian (lihat DIURNAL_PATTERNS), dipakai juga oleh seed_data.py
+        value += diurnal_offset(sensor_type, datetime.now().hour)
         return round(value, 2)
     
+    def build_reading(self, device_id: str, sensor: Dict) -> Dict:
+        """Payload POST /readings dengan nilai baru untuk satu sensor"""
+        return {
+            "device_id": device_id,
+            "sensor_id": sensor["sensor_id"],
+            "sensor_type": sensor["type"],
+            "value": self.generate_sensor_value(
+                sensor["type"],
+                sensor.get("base_value", 25),
+                sensor.get("variation", 2)
+            ),
+            "unit": sensor["unit"]
+        }
+    
     def send_sensor_reading(self, device_id: str, sensor_id: str, sensor_type: str, value: float, unit: str):
         """Mengirim pembacaan sensor ke API"""
         reading_data = {
@@ -67,8 +91,8 @@ class IoTSimulator:
         }
         
         try:
-            response = requests.post(f"{self.api_base_url}/readings", json=reading_data)
-            if response.status_code == 201:
+            response = self.session.post(f"{self.api_base_url}/readings", json=reading_data, timeout=10)
+            if response.status_code in (201, 202):
                 print(f"📡 {device_id}/{sensor_id}: {value} {unit}")
             else:
                 print(f"❌ Error mengirim data: {response.status_code}")
@@ -85,21 +109,9 @@ class IoTSimulator:
         
         while self.running:
             for sensor in sensors:
-                # Generate nilai sensor
-                value = self.generate_sensor_value(
-                    sensor["type"], 
-                    sensor.get("base_value", 25),
-                    sensor.get("variation", 2)
-                )
-                
-                # Kirim data ke API
-                self.send_sensor_reading(
-                    device_id,
-                    sensor["sensor_id"],
-                    sensor["type"],
-                    value,
-                    sensor["unit"]
-                )
+                # Generate nilai sensor lalu kirim ke API
+                reading = self.build_reading(device_id, sensor)
+                self.send_sensor_reading(**reading)
             
             # Tunggu interval sebelum pembacaan berikutnya
             time.sleep(device_config.get("interval", 30))  # Default 30 detik
@@ -113,6 +125,11 @@ class IoTSimulator:
         self.running = True
         print(f"🎯 Memulai simulasi {len(self.devices)} perangkat IoT...")
         
+        # Satu koneksi keep-alive per thread perangkat
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=len(self.devices))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        
         # Buat thread untuk setiap perangkat
         for device_config in self.devices:
             thread = threading.Thread(
@@ -140,8 +157,276 @@ class IoTSimulator:
         for thread in self.threads:
             thread.join(timeout=5)
         
+        self.session.close()
         print("✅ Simulasi dihentikan")
 
+
+def require_aiohttp():
+    """Import aiohttp, raising ImportError with an install hint when it is missing"""
+    try:
+        import aiohttp
+    except ImportError as e:
+        raise ImportError("mode async membutuhkan aiohttp (pip install aiohttp)") from e
+    return aiohttp
+
+
+class AsyncIoTSimulator(IoTSimulator):
+    """Every device as a task on one event loop, sharing a pooled keep-alive aiohttp session.
+
+    With ``batch_size`` > 0 readings are buffered and sent to
+    /readings/batch every ``flush_interval`` seconds or once a batch fills;
+    otherwise each reading is its own POST /readings. Intervals are
+    jittered by +/- ``jitter`` so devices drift apart like a real fleet.
+    """
+
+    def __init__(self, api_base_url: str = "http://localhost:5000/api", batch_size: int = 0,
+                 flush_interval: float = 1.0, connections: int = 100, jitter: float = 0.1,
+                 max_pending: int = 100000, timeout: float = 10.0, report_interval: float = 10.0):
+        super().__init__(api_base_url)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.connections = connections
+        self.jitter = jitter
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.report_interval = report_interval
+        self.pending: List[Dict] = []
+        self.requests = set()
+        self.stats = {"generated": 0, "sent": 0, "failed": 0, "dropped": 0, "requests": 0}
+        self.last_error: Optional[str] = None
+    
+    async def post(self, session, path: str, payload, count: int):
+        """POST one reading or batch; a full write-behind queue (503) puts a batch back in the buffer"""
+        self.stats["requests"] += 1
+        try:
+            async with session.post(f"{self.api_base_url}{path}", json=payload) as response:
+                status = response.status
+                body = None
+                if status < 500:
+                    try:
+                        body = await response.json(content_type=None)
+                    except (ValueError, self.aiohttp.ContentTypeError):
+                        # Body bukan JSON (mis. halaman error dari proxy): cukup catat status
+                        pass
+        except (self.aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.stats["failed"] += count
+            self.last_error = str(e) or type(e).__name__
+            return
+        if status == 503 and isinstance(payload, list):
+            self.buffer(payload)
+        elif status in (201, 202, 207) and isinstance(payload, list):
+            accepted = body.get("inserted", body.get("queued", 0)) if isinstance(body, dict) else count
+            self.stats["sent"] += accepted
+            self.stats["failed"] += count - accepted
+        elif status in (201, 202):
+            self.stats["sent"] += count
+        else:
+            self.stats["failed"] += count
+            error = body.get("error") if isinstance(body, dict) else None
+            self.last_error = f"HTTP {status}: {error}" if error else f"HTTP {status}"
+    
+    def buffer(self, readings: List[Dict]):
+        self.pending.extend(readings)
+        overflow = len(self.pending) - self.max_pending
+        if overflow > 0:
+            # Buffer penuh karena API tertinggal: buang pembacaan tertua
+            del self.pending[:overflow]
+            self.stats["dropped"] += overflow
+    
+    def flush(self, session):
+        """Send everything buffered as /readings/batch requests of at most ``batch_size``"""
+        while self.pending:
+            batch, self.pending = self.pending[:self.batch_size], self.pending[self.batch_size:]
+            task = asyncio.ensure_future(self.post(session, "/readings/batch", batch, len(batch)))
+            self.requests.add(task)
+            task.add_done_callback(self.requests.discard)
+    
+    async def simulate_device(self, session, device_config: Dict):
+        device_id = device_config["device_id"]
+        interval = device_config.get("interval", 30)
+        loop = asyncio.get_running_loop()
+        # Fase awal acak agar perangkat tidak mengirim serentak
+        next_at = loop.time() + random.uniform(0, interval)
+        while self.running:
+            await asyncio.sleep(max(0.0, next_at - loop.time()))
+            readings = [self.build_reading(device_id, sensor) for sensor in device_config["sensors"]]
+            self.stats["generated"] += len(readings)
+            if self.batch_size:
+                self.buffer(readings)
+                if len(self.pending) >= self.batch_size:
+                    self.flush(session)
+            else:
+                for reading in readings:
+                    await self.post(session, "/readings", reading, 1)
+            next_at = max(next_at + interval * random.uniform(1 - self.jitter, 1 + self.jitter), loop.time())
+    
+    async def flush_loop(self, session):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            self.flush(session)
+    
+    async def report_loop(self):
+        previous, started = dict(self.stats), time.monotonic()
+        while True:
+            await asyncio.sleep(self.report_interval)
+            now = time.monotonic()
+            rate = (self.stats["sent"] - previous["sent"]) / (now - started)
+            print(f"📡 {rate:,.0f} pembacaan/detik | dibuat {self.stats['generated']} terkirim {self.stats['sent']} "
+                  f"gagal {self.stats['failed']} dibuang {self.stats['dropped']} buffer {len(self.pending)}"
+                  + (f" | error terakhir: {self.last_error}" if self.stats["failed"] > previous["failed"] else ""))
+            previous, started = dict(self.stats), now
+    
+    def workers(self, session) -> List:
+        """Coroutines producing readings; the run lasts until ``self.stop`` is set"""
+        print(f"✅ {len(self.devices)} perangkat berjalan di satu event loop. Tekan Ctrl+C untuk berhenti.")
+        return [self.simulate_device(session, device) for device in self.devices]
+    
+    async def run(self, duration: Optional[float] = None):
+        """Simulate until SIGINT/SIGTERM or for ``duration`` seconds, then send what is buffered"""
+        self.aiohttp = require_aiohttp()
+        loop = asyncio.get_running_loop()
+        self.stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self.stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        if duration:
+            loop.call_later(duration, self.stop.set)
+        
+        connector = self.aiohttp.TCPConnector(limit=self.connections, keepalive_timeout=60)
+        timeout = self.aiohttp.ClientTimeout(total=self.timeout)
+        async with self.aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            self.running = True
+            tasks = [asyncio.ensure_future(worker) for worker in self.workers(session)]
+            tasks.append(asyncio.ensure_future(self.report_loop()))
+            if self.batch_size:
+                tasks.append(asyncio.ensure_future(self.flush_loop(session)))
+            try:
+                await self.stop.wait()
+            finally:
+                print("\n🛑 Menghentikan simulasi...")
+                self.running = False
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                self.flush(session)
+                if self.requests:
+                    await asyncio.gather(*self.requests, return_exceptions=True)
+        print(f"✅ Simulasi dihentikan: {self.stats['sent']} pembacaan terkirim, {self.stats['failed']} gagal, "
+              f"{self.stats['dropped']} dibuang ({self.stats['requests']} request)")
+    
+    def start_simulation(self, duration: Optional[float] = None):
+        if not self.devices:
+            print("❌ Tidak ada perangkat yang dikonfigurasi")
+            return
+        print(f"🎯 Memulai simulasi async {len(self.devices)} perangkat IoT...")
+        try:
+            asyncio.run(self.run(duration))
+        except KeyboardInterrupt:
+            pass
+
+
+def parse_recorded_timestamp(text: str) -> datetime:
+    """ISO 8601 (CSV export, JSON_DATETIME_FORMAT=iso) or RFC 822 (default JSON) timestamp, naive"""
+    try:
+        timestamp = datetime.fromisoformat(text)
+    except ValueError:
+        timestamp = parsedate_to_datetime(text)
+    return timestamp.replace(tzinfo=None)
+
+
+def read_recording(path: str) -> List[Dict]:
+    """Readings from an exported CSV or NDJSON file, oldest first.
+
+    Lines without the reading fields (such as the summary line of an NDJSON
+    report) are skipped.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".ndjson", ".jsonl")):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        readings = [
+            {
+                "device_id": row["device_id"],
+                "sensor_id": row["sensor_id"],
+                "sensor_type": row["sensor_type"],
+                "timestamp": parse_recorded_timestamp(row["timestamp"]),
+                "value": float(row["value"]),
+                "unit": row["unit"],
+            }
+            for row in rows if all(row.get(field) not in (None, "") for field in RECORDED_FIELDS)
+        ]
+    # Export CSV terurut dari yang terbaru
+    readings.sort(key=lambda reading: reading["timestamp"])
+    return readings
+
+
+class ReplaySimulator(AsyncIoTSimulator):
+    """Re-ingest recorded readings with their original spacing divided by ``speed``.
+
+    ``speed`` 0 sends as fast as the API accepts. With ``rebase`` each
+    reading is stamped with the time it is due under the replay schedule
+    (at speed 0 the recording is only shifted to start now), so an incident
+    plays out "now"; otherwise the recorded timestamps are kept.
+    """
+
+    def __init__(self, readings: List[Dict], speed: float = 1.0, rebase: bool = False, **kwargs):
+        super().__init__(**kwargs)
+        self.readings = readings
+        self.speed = speed
+        self.rebase = rebase
+        self.max_lag = 0.0
+    
+    async def replay(self, session):
+        loop = asyncio.get_running_loop()
+        first = self.readings[0]["timestamp"]
+        started, started_at = loop.time(), datetime.now()
+        for reading in self.readings:
+            if not self.running:
+                break
+            offset = (reading["timestamp"] - first).total_seconds() / (self.speed or 1)
+            if self.speed:
+                delay = started + offset - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self.max_lag = max(self.max_lag, -delay)
+            timestamp = started_at + timedelta(seconds=offset) if self.rebase else reading["timestamp"]
+            payload = dict(reading, timestamp=timestamp.isoformat())
+            self.stats["generated"] += 1
+            if self.batch_size:
+                self.buffer([payload])
+                if len(self.pending) >= self.batch_size:
+                    self.flush(session)
+            else:
+                task = asyncio.ensure_future(self.post(session, "/readings", payload, 1))
+                self.requests.add(task)
+                task.add_done_callback(self.requests.discard)
+            if len(self.requests) >= self.connections * 2:
+                # Backpressure: tunggu API daripada menumpuk request
+                await asyncio.wait(self.requests, return_when=asyncio.FIRST_COMPLETED)
+        self.stop.set()
+    
+    def workers(self, session) -> List:
+        span = self.readings[-1]["timestamp"] - self.readings[0]["timestamp"]
+        pace = f"{self.speed:g}x" if self.speed else "secepatnya"
+        print(f"✅ Replay {len(self.readings)} pembacaan ({span} waktu rekaman, {pace}, "
+              f"timestamp {'di-rebase ke sekarang' if self.rebase else 'asli'}). Tekan Ctrl+C untuk berhenti.")
+        return [self.replay(session)]
+    
+    def start_simulation(self, duration: Optional[float] = None):
+        if not self.readings:
+            print("❌ Tidak ada pembacaan untuk di-replay")
+            return
+        print(f"🎯 Memulai replay ke {self.api_base_url}...")
+        try:
+            asyncio.run(self.run(duration))
+        except KeyboardInterrupt:
+            pass
+        if self.speed:
+            print(f"⏱️  Keterlambatan maksimum terhadap jadwal: {self.max_lag:.2f} detik")
+
 def create_sample_devices():
     """Membuat konfigurasi perangkat sample"""
     devices = [
@@ -149,6 +434,7 @@ def create_sample_devices():
             "device_id": "dev001",
             "device_name": "Sensor Udara Ruang Lab",
             "location": "Ruang Lab",
+            "description": "Sensor pemantauan kualitas udara di ruang laboratorium",
             "interval": 30,  # 30 detik
             "sensors": [
                 {
@@ -181,6 +467,7 @@ def create_sample_devices():
             "device_id": "dev002",
             "device_name": "Sensor Udara Ruang Server",
             "location": "Ruang Server",
+            "description": "Sensor pemantauan suhu dan kelembapan di ruang server",
             "interval": 45,  # 45 detik
             "sensors": [
                 {
@@ -205,6 +492,7 @@ def create_sample_devices():
             "device_id": "dev003",
             "device_name": "Sensor Udara Ruang Meeting",
             "location": "Ruang Meeting",
+            "description": "Sensor pemantauan kualitas udara di ruang meeting",
             "interval": 60,  # 60 detik
             "sensors": [
                 {
@@ -236,23 +524,67 @@ def create_sample_devices():
     ]
     return devices
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulator perangkat IoT")
+    parser.add_argument("--mode", choices=["thread", "async"], default=os.getenv("SIMULATOR_MODE", "thread"),
+                        help="thread: satu thread per perangkat; async: semua perangkat di satu event loop")
+    parser.add_argument("--api-url", default=os.getenv("SIMULATOR_API_URL", "http://localhost:5000/api"))
+    parser.add_argument("--devices", type=int, help="Jumlah perangkat, diklon dari perangkat sample (default: 3)")
+    parser.add_argument("--sensors", type=int, help="Sensor per perangkat saat --devices dipakai")
+    parser.add_argument("--interval", type=float, help="Interval pengiriman (detik) untuk semua perangkat")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Variasi interval, 0.1 = +/-10%% (async)")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("SIMULATOR_BATCH_SIZE", 0)),
+                        help="Kirim lewat /readings/batch per N pembacaan, 0 = satu request per pembacaan (async)")
+    parser.add_argument("--flush-interval", type=float, default=1.0, help="Detik maksimum buffer batch (async)")
+    parser.add_argument("--connections", type=int, default=100, help="Koneksi keep-alive maksimum (async)")
+    parser.add_argument("--duration", type=float, help="Berhenti setelah N detik (async)")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="Replay file export CSV atau NDJSON (.ndjson/.jsonl) alih-alih nilai acak")
+    parser.add_argument("--speed", type=float, default=1.0,
+                        help="Kecepatan replay, 10 = 10x lebih cepat, 0 = secepatnya (default: 1)")
+    parser.add_argument("--rebase", action="store_true",
+                        help="Geser timestamp replay ke waktu sekarang (default: timestamp asli)")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """Main function untuk menjalankan simulator"""
+    args = parse_args(argv)
     print("🌐 IoT Simulator - Sistem Pemantauan Lingkungan")
     print("=" * 50)
     
+    if args.replay:
+        readings = read_recording(args.replay)
+        print(f"📂 {len(readings)} pembacaan dimuat dari {args.replay}")
+        simulator = ReplaySimulator(readings, args.speed, args.rebase, api_base_url=args.api_url,
+                                    batch_size=args.batch_size, flush_interval=args.flush_interval,
+                                    connections=args.connections)
+        simulator.start_simulation(args.duration)
+        return
+    
     # Buat simulator
-    simulator = IoTSimulator()
+    if args.mode == "async":
+        simulator = AsyncIoTSimulator(args.api_url, args.batch_size, args.flush_interval,
+                                      args.connections, args.jitter)
+    else:
+        simulator = IoTSimulator(args.api_url)
     
-    # Tambahkan perangkat sample
-    devices = create_sample_devices()
+    # Tambahkan perangkat sample (atau armada hasil kloning untuk --devices)
+    if args.devices:
+        from seed_data import build_devices
+        devices = build_devices(args.devices, args.sensors)
+    else:
+        devices = create_sample_devices()
     for device in devices:
-        simulator.add_device(device)
+        if args.interval:
+            device["interval"] = args.interval
+        simulator.devices.append(device)
+    intervals = sorted({device.get("interval", 30) for device in devices})
     
     print(f"\n📊 Konfigurasi Simulator:")
+    print(f"- Mode: {args.mode}")
     print(f"- Jumlah perangkat: {len(devices)}")
     print(f"- API URL: {simulator.api_base_url}")
-    print(f"- Interval pengiriman: 30-60 detik")
+    print(f"- Interval pengiriman: {intervals[0]:g}-{intervals[-1]:g} detik")
     print(f"- Sensor types: temperature, humidity, co2")
     
     print("\n🎯 Memulai simulasi...")
@@ -260,7 +592,10 @@ def main():
     print("🛑 Tekan Ctrl+C untuk menghentikan simulasi")
     
     # Jalankan simulasi
-    simulator.start_simulation()
+    if args.mode == "async":
+        simulator.start_simulation(args.duration)
+    else:
+        simulator.start_simulation()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Statistik live untuk Sistem Pemantauan Lingkungan IoT
+Counter serta pembacaan terbaru per tipe sensor dan per sensor yang diperbarui
+saat ingest, sehingga GET /api/stats dan GET /api/latest tidak perlu query
+ulang ke sensor_readings.
+"""
+
+import threading
+import time
+from typing import Dict, List
+
+from pymongo import DESCENDING
+from pymongo.errors import PyMongoError
+
+
+def strip_id(reading: Dict) -> Dict:
+    """Copy of a reading without its _id, as returned by the read routes"""
+    return {k: v for k, v in reading.items() if k != "_id"}
+
+
+def _newer(reading: Dict, current: Dict) -> bool:
+    return current is None or reading["timestamp"] >= current["timestamp"]
+
+
+class LiveStats:
+    """Reading counters and latest readings per sensor type and per sensor, kept up to date on ingest.
+
+    The state is warmed from the database with one indexed newest-reading query
+    per sensor type and per sensor. When ``resync_interval`` is set it is
+    refreshed in a background thread, so writes made by other processes (other
+    workers, the ingest gateway, seeding scripts) are picked up without
+    blocking requests.
+    """
+
+    def __init__(self, db, resync_interval: float = 60.0):
+        self.db = db
+        self.resync_interval = resync_interval
+        self.lock = threading.Lock()
+        self.refresh_lock = threading.Lock()
+        self.total_readings = 0
+        self.latest_by_type: Dict[str, Dict] = {}
+        self.latest_by_sensor: Dict[str, Dict] = {}
+        self.synced_at = None
+        # Pembacaan yang dicatat selama refresh berjalan, diterapkan ulang saat snapshot ditukar
+        self.recorded_during_refresh = None
+
+    def _latest_per(self, field: str) -> Dict[str, Dict]:
+        readings = self.db.sensor_readings
+        # Cek pada class: atribut tak dikenal pada Collection pymongo adalah sub-collection
+        if hasattr(type(readings), "latest_per"):
+            # Layout bucket mencari pembacaan terbaru lewat field last tiap bucket
+            return {key: strip_id(reading) for key, reading in readings.latest_per(field).items()}
+        # distinct memakai DISTINCT_SCAN, lalu satu pembacaan terbaru per nilai lewat index (field, timestamp desc)
+        latest = {}
+        for key in readings.distinct(field):
+            if key is None:
+                continue
+            reading = next(readings.find({field: key}).sort("timestamp", DESCENDING).limit(1), None)
+            if reading is not None:
+                latest[key] = strip_id(reading)
+        return latest
+
+    def refresh(self):
+        """Reload counters and latest readings from the database"""
+        with self.refresh_lock:
+            with self.lock:
+                self.recorded_during_refresh = []
+            try:
+                total = self.db.sensor_readings.estimated_document_count()
+                latest_by_type = self._latest_per("sensor_type")
+                latest_by_sensor = self._latest_per("sensor_id")
+            except Exception:
+                with self.lock:
+                    self.recorded_during_refresh = None
+                raise
+            with self.lock:
+                recorded, self.recorded_during_refresh = self.recorded_during_refresh, None
+                self.total_readings = total
+                self.latest_by_type = latest_by_type
+                self.latest_by_sensor = latest_by_sensor
+                # Tulisan yang terjadi selama query tidak hilang saat snapshot ditukar
+                self._apply(recorded)
+                self.synced_at = time.monotonic()
+
+    def _resync(self):
+        try:
+            self.refresh()
+        except PyMongoError as e:
+            print(f"⚠️  Resync statistik live gagal: {e}")
+
+    def _maybe_resync(self):
+        if self.synced_at is None:
+            self.refresh()
+            return
+        if not self.resync_interval:
+            return
+        with self.lock:
+            if time.monotonic() - self.synced_at <= self.resync_interval:
+                return
+            # Satu resync per interval, di background; request memakai data saat ini
+            self.synced_at = time.monotonic()
+        threading.Thread(target=self._resync, name="live-stats-resync", daemon=True).start()
+
+    def _apply(self, readings: List[Dict]):
+        """Apply readings to the counters; caller must hold the lock"""
+        self.total_readings += len(readings)
+        for reading in readings:
+            sensor_type = reading["sensor_type"]
+            if _newer(reading, self.latest_by_type.get(sensor_type)):
+                self.latest_by_type[sensor_type] = strip_id(reading)
+            sensor_id = reading["sensor_id"]
+            if _newer(reading, self.latest_by_sensor.get(sensor_id)):
+                self.latest_by_sensor[sensor_id] = strip_id(reading)
+
+    def record(self, readings: List[Dict]):
+        """Apply readings that were just written to storage"""
+        if not readings:
+            return
+        with self.lock:
+            self._apply(readings)
+            if self.recorded_during_refresh is not None:
+                self.recorded_during_refresh.extend(readings)
+
+    def latest(self, sensor_id: str = None, device_id: str = None):
+        """Latest reading of one sensor, or of every sensor (optionally of one device)"""
+        self._maybe_resync()
+        with self.lock:
+            if sensor_id is not None:
+                return self.latest_by_sensor.get(sensor_id)
+            return {
+                sid: reading for sid, reading in self.latest_by_sensor.items()
+                if device_id is None or reading.get("device_id") == device_id
+            }
+
+    def snapshot(self) -> Dict:
+        """Current counters and latest readings per sensor type"""
+        self._maybe_resync()
+        with self.lock:
+            return {
+                "total_readings": self.total_readings,
+                "latest_readings": dict(self.latest_by_type),
+            }
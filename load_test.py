@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Load test untuk API Sistem Pemantauan Lingkungan IoT
+Dibangun di atas AsyncIoTSimulator: pembacaan dibangkitkan dengan model yang
+sama dan dikirim lewat session aiohttp keep-alive, bersamaan dengan campuran
+request baca dashboard (devices, latest, stats, pembacaan berhalaman).
+
+Request dijadwalkan open-loop sesuai profil laju (ramp, steady atau spike).
+Latensi diukur dari waktu request seharusnya dikirim, sehingga antrian di
+sisi client saat API tertinggal ikut terhitung. Hasilnya berupa histogram
+latensi per endpoint (p50/p95/p99/max), throughput dan error rate, ditulis
+ke report JSON yang dapat dibandingkan antar run:
+
+    python load_test.py run --profile ramp --duration 120 --ingest-rate 2000 --read-rate 200
+    python load_test.py compare baseline.json loadtest-report.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+from iot_simulator import AsyncIoTSimulator, require_aiohttp
+
+PROFILES = ("ramp", "steady", "spike")
+READ_ENDPOINTS = ("devices", "latest", "stats", "readings")
+DEFAULT_READ_MIX = "devices=1,latest=4,stats=2,readings=3"
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram with ~1% resolution from 1 microsecond up"""
+
+    GROWTH = 1.01
+    FLOOR = 1e-6
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def _upper(self, index: int) -> float:
+        return self.FLOOR * self.GROWTH ** (index + 1)
+
+    def record(self, seconds: float):
+        index = int(math.log(max(seconds, self.FLOOR) / self.FLOOR, self.GROWTH))
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th latency, capped at the observed max"""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self._upper(index), self.max)
+        return self.max
+
+    def summary(self) -> Dict:
+        return {
+            "p50": round(self.quantile(0.50) * 1000, 3),
+            "p95": round(self.quantile(0.95) * 1000, 3),
+            "p99": round(self.quantile(0.99) * 1000, 3),
+            "max": round(self.max * 1000, 3),
+            "mean": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+        }
+
+    def buckets(self) -> List[Tuple[float, int]]:
+        """Non-empty buckets as (upper bound in ms, count)"""
+        return [(round(self._upper(index) * 1000, 4), self.counts[index]) for index in sorted(self.counts)]
+
+
+class EndpointStats:
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.statuses: Counter = Counter()
+        self.errors = 0
+        self.readings = 0
+
+    def record(self, seconds: float, status, readings: int = 0):
+        self.latency.record(seconds)
+        self.statuses[str(status)] += 1
+        if not isinstance(status, int) or status >= 400:
+            self.errors += 1
+        else:
+            self.readings += readings
+
+    def report(self, elapsed: float) -> Dict:
+        requests = self.latency.count
+        return {
+            "requests": requests,
+            "errors": self.errors,
+            "error_rate": round(self.errors / requests, 4) if requests else 0.0,
+            "throughput": round(requests / elapsed, 2),
+            "latency_ms": self.latency.summary(),
+            "statuses": dict(self.statuses),
+            "histogram": self.latency.buckets(),
+        }
+
+
+def profile_rate(profile: str, elapsed: float, duration: float, rate: float,
+                 spike_factor: float = 5.0, spike_fraction: float = 0.2) -> float:
+    """Target requests per second ``elapsed`` seconds into a run.
+
+    ramp: linear from 0 to ``rate`` over the run; steady: constant ``rate``;
+    spike: ``rate`` with ``spike_factor`` times that rate for the middle
+    ``spike_fraction`` of the run.
+    """
+    if profile == "ramp":
+        return rate * elapsed / duration
+    if profile == "spike":
+        start = duration * (1 - spike_fraction) / 2
+        if start <= elapsed < start + duration * spike_fraction:
+            return rate * spike_factor
+    return rate
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in READ_ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"endpoint tidak dikenal: {name} (pilihan: {', '.join(READ_ENDPOINTS)})")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+class LoadTest:
+    """Open-loop ingest and read workloads against one API, sharing one keep-alive pool"""
+
+    def __init__(self, simulator: AsyncIoTSimulator, profile: str, duration: float, ingest_rate: float,
+                 read_rate: float, read_mix: Dict[str, float], batch_size: int = 0, max_in_flight: int = 2000,
+                 spike_factor: float = 5.0, per_page: int = 20):
+        self.simulator = simulator
+        self.profile = profile
+        self.duration = duration
+        self.ingest_rate = ingest_rate
+        self.read_rate = read_rate
+        self.read_mix = read_mix
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.spike_factor = spike_factor
+        self.per_page = per_page
+        self.endpoints: Dict[str, EndpointStats] = {}
+        self.timeline: Dict[int, Counter] = {}
+        self.in_flight = set()
+        self.skipped = 0
+        self.device_ids: List[str] = []
+
+    def stats(self, endpoint: str) -> EndpointStats:
+        if endpoint not in self.endpoints:
+            self.endpoints[endpoint] = EndpointStats()
+        return self.endpoints[endpoint]
+
+    async def request(self, session, endpoint: str, method: str, path: str, payload, intended: float,
+                      readings: int = 0):
+        loop = asyncio.get_running_loop()
+        try:
+            async with session.request(method, f"{self.simulator.api_base_url}{path}", json=payload) as response:
+                await response.read()
+                status = response.status
+        except (self.aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status = type(e).__name__
+        # Latensi dari waktu terjadwal, bukan saat koneksi didapat (hindari coordinated omission)
+        self.stats(endpoint).record(loop.time() - intended, status, readings)
+        second = self.timeline.setdefault(int(intended - self.started), Counter())
+        second["requests"] += 1
+        second["errors"] += not isinstance(status, int) or status >= 400
+
+    def ingest_request(self) -> Tuple[str, str, str, object, int]:
+        count = self.batch_size or 1
+        readings = []
+        for _ in range(count):
+            device = random.choice(self.simulator.devices)
+            readings.append(self.simulator.build_reading(device["device_id"], random.choice(device["sensors"])))
+        if self.batch_size:
+            return "ingest_batch", "POST", "/readings/batch", readings, count
+        return "ingest", "POST", "/readings", readings[0], 1
+
+    def read_request(self) -> Tuple[str, str, str, object, int]:
+        endpoint = random.choices(list(self.read_mix), weights=list(self.read_mix.values()))[0]
+        if endpoint == "readings":
+            device_id = random.choice(self.device_ids)
+            page = random.randint(1, 5)
+            return endpoint, "GET", f"/devices/{device_id}/readings?page={page}&per_page={self.per_page}", None, 0
+        return endpoint, "GET", f"/{endpoint}", None, 0
+
+    async def drive(self, session, rate: float, make_request: Callable[[], Tuple]):
+        """Issue requests at the profile's rate until the run ends"""
+        loop = asyncio.get_running_loop()
+        scheduled = self.started
+        while True:
+            elapsed = scheduled - self.started
+            if elapsed >= self.duration:
+                return
+            # Laju minimum 1% target agar ramp dari 0 tetap berjalan
+            current = max(profile_rate(self.profile, elapsed, self.duration, rate, self.spike_factor), rate / 100)
+            scheduled += random.expovariate(current)
+            delay = scheduled - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if len(self.in_flight) >= self.max_in_flight:
+                # API tertinggal jauh: catat sebagai dilewati daripada menumpuk task tanpa batas
+                self.skipped += 1
+                continue
+            endpoint, method, path, payload, readings = make_request()
+            task = asyncio.ensure_future(self.request(session, endpoint, method, path, payload, scheduled, readings))
+            self.in_flight.add(task)
+            task.add_done_callback(self.in_flight.discard)
+
+    async def run(self) -> Dict:
+        self.aiohttp = require_aiohttp()
+        connector = self.aiohttp.TCPConnector(limit=self.simulator.connections, keepalive_timeout=60)
+        timeout = self.aiohttp.ClientTimeout(total=self.simulator.timeout)
+        async with self.aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            async with session.get(f"{self.simulator.api_base_url}/devices") as response:
+                self.device_ids = [device["device_id"] for device in await response.json()]
+            if not self.device_ids:
+                self.device_ids = [device["device_id"] for device in self.simulator.devices]
+            loop = asyncio.get_running_loop()
+            self.started = loop.time()
+            started_at = datetime.now()
+            drivers = []
+            if self.ingest_rate > 0:
+                drivers.append(self.drive(session, self.ingest_rate / (self.batch_size or 1), self.ingest_request))
+            if self.read_rate > 0:
+                drivers.append(self.drive(session, self.read_rate, self.read_request))
+            reporter = asyncio.ensure_future(self.report_loop())
+            try:
+                await asyncio.gather(*drivers)
+                if self.in_flight:
+                    await asyncio.gather(*self.in_flight, return_exceptions=True)
+            finally:
+                reporter.cancel()
+            elapsed = loop.time() - self.started
+        return self.report(started_at, elapsed)
+
+    async def report_loop(self):
+        while True:
+            await asyncio.sleep(10)
+            done = sum(stats.latency.count for stats in self.endpoints.values())
+            errors = sum(stats.errors for stats in self.endpoints.values())
+            elapsed = asyncio.get_running_loop().time() - self.started
+            print(f"⏱️  {elapsed:.0f}s | {done} request selesai, {errors} error, "
+                  f"{len(self.in_flight)} berjalan, {self.skipped} dilewati")
+
+    def report(self, started_at: datetime, elapsed: float) -> Dict:
+        ingest = [stats for name, stats in self.endpoints.items() if name.startswith("ingest")]
+        readings = sum(stats.readings for stats in ingest)
+        return {
+            "started_at": started_at.isoformat(timespec="seconds"),
+            "api_url": self.simulator.api_base_url,
+            "profile": self.profile,
+            "duration": round(elapsed, 2),
+            "config": {
+                "ingest_rate": self.ingest_rate,
+                "read_rate": self.read_rate,
+                "read_mix": self.read_mix,
+                "batch_size": self.batch_size,
+                "devices": len(self.simulator.devices),
+                "connections": self.simulator.connections,
+                "spike_factor": self.spike_factor,
+            },
+            "ingest": {"readings": readings, "readings_per_second": round(readings / elapsed, 2)},
+            "skipped": self.skipped,
+            "endpoints": {name: self.endpoints[name].report(elapsed) for name in sorted(self.endpoints)},
+            "timeline": [dict(self.timeline[second], second=second) for second in sorted(self.timeline)],
+        }
+
+
+def print_report(report: Dict):
+    print(f"\n📊 Hasil load test ({report['profile']}, {report['duration']} detik)")
+    print(f"{'endpoint':<14}{'request':>9}{'req/s':>9}{'error':>8}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'max ms':>10}")
+    for name, stats in report["endpoints"].items():
+        latency = stats["latency_ms"]
+        print(f"{name:<14}{stats['requests']:>9}{stats['throughput']:>9.1f}{stats['error_rate']:>8.1%}"
+              f"{latency['p50']:>10.1f}{latency['p95']:>10.1f}{latency['p99']:>10.1f}{latency['max']:>10.1f}")
+    print(f"Ingest: {report['ingest']['readings']} pembacaan ({report['ingest']['readings_per_second']:.0f}/detik), "
+          f"{report['skipped']} request dilewati")
+
+
+def compare_reports(baseline: Dict, current: Dict):
+    """Print throughput, tail latency and error rate changes per endpoint"""
+    def change(old: float, new: float) -> str:
+        return f"{(new - old) / old:+.0%}" if old else "n/a"
+
+    print(f"{'endpoint':<14}{'req/s':>18}{'p95 ms':>20}{'p99 ms':>20}{'error':>16}")
+    for name in sorted(set(baseline["endpoints"]) | set(current["endpoints"])):
+        old, new = baseline["endpoints"].get(name), current["endpoints"].get(name)
+        if not old or not new:
+            print(f"{name:<14} hanya ada di {'report baru' if new else 'baseline'}")
+            continue
+        cells = [f"{metric(new):>10.1f} {change(metric(old), metric(new)):>7}"
+                 for metric in (lambda s: s["throughput"], lambda s: s["latency_ms"]["p95"],
+                                lambda s: s["latency_ms"]["p99"])]
+        print(f"{name:<14}{cells[0]:>18}{cells[1]:>20}{cells[2]:>20}"
+              f"{old['error_rate']:>7.1%} → {new['error_rate']:<6.1%}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test API Sistem Pemantauan Lingkungan IoT")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="Jalankan load test dan tulis report JSON")
+    run_parser.add_argument("--api-url", default="http://localhost:5000/api")
+    run_parser.add_argument("--profile", choices=PROFILES, default="steady")
+    run_parser.add_argument("--duration", type=float, default=60.0, help="Durasi run (detik)")
+    run_parser.add_argument("--ingest-rate", type=float, default=500.0, help="Target pembacaan/detik (0 = tanpa ingest)")
+    run_parser.add_argument("--read-rate", type=float, default=50.0, help="Target request baca/detik (0 = tanpa baca)")
+    run_parser.add_argument("--read-mix", type=parse_mix, default=parse_mix(DEFAULT_READ_MIX),
+                            help=f"Bobot endpoint baca (default: {DEFAULT_READ_MIX})")
+    run_parser.add_argument("--batch-size", type=int, default=0,
+                            help="Pembacaan per POST /readings/batch, 0 = POST /readings per pembacaan")
+    run_parser.add_argument("--devices", type=int, default=100, help="Jumlah perangkat sumber pembacaan")
+    run_parser.add_argument("--connections", type=int, default=100, help="Koneksi keep-alive maksimum")
+    run_parser.add_argument("--max-in-flight", type=int, default=2000)
+    run_parser.add_argument("--spike-factor", type=float, default=5.0, help="Pengali laju saat spike")
+    run_parser.add_argument("--report", default="loadtest-report.json", help="File report JSON")
+    compare_parser = subparsers.add_parser("compare", help="Bandingkan dua report JSON")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        with open(args.baseline) as baseline, open(args.current) as current:
+            compare_reports(json.load(baseline), json.load(current))
+        return 0
+
+    from seed_data import build_devices
+    simulator = AsyncIoTSimulator(args.api_url, connections=args.connections)
+    simulator.devices = build_devices(args.devices)
+    load_test = LoadTest(simulator, args.profile, args.duration, args.ingest_rate, args.read_rate, args.read_mix,
+                         args.batch_size, args.max_in_flight, args.spike_factor)
+    print(f"🚀 Load test {args.profile} {args.duration:g} detik: ingest {args.ingest_rate:g} pembacaan/detik, "
+          f"baca {args.read_rate:g} request/detik → {args.api_url}")
+    started = time.time()
+    try:
+        report = asyncio.run(load_test.run())
+    except KeyboardInterrupt:
+        return 130
+    except OSError as e:
+        print(f"❌ API tidak dapat dihubungi: {e}")
+        return 1
+    print_report(report)
+    with open(args.report, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Report ditulis ke {args.report} ({time.time() - started:.0f} detik)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,828 @@
+#!/usr/bin/env python3
+"""
+Penyimpanan in-memory untuk Sistem Pemantauan Lingkungan IoT
+Dipakai ketika MongoDB tidak tersedia (edge box) atau untuk benchmark lokal.
+Mengimplementasikan subset operasi collection pymongo yang dipakai route API.
+"""
+
+import heapq
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError, WriteError
+from pymongo.operations import UpdateOne
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+EPOCH = datetime(1970, 1, 1)
+
+# Field yang disimpan sekali per seri, bukan per pembacaan
+SERIES_FIELDS = ("sensor_id", "device_id", "sensor_type", "unit")
+READING_FIELDS = SERIES_FIELDS + ("timestamp", "value", "_id")
+
+
+def to_micros(value: datetime) -> int:
+    """Datetime -> microseconds since the (naive) epoch, exact round-trip"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    delta = value - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def from_micros(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=value)
+
+
+# ---------------------------------------------------------------------------
+# Query, projection dan sort ala MongoDB
+# ---------------------------------------------------------------------------
+
+def _type_class(value):
+    if isinstance(value, bool):
+        return bool
+    if isinstance(value, (int, float)):
+        return float
+    return type(value)
+
+
+def _compare(a, b) -> Optional[int]:
+    """Compare like MongoDB within one type class; None if types differ"""
+    if _type_class(a) is not _type_class(b):
+        return None
+    if a < b:
+        return -1
+    return 1 if a > b else 0
+
+
+def _get_values(doc, path: str) -> List:
+    """All values reachable through a dotted path, expanding arrays"""
+    values = [doc]
+    for part in path.split("."):
+        next_values = []
+        for value in values:
+            if isinstance(value, list):
+                value = [v.get(part) for v in value if isinstance(v, dict) and part in v]
+                next_values.extend(value)
+            elif isinstance(value, dict) and part in value:
+                next_values.append(value[part])
+        values = next_values
+    expanded = []
+    for value in values:
+        expanded.append(value)
+        if isinstance(value, list):
+            expanded.extend(value)
+    return expanded
+
+
+def _match_operator(values: List, op: str, operand) -> bool:
+    if op == "$eq":
+        return any(v == operand for v in values)
+    if op == "$ne":
+        return not any(v == operand for v in values)
+    if op == "$in":
+        return any(v in operand for v in values)
+    if op == "$nin":
+        return not any(v in operand for v in values)
+    if op == "$exists":
+        return bool(values) == bool(operand)
+    if op in ("$gt", "$gte", "$lt", "$lte"):
+        for value in values:
+            result = _compare(value, operand)
+            if result is None:
+                continue
+            if (op == "$gt" and result > 0) or (op == "$gte" and result >= 0) \
+                    or (op == "$lt" and result < 0) or (op == "$lte" and result <= 0):
+                return True
+        return False
+    raise NotImplementedError(f"Operator query {op} tidak didukung oleh memory store")
+
+
+def matches(doc: Dict, query: Dict) -> bool:
+    """Evaluate a MongoDB filter document against a document"""
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+            continue
+        values = _get_values(doc, key)
+        if isinstance(condition, dict) and condition and all(k.startswith("$") for k in condition):
+            if not all(_match_operator(values, op, operand) for op, operand in condition.items()):
+                return False
+        elif not any(v == condition for v in values):
+            return False
+    return True
+
+
+def project(doc: Dict, projection: Optional[Dict]) -> Dict:
+    """Apply an inclusion or exclusion projection"""
+    if not projection:
+        return dict(doc)
+    include_id = projection.get("_id", 1)
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if fields and any(fields.values()):
+        result = {k: doc[k] for k in fields if k in doc}
+        if include_id and "_id" in doc:
+            result["_id"] = doc["_id"]
+        return result
+    result = {k: v for k, v in doc.items() if k not in fields}
+    if not include_id:
+        result.pop("_id", None)
+    return result
+
+
+def normalize_sort(key_or_list, direction=None) -> List[Tuple[str, int]]:
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction if direction is not None else 1)]
+    return [(k, d) for k, d in key_or_list]
+
+
+def _sort_key(value):
+    # None/missing first, then numbers, strings, ObjectId, datetime (urutan BSON)
+    order = {type(None): 0, float: 1, str: 2, ObjectId: 3, bool: 4, datetime: 5}
+    type_class = _type_class(value)
+    return (order.get(type_class, 6), value if type_class in order and value is not None else 0)
+
+
+def _first_value(doc: Dict, path: str):
+    if "." not in path:
+        return doc.get(path)
+    values = _get_values(doc, path)
+    return values[0] if values else None
+
+
+def sort_documents(docs: List[Dict], sort: List[Tuple[str, int]]) -> List[Dict]:
+    for key, direction in reversed(sort):
+        docs.sort(key=lambda d: _sort_key(_first_value(d, key)), reverse=direction < 0)
+    return docs
+
+
+def apply_update(doc: Dict, update: Dict, inserting: bool = False):
+    """Apply $set/$setOnInsert/$inc/$min/$max/$push operators in place (top-level fields)"""
+    for op, fields in update.items():
+        for key, operand in fields.items():
+            if op == "$set" or (op == "$setOnInsert" and inserting):
+                doc[key] = operand
+            elif op == "$setOnInsert":
+                continue
+            elif op == "$inc":
+                doc[key] = doc.get(key, 0) + operand
+            elif op in ("$min", "$max"):
+                result = _compare(operand, doc[key]) if key in doc else None
+                if key not in doc or (op == "$min" and result == -1) or (op == "$max" and result == 1):
+                    doc[key] = operand
+            elif op == "$push":
+                items = operand["$each"] if isinstance(operand, dict) and "$each" in operand else [operand]
+                doc.setdefault(key, []).extend(items)
+            else:
+                raise NotImplementedError(f"Operator update {op} tidak didukung oleh memory store")
+
+
+def update_spec(operation) -> Tuple[Dict, Dict, bool]:
+    """(filter, update, upsert) of a bulk update.
+
+    Accepts ``(filter, update[, upsert])`` tuples and ``{"filter", "update", "upsert"}``
+    dicts; build them with ``update_requests`` so the same call site also works
+    against pymongo.
+    """
+    if isinstance(operation, tuple) and len(operation) in (2, 3):
+        query, update, *rest = operation
+        return query, update, bool(rest and rest[0])
+    if isinstance(operation, dict) and "filter" in operation and "update" in operation:
+        return operation["filter"], operation["update"], bool(operation.get("upsert", False))
+    raise TypeError(f"bulk_write memory store hanya menerima tuple (filter, update, upsert) atau dict, "
+                    f"bukan {type(operation).__name__}; gunakan update_requests()")
+
+
+# ---------------------------------------------------------------------------
+# Aggregation pipeline ($match, $group, $sort, $skip, $limit, $project, $count)
+# ---------------------------------------------------------------------------
+
+def _evaluate(expression, doc):
+    if expression == "$$ROOT":
+        return doc
+    if isinstance(expression, str) and expression.startswith("$"):
+        values = _get_values(doc, expression[1:])
+        return values[0] if values else None
+    if isinstance(expression, dict):
+        return {k: _evaluate(v, doc) for k, v in expression.items()}
+    return expression
+
+
+class _Accumulator:
+    def __init__(self, op: str, expression):
+        self.op = op
+        self.expression = expression
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.value = None
+        self.items = []
+
+    def add(self, doc):
+        value = _evaluate(self.expression, doc)
+        if self.op == "$sum":
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.total += value
+                self.count += 1
+        elif self.op in ("$avg", "$stdDevPop"):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                self.count += 1
+                self.total += value
+                self.total_sq += value * value
+        elif self.op == "$min":
+            if value is not None and (self.value is None or _compare(value, self.value) == -1):
+                self.value = value
+        elif self.op == "$max":
+            if value is not None and (self.value is None or _compare(value, self.value) == 1):
+                self.value = value
+        elif self.op == "$first":
+            if not self.count:
+                self.value = value
+            self.count += 1
+        elif self.op == "$last":
+            self.value = value
+        elif self.op == "$push":
+            self.items.append(value)
+        else:
+            raise NotImplementedError(f"Accumulator {self.op} tidak didukung oleh memory store")
+
+    def result(self):
+        if self.op == "$sum":
+            return int(self.total) if self.total == int(self.total) else self.total
+        if self.op == "$avg":
+            return self.total / self.count if self.count else None
+        if self.op == "$stdDevPop":
+            if not self.count:
+                return None
+            mean = self.total / self.count
+            return max(self.total_sq / self.count - mean * mean, 0.0) ** 0.5
+        if self.op == "$push":
+            return self.items
+        return self.value
+
+
+def _group(docs: Iterable[Dict], spec: Dict) -> List[Dict]:
+    id_expression = spec["_id"]
+    fields = {k: v for k, v in spec.items() if k != "_id"}
+    groups = {}
+    for doc in docs:
+        group_id = _evaluate(id_expression, doc)
+        key = repr(group_id) if isinstance(group_id, dict) else group_id
+        if key not in groups:
+            groups[key] = (group_id, {
+                name: _Accumulator(*next(iter(accumulator.items())))
+                for name, accumulator in fields.items()
+            })
+        for accumulator in groups[key][1].values():
+            accumulator.add(doc)
+    return [
+        dict({"_id": group_id}, **{name: acc.result() for name, acc in accumulators.items()})
+        for group_id, accumulators in groups.values()
+    ]
+
+
+def run_pipeline(docs: Iterable[Dict], pipeline: List[Dict]) -> List[Dict]:
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            docs = (d for d in docs if matches(d, spec))
+        elif name == "$group":
+            docs = _group(docs, spec)
+        elif name == "$sort":
+            docs = sort_documents(list(docs), list(spec.items()))
+        elif name == "$skip":
+            docs = islice(docs, spec, None)
+        elif name == "$limit":
+            docs = islice(docs, spec)
+        elif name == "$project":
+            docs = (project(d, spec) for d in docs)
+        elif name == "$count":
+            docs = [{spec: sum(1 for _ in docs)}]
+        else:
+            raise NotImplementedError(f"Stage {name} tidak didukung oleh memory store")
+    return list(docs)
+
+
+# ---------------------------------------------------------------------------
+# Cursor
+# ---------------------------------------------------------------------------
+
+class MemoryCursor:
+    """Lazy cursor supporting the chained sort/skip/limit calls of pymongo"""
+
+    def __init__(self, collection, query: Dict, projection: Optional[Dict]):
+        self.collection = collection
+        self.query = query or {}
+        self.projection = projection
+        self._sort = None
+        self._skip = 0
+        self._limit = 0
+        self._iterator = None
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, skip: int):
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int):
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size: int):
+        return self
+
+    def explain(self) -> Dict:
+        return {"queryPlanner": {"winningPlan": self.collection.explain_plan(self.query, self._sort)}}
+
+    def __iter__(self) -> Iterator[Dict]:
+        return self
+
+    def __next__(self) -> Dict:
+        if self._iterator is None:
+            docs = self.collection.execute(self.query, self._sort, self._skip, self._limit)
+            self._iterator = (project(d, self.projection) for d in docs)
+        return next(self._iterator)
+
+    def close(self):
+        self._iterator = iter(())
+
+
+# ---------------------------------------------------------------------------
+# Collections
+# ---------------------------------------------------------------------------
+
+class BaseCollection:
+    """pymongo-style collection API built on the ``execute``/``explain_plan`` of a subclass"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.RLock()
+        self.indexes = {"_id_": {"key": [("_id", 1)]}}
+
+    def find(self, query: Optional[Dict] = None, projection: Optional[Dict] = None) -> MemoryCursor:
+        return MemoryCursor(self, query, projection)
+
+    def find_one(self, query: Optional[Dict] = None, projection: Optional[Dict] = None) -> Optional[Dict]:
+        return next(self.find(query, projection).limit(1), None)
+
+    def insert_one(self, document: Dict) -> InsertOneResult:
+        document.setdefault("_id", ObjectId())
+        self._insert([document])
+        return InsertOneResult(document["_id"], True)
+
+    def insert_many(self, documents: List[Dict], ordered: bool = True) -> InsertManyResult:
+        documents = list(documents)
+        for document in documents:
+            document.setdefault("_id", ObjectId())
+        errors = self._insert(documents, ordered=ordered, raise_single=False)
+        if errors:
+            inserted = len(documents) - len(errors) if not ordered else errors[0]["index"]
+            raise BulkWriteError({"writeErrors": errors, "nInserted": inserted})
+        return InsertManyResult([d["_id"] for d in documents], True)
+
+    def count_documents(self, query: Dict) -> int:
+        return sum(1 for _ in self.execute(query, None, 0, 0))
+
+    def estimated_document_count(self) -> int:
+        return self.count_documents({})
+
+    def distinct(self, key: str, query: Optional[Dict] = None) -> List:
+        seen = []
+        for doc in self.execute(query or {}, None, 0, 0):
+            for value in _get_values(doc, key):
+                if value not in seen:
+                    seen.append(value)
+        return seen
+
+    def aggregate(self, pipeline: List[Dict], **kwargs) -> Iterator[Dict]:
+        query = {}
+        if pipeline and "$match" in pipeline[0]:
+            query, pipeline = pipeline[0]["$match"], pipeline[1:]
+        return iter(run_pipeline(self.execute(query, None, 0, 0), pipeline))
+
+    def create_indexes(self, indexes) -> List[str]:
+        names = []
+        for index in indexes:
+            document = index.document
+            self.indexes[document["name"]] = {
+                "key": list(document["key"].items()),
+                "unique": document.get("unique", False),
+            }
+            names.append(document["name"])
+        return names
+
+    def create_index(self, keys, **kwargs) -> str:
+        keys = normalize_sort(keys, 1)
+        name = kwargs.get("name") or "_".join(f"{k}_{d}" for k, d in keys)
+        self.indexes[name] = {"key": keys, "unique": kwargs.get("unique", False)}
+        return name
+
+    def drop_index(self, name: str):
+        self.indexes.pop(name, None)
+
+    def index_information(self) -> Dict:
+        return {name: dict(info) for name, info in self.indexes.items()}
+
+
+def update_requests(collection, specs: Iterable[Tuple[Dict, Dict, bool]]) -> List:
+    """Bulk update requests for ``collection`` from ``(filter, update, upsert)`` tuples.
+
+    The memory store takes the tuples as they are; pymongo needs UpdateOne models.
+    """
+    if isinstance(collection, BaseCollection):
+        return list(specs)
+    return [UpdateOne(query, update, upsert=upsert) for query, update, upsert in specs]
+
+
+class DocumentCollection(BaseCollection):
+    """Plain list of documents, used for the device registry and small collections"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.documents: List[Dict] = []
+        self.by_id: Dict = {}
+
+    def _unique_keys(self) -> List[List[str]]:
+        return [[k for k, _ in info["key"]] for info in self.indexes.values() if info.get("unique")]
+
+    def _insert(self, documents: List[Dict], ordered: bool = True, raise_single: bool = True) -> List[Dict]:
+        errors = []
+        with self.lock:
+            unique_keys = self._unique_keys()
+            for index, document in enumerate(documents):
+                duplicate = document["_id"] in self.by_id or any(
+                    all(existing.get(k) == document.get(k) for k in keys)
+                    for keys in unique_keys for existing in self.documents
+                )
+                if duplicate:
+                    message = f"E11000 duplicate key error collection: {self.name}"
+                    if raise_single:
+                        raise DuplicateKeyError(message)
+                    errors.append({"index": index, "code": 11000, "errmsg": message})
+                    if ordered:
+                        break
+                    continue
+                self.documents.append(document)
+                self.by_id[document["_id"]] = document
+        return errors
+
+    def _find_for_update(self, query: Dict) -> Optional[Dict]:
+        # Lookup by _id tanpa scan, dipakai upsert bucket dan rollup
+        if "_id" in query and not isinstance(query["_id"], dict):
+            document = self.by_id.get(query["_id"])
+            return document if document is not None and matches(document, query) else None
+        return next((d for d in self.documents if matches(d, query)), None)
+
+    def update_one(self, query: Dict, update: Dict, upsert: bool = False) -> UpdateResult:
+        with self.lock:
+            document = self._find_for_update(query)
+            if document is not None:
+                apply_update(document, update)
+                return UpdateResult({"n": 1, "nModified": 1, "ok": 1.0}, True)
+            if not upsert:
+                return UpdateResult({"n": 0, "nModified": 0, "ok": 1.0}, True)
+            document = {k: v for k, v in query.items() if not k.startswith("$") and not isinstance(v, dict)}
+            apply_update(document, update, inserting=True)
+            document.setdefault("_id", ObjectId())
+            self._insert([document])
+            return UpdateResult({"n": 1, "nModified": 0, "upserted": document["_id"], "ok": 1.0}, True)
+
+    def bulk_write(self, requests: List, ordered: bool = True) -> BulkWriteResult:
+        """Unordered or ordered update upserts; see ``update_spec`` for the accepted forms"""
+        matched = modified = 0
+        upserted, errors = [], []
+        with self.lock:
+            for index, operation in enumerate(requests):
+                query, update, upsert = update_spec(operation)
+                try:
+                    result = self.update_one(query, update, upsert=upsert)
+                except DuplicateKeyError as e:
+                    # Sama seperti MongoDB: upsert yang bentrok _id dilaporkan per operasi
+                    errors.append({"index": index, "code": 11000, "errmsg": str(e)})
+                    if ordered:
+                        break
+                    continue
+                if result.upserted_id is not None:
+                    upserted.append({"index": index, "_id": result.upserted_id})
+                else:
+                    matched += result.matched_count
+                    modified += result.modified_count
+        details = {
+            "writeErrors": errors, "writeConcernErrors": [], "nInserted": 0, "nUpserted": len(upserted),
+            "nMatched": matched, "nModified": modified, "nRemoved": 0, "upserted": upserted,
+        }
+        if errors:
+            raise BulkWriteError(details)
+        return BulkWriteResult(details, True)
+
+    def delete_one(self, query: Dict) -> DeleteResult:
+        with self.lock:
+            document = self._find_for_update(query)
+            if document is None:
+                return DeleteResult({"n": 0, "ok": 1.0}, True)
+            self.documents = [d for d in self.documents if d is not document]
+            del self.by_id[document["_id"]]
+        return DeleteResult({"n": 1, "ok": 1.0}, True)
+
+    def delete_many(self, query: Dict) -> DeleteResult:
+        with self.lock:
+            kept = [d for d in self.documents if not matches(d, query)]
+            deleted = len(self.documents) - len(kept)
+            self.documents = kept
+            self.by_id = {d["_id"]: d for d in kept}
+        return DeleteResult({"n": deleted, "ok": 1.0}, True)
+
+    def execute(self, query: Dict, sort, skip: int, limit: int) -> Iterator[Dict]:
+        with self.lock:
+            docs = [d for d in self.documents if matches(d, query)]
+        if sort:
+            docs = sort_documents(docs, sort)
+        end = skip + limit if limit else None
+        return iter(docs[skip:end])
+
+    def explain_plan(self, query: Dict, sort) -> Dict:
+        stage = {"stage": "COLLSCAN", "filter": query}
+        sorted_by_index = False
+        for name, info in self.indexes.items():
+            keys = [k for k, _ in info["key"]]
+            if keys and keys[0] in query:
+                stage = {"stage": "IXSCAN", "indexName": name}
+                # Sort pada field index setelah prefix equality tidak butuh SORT
+                sorted_by_index = bool(sort) and [k for k, _ in sort] == keys[1:1 + len(sort)]
+                break
+        plan = {"stage": "FETCH", "inputStage": stage}
+        return {"stage": "SORT", "inputStage": plan} if sort and not sorted_by_index else plan
+
+    def drop(self):
+        with self.lock:
+            self.documents = []
+            self.by_id = {}
+            self.indexes = {"_id_": {"key": [("_id", 1)]}}
+
+
+class Series:
+    """Readings of one sensor in columnar form, kept sorted by timestamp"""
+
+    __slots__ = ("meta", "timestamps", "values", "ids", "extras")
+
+    def __init__(self, meta: Dict):
+        self.meta = meta
+        self.timestamps = array("q")
+        self.values = array("d")
+        self.ids: List = []
+        self.extras: List[Optional[Dict]] = []
+
+    def add(self, timestamp: int, value: float, _id, extra: Optional[Dict]):
+        if not self.timestamps or timestamp >= self.timestamps[-1]:
+            self.timestamps.append(timestamp)
+            self.values.append(value)
+            self.ids.append(_id)
+            self.extras.append(extra)
+            return
+        # Data terlambat: sisipkan di posisi yang benar agar tetap terurut
+        position = bisect_right(self.timestamps, timestamp)
+        self.timestamps.insert(position, timestamp)
+        self.values.insert(position, value)
+        self.ids.insert(position, _id)
+        self.extras.insert(position, extra)
+
+    def bounds(self, low: Optional[int], low_inclusive: bool,
+               high: Optional[int], high_inclusive: bool) -> Tuple[int, int]:
+        """Index range [start, end) of readings within the time bounds (binary search)"""
+        start = 0 if low is None else (
+            bisect_left(self.timestamps, low) if low_inclusive else bisect_right(self.timestamps, low))
+        end = len(self.timestamps) if high is None else (
+            bisect_right(self.timestamps, high) if high_inclusive else bisect_left(self.timestamps, high))
+        return start, max(start, end)
+
+    def document(self, timestamp: int, value: float, _id, extra: Optional[Dict]) -> Dict:
+        doc = dict(self.meta)
+        doc["_id"] = _id
+        doc["timestamp"] = from_micros(timestamp)
+        doc["value"] = value
+        if extra:
+            doc.update(extra)
+        return doc
+
+
+class ReadingsCollection(BaseCollection):
+    """Sensor readings stored per series in sorted timestamp/value arrays"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.series: Dict[Tuple, Series] = {}
+        # Index unik _id seperti di MongoDB
+        self.ids = set()
+
+    def _insert(self, documents: List[Dict], ordered: bool = True, raise_single: bool = True) -> List[Dict]:
+        errors = []
+        with self.lock:
+            for index, document in enumerate(documents):
+                timestamp = document.get("timestamp")
+                value = document.get("value")
+                if not isinstance(timestamp, datetime) or not isinstance(value, (int, float)):
+                    message = "Reading requires a datetime 'timestamp' and a numeric 'value'"
+                    if raise_single:
+                        raise WriteError(message, code=2)
+                    errors.append({"index": index, "code": 2, "errmsg": message})
+                    if ordered:
+                        break
+                    continue
+                if document["_id"] in self.ids:
+                    message = f"E11000 duplicate key error collection: {self.name} index: _id_"
+                    if raise_single:
+                        raise DuplicateKeyError(message)
+                    errors.append({"index": index, "code": 11000, "errmsg": message})
+                    if ordered:
+                        break
+                    continue
+                self.ids.add(document["_id"])
+                key = tuple(document.get(f) for f in SERIES_FIELDS)
+                series = self.series.get(key)
+                if series is None:
+                    series = self.series[key] = Series(
+                        {f: document[f] for f in SERIES_FIELDS if f in document})
+                extra = {k: v for k, v in document.items() if k not in READING_FIELDS} or None
+                series.add(to_micros(timestamp), float(value), document["_id"], extra)
+        return errors
+
+    def _plan(self, query: Dict):
+        """Split a filter into series pruning, a timestamp range and a residual filter"""
+        meta = {}
+        residual = {}
+        low = high = None
+        low_inclusive = high_inclusive = True
+        for key, condition in query.items():
+            if key in SERIES_FIELDS and not isinstance(condition, dict):
+                meta[key] = condition
+            elif key == "timestamp" and isinstance(condition, dict) and condition \
+                    and all(isinstance(v, datetime) for v in condition.values()) \
+                    and set(condition) <= {"$gt", "$gte", "$lt", "$lte"}:
+                if "$gte" in condition:
+                    low = to_micros(condition["$gte"])
+                if "$gt" in condition:
+                    low, low_inclusive = to_micros(condition["$gt"]), False
+                if "$lte" in condition:
+                    high = to_micros(condition["$lte"])
+                if "$lt" in condition:
+                    high, high_inclusive = to_micros(condition["$lt"]), False
+            else:
+                residual[key] = condition
+        series = [
+            s for key, s in self.series.items()
+            if all(s.meta.get(f) == v for f, v in meta.items())
+        ]
+        return series, (low, low_inclusive, high, high_inclusive), residual
+
+    def _slices(self, query: Dict, needed: Optional[int], descending: bool):
+        """Copy the matching column slices under the lock"""
+        with self.lock:
+            series_list, bounds, residual = self._plan(query)
+            slices = []
+            for series in series_list:
+                start, end = series.bounds(*bounds)
+                if needed is not None and not residual:
+                    # Hanya ujung range yang dibutuhkan untuk sort+limit
+                    if descending:
+                        start = max(start, end - needed)
+                    else:
+                        end = min(end, start + needed)
+                if start < end:
+                    slices.append((series, series.timestamps[start:end], series.values[start:end],
+                                   series.ids[start:end], series.extras[start:end]))
+        return slices, residual
+
+    @staticmethod
+    def _rows(series, timestamps, values, ids, extras, descending: bool):
+        indexes = range(len(timestamps) - 1, -1, -1) if descending else range(len(timestamps))
+        for i in indexes:
+            yield (timestamps[i], series, values[i], ids[i], extras[i])
+
+    def execute(self, query: Dict, sort, skip: int, limit: int) -> Iterator[Dict]:
+        by_time = not sort or (sort[0][0] == "timestamp" and all(k in ("timestamp", "_id") for k, _ in sort))
+        descending = bool(sort) and sort[0][1] < 0
+        needed = skip + limit if (limit and sort and by_time) else None
+        slices, residual = self._slices(query, needed, descending)
+
+        if by_time:
+            # k-way merge seri yang sudah terurut, tanpa sort penuh
+            streams = [self._rows(*s, descending=descending) for s in slices]
+            if not sort:
+                rows = (row for stream in streams for row in stream)
+            elif any(k == "_id" for k, _ in sort):
+                rows = heapq.merge(*streams, key=lambda r: (r[0], r[3]), reverse=descending)
+            else:
+                rows = heapq.merge(*streams, key=lambda r: r[0], reverse=descending)
+            docs = (series.document(ts, value, _id, extra) for ts, series, value, _id, extra in rows)
+            if residual:
+                docs = (d for d in docs if matches(d, residual))
+            return islice(docs, skip, skip + limit if limit else None)
+
+        docs = [
+            series.document(ts, value, _id, extra)
+            for s in slices for ts, series, value, _id, extra in self._rows(*s, descending=False)
+        ]
+        if residual:
+            docs = [d for d in docs if matches(d, residual)]
+        docs = sort_documents(docs, sort)
+        return iter(docs[skip:skip + limit if limit else None])
+
+    def delete_many(self, query: Dict) -> DeleteResult:
+        deleted = 0
+        with self.lock:
+            series_list, bounds, residual = self._plan(query)
+            for series in series_list:
+                start, end = series.bounds(*bounds)
+                if not residual:
+                    self.ids.difference_update(series.ids[start:end])
+                    del series.timestamps[start:end], series.values[start:end]
+                    del series.ids[start:end], series.extras[start:end]
+                    deleted += end - start
+                    continue
+                positions = [
+                    i for i in range(start, end)
+                    if matches(series.document(series.timestamps[i], series.values[i],
+                                               series.ids[i], series.extras[i]), residual)
+                ]
+                # Dari belakang agar posisi yang belum dihapus tidak bergeser
+                for i in reversed(positions):
+                    self.ids.discard(series.ids[i])
+                    del series.timestamps[i], series.values[i], series.ids[i], series.extras[i]
+                deleted += len(positions)
+            self.series = {key: s for key, s in self.series.items() if len(s.timestamps)}
+        return DeleteResult({"n": deleted, "ok": 1.0}, True)
+
+    def count_documents(self, query: Dict) -> int:
+        with self.lock:
+            series_list, bounds, residual = self._plan(query)
+            if not residual:
+                return sum(end - start for start, end in (s.bounds(*bounds) for s in series_list))
+        return super().count_documents(query)
+
+    def distinct(self, key: str, query: Optional[Dict] = None) -> List:
+        if key in SERIES_FIELDS and not query:
+            with self.lock:
+                values = []
+                for series in self.series.values():
+                    value = series.meta.get(key)
+                    if value is not None and value not in values and len(series.timestamps):
+                        values.append(value)
+                return values
+        return super().distinct(key, query)
+
+    def explain_plan(self, query: Dict, sort) -> Dict:
+        meta_keys = [k for k in query if k in SERIES_FIELDS and not isinstance(query[k], dict)]
+        by_time = not sort or all(k in ("timestamp", "_id") for k, _ in sort)
+        if meta_keys:
+            stage = {"stage": "IXSCAN", "indexName": "series_" + "_".join(meta_keys) + "_timestamp"}
+        else:
+            stage = {"stage": "COLLSCAN", "filter": query}
+        plan = {"stage": "FETCH", "inputStage": stage}
+        return plan if by_time else {"stage": "SORT", "inputStage": plan}
+
+    def drop(self):
+        with self.lock:
+            self.series = {}
+            self.ids = set()
+            self.indexes = {"_id_": {"key": [("_id", 1)]}}
+
+
+class MemoryDatabase:
+    """Minimal stand-in for a pymongo Database backed by in-memory collections"""
+
+    COLUMNAR_COLLECTIONS = ("sensor_readings",)
+
+    def __init__(self, name: str = "iot_monitoring"):
+        self.name = name
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, name: str):
+        with self._lock:
+            if name not in self._collections:
+                collection_class = ReadingsCollection if name in self.COLUMNAR_COLLECTIONS else DocumentCollection
+                self._collections[name] = collection_class(name)
+            return self._collections[name]
+
+    def __getattr__(self, name: str):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    def create_collection(self, name: str, **options):
+        # Opsi collection (mis. timeseries) diabaikan, collection dibuat seperti biasa
+        return self[name]
+
+    def list_collection_names(self) -> List[str]:
+        return list(self._collections)
@@ -0,0 +1,738 @@
+#!/usr/bin/env python3
+"""
+Layout penyimpanan pembacaan sensor untuk Sistem Pemantauan Lingkungan IoT
+'documents' menyimpan satu dokumen per pembacaan di sensor_readings, 'buckets'
+menyimpan satu dokumen per sensor per jam di sensor_readings_buckets berisi
+array pembacaan (paling banyak BUCKET_MAX_READINGS, sisanya pindah ke bucket
+berikutnya di jam yang sama) serta agregat min/max/sum/count, dan 'timeseries' memakai
+time-series collection MongoDB sensor_readings_ts (metaField 'meta').
+Read layer mengembalikan dokumen pembacaan dengan bentuk yang sama sehingga
+route API tidak berubah.
+
+Migrasi data lama:
+    python readings_store.py migrate --to buckets
+    python readings_store.py migrate --to timeseries --granularity minutes
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import ASCENDING, DESCENDING, IndexModel, MongoClient
+from pymongo.errors import BulkWriteError, OperationFailure
+from pymongo.results import DeleteResult, InsertManyResult, InsertOneResult
+
+from indexes import MANAGED_INDEXES
+from memory_store import BaseCollection, matches, sort_documents, update_requests
+
+READINGS_COLLECTION = "sensor_readings"
+BUCKETS_COLLECTION = "sensor_readings_buckets"
+TIMESERIES_COLLECTION = "sensor_readings_ts"
+LAYOUTS = ("documents", "buckets", "timeseries")
+# Dokumen di collection metadata yang menghitung perubahan massal pembacaan (seed, retensi)
+READINGS_VERSION_ID = "readings"
+# Versi per sensor per hari yang dinaikkan setiap penulisan (validator HTTP)
+READINGS_VERSIONS_COLLECTION = "readings_versions"
+GRANULARITIES = ("seconds", "minutes", "hours")
+# Versi MongoDB pertama yang mengizinkan delete time-series dengan filter selain metaField
+TIMESERIES_DELETE_VERSION = (7, 0)
+
+# Field yang disimpan sekali per bucket, bukan per pembacaan
+META_FIELDS = ("sensor_id", "device_id", "sensor_type", "unit")
+BUCKET_SPAN = timedelta(hours=1)
+# Batas pembacaan per bucket, jauh di bawah batas dokumen 16MB (~100 byte per pembacaan)
+BUCKET_MAX_READINGS = 1000
+
+BUCKET_INDEXES = [
+    IndexModel([("sensor_id", ASCENDING), ("start", DESCENDING)], name="sensor_id_start"),
+    IndexModel([("device_id", ASCENDING), ("start", DESCENDING)], name="device_id_start"),
+    IndexModel([("sensor_type", ASCENDING), ("start", DESCENDING)], name="sensor_type_start"),
+]
+
+_LOWER_BOUNDS = ("$gt", "$gte")
+_UPPER_BOUNDS = ("$lt", "$lte")
+# Akumulator $group atas "$value" yang bisa dihitung dari ringkasan bucket
+_SUMMARY_ACCUMULATORS = ("$sum", "$avg", "$min", "$max", "$stdDevPop")
+
+
+def bucket_start(timestamp: datetime) -> datetime:
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def bucket_id(reading: Dict, start: datetime, sequence: int = 0) -> str:
+    # _id deterministik: upsert dari beberapa proses selalu jatuh ke bucket yang sama
+    key = f"{reading['sensor_id']}:{reading['device_id']}:{start:%Y%m%d%H}"
+    # Bucket lanjutan untuk jam yang sama setelah bucket sebelumnya penuh
+    return f"{key}:{sequence}" if sequence else key
+
+
+def bucket_documents(bucket: Dict) -> Iterator[Dict]:
+    """Expand a bucket into reading documents shaped like the documents layout"""
+    meta = {k: bucket[k] for k in META_FIELDS if k in bucket}
+    for item in bucket.get("readings", []):
+        document = dict(meta)
+        document.update(item)
+        yield document
+
+
+def _reading_order(document: Dict):
+    return document["timestamp"], document["_id"]
+
+
+class BucketedReadings(BaseCollection):
+    """``sensor_readings`` API on top of one document per sensor per hour.
+
+    Writes are grouped per bucket and applied as unordered upserts that push the
+    readings and maintain count/sum/sum_sq/min/max/first/last. An upsert only matches
+    a bucket with room for its readings; a full bucket turns it into a duplicate
+    key error and the readings move on to the next sequence number of that
+    hour, so no bucket grows past BUCKET_MAX_READINGS. Reads prune buckets with
+    the meta fields and the timestamp range, then unwind them in start order so a
+    time-sorted query with a limit only touches the newest (or oldest) buckets.
+    Grouped statistics take whole buckets from those summary fields and only
+    unwind the buckets at the edges of the time range.
+    """
+
+    def __init__(self, buckets):
+        super().__init__(READINGS_COLLECTION)
+        self.buckets = buckets
+        # Nomor urut bucket yang sedang diisi per sensor per jam (hanya petunjuk, boleh tertinggal)
+        self.sequences: Dict[str, int] = {}
+
+    # -- writes -------------------------------------------------------------
+
+    def insert_one(self, document: Dict) -> InsertOneResult:
+        self.insert_many([document])
+        return InsertOneResult(document["_id"], True)
+
+    def insert_many(self, documents: List[Dict], ordered: bool = True) -> InsertManyResult:
+        """Push readings into their buckets; bucket writes are always unordered"""
+        documents = list(documents)
+        groups: Dict[str, Tuple[Dict, List[int]]] = {}
+        for index, document in enumerate(documents):
+            document.setdefault("_id", ObjectId())
+            start = bucket_start(document["timestamp"])
+            key = bucket_id(document, start)
+            if key not in groups:
+                groups[key] = (dict({k: document.get(k) for k in META_FIELDS}, start=start), [])
+            groups[key][1].append(index)
+
+        pending = [
+            (key, meta, indexes[i:i + BUCKET_MAX_READINGS])
+            for key, (meta, indexes) in groups.items()
+            for i in range(0, len(indexes), BUCKET_MAX_READINGS)
+        ]
+        if len(self.sequences) > 100000:
+            self.sequences.clear()
+        errors = []
+        while pending:
+            sequences = [self.sequences.get(key, 0) for key, _, _ in pending]
+            operations = update_requests(self.buckets, (
+                self._push(documents, sequence, meta, indexes)
+                for (_, meta, indexes), sequence in zip(pending, sequences)))
+            try:
+                self.buckets.bulk_write(operations, ordered=False)
+                pending = []
+            except BulkWriteError as e:
+                retry = []
+                for error in e.details.get("writeErrors", []):
+                    key, meta, indexes = pending[error["index"]]
+                    if error.get("code") == 11000:
+                        # Bucket penuh: coba bucket berikutnya pada jam yang sama
+                        self.sequences[key] = max(self.sequences.get(key, 0), sequences[error["index"]] + 1)
+                        retry.append((key, meta, indexes))
+                    else:
+                        # Laporkan kegagalan per pembacaan, bukan per bucket
+                        errors.extend(dict(error, index=position) for position in indexes)
+                pending = retry
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(documents) - len(errors)})
+        return InsertManyResult([d["_id"] for d in documents], True)
+
+    @staticmethod
+    def _push(documents: List[Dict], sequence: int, meta: Dict, indexes: List[int]) -> Tuple[Dict, Dict, bool]:
+        items = [{k: v for k, v in documents[i].items() if k not in META_FIELDS} for i in indexes]
+        values = [item["value"] for item in items]
+        timestamps = [item["timestamp"] for item in items]
+        # Hanya cocok dengan bucket yang masih muat; bucket penuh membuat upsert gagal dengan duplicate key
+        return ({"_id": bucket_id(meta, meta["start"], sequence),
+                 "count": {"$lte": BUCKET_MAX_READINGS - len(items)}}, {
+            "$setOnInsert": dict(meta, end=meta["start"] + BUCKET_SPAN),
+            "$push": {"readings": {"$each": items}},
+            "$inc": {"count": len(items), "sum": sum(values), "sum_sq": sum(v * v for v in values)},
+            "$min": {"min": min(values), "first": min(timestamps)},
+            "$max": {"max": max(values), "last": max(timestamps)},
+        }, True)
+
+    def delete_many(self, query: Dict) -> DeleteResult:
+        """Drop whole buckets inside the filter; rewrite the buckets it only partly covers"""
+        bucket_query, residual = self._bucket_query(query)
+        condition = {"timestamp": query["timestamp"]} if "timestamp" in query else {}
+        whole, deleted = [], 0
+        for bucket in self.buckets.find(bucket_query, {"readings": 0}):
+            if not residual and matches({"timestamp": bucket["first"]}, condition) \
+                    and matches({"timestamp": bucket["last"]}, condition):
+                whole.append(bucket["_id"])
+                deleted += bucket["count"]
+                continue
+            full = self.buckets.find_one({"_id": bucket["_id"]})
+            kept = [item for item, document in zip(full["readings"], bucket_documents(full))
+                    if not matches(document, query)]
+            if len(kept) == len(full["readings"]):
+                continue
+            deleted += len(full["readings"]) - len(kept)
+            if not kept:
+                whole.append(bucket["_id"])
+                continue
+            values = [item["value"] for item in kept]
+            timestamps = [item["timestamp"] for item in kept]
+            self.buckets.update_one({"_id": bucket["_id"]}, {"$set": {
+                "readings": kept, "count": len(kept), "sum": sum(values), "sum_sq": sum(v * v for v in values),
+                "min": min(values), "max": max(values), "first": min(timestamps), "last": max(timestamps),
+            }})
+        if whole:
+            self.buckets.delete_many({"_id": {"$in": whole}})
+        return DeleteResult({"n": deleted, "ok": 1.0}, True)
+
+    # -- reads --------------------------------------------------------------
+
+    @staticmethod
+    def _bucket_query(query: Dict) -> Tuple[Dict, bool]:
+        """Translate a reading filter into a bucket filter; flag conditions left for the unwound readings"""
+        bucket_query, residual = {}, False
+        for key, condition in query.items():
+            if key in META_FIELDS:
+                bucket_query[key] = condition
+            elif key == "timestamp" and isinstance(condition, dict) and condition and all(
+                    op in _LOWER_BOUNDS + _UPPER_BOUNDS and isinstance(bound, datetime)
+                    for op, bound in condition.items()):
+                for op, bound in condition.items():
+                    if op in _LOWER_BOUNDS:
+                        bucket_query.setdefault("end", {})["$gt"] = bound
+                    else:
+                        bucket_query.setdefault("start", {})[op] = bound
+            else:
+                residual = True
+        return bucket_query, residual
+
+    def _unwind(self, query: Dict, descending: bool) -> Iterator[Dict]:
+        # Bucket dengan start yang sama mencakup jam yang sama: cukup urutkan per jam
+        bucket_query, _ = self._bucket_query(query)
+        cursor = self.buckets.find(bucket_query).sort("start", DESCENDING if descending else ASCENDING)
+        group, group_start = [], None
+        for bucket in cursor:
+            if bucket["start"] != group_start:
+                yield from sorted(group, key=_reading_order, reverse=descending)
+                group, group_start = [], bucket["start"]
+            group.extend(d for d in bucket_documents(bucket) if matches(d, query))
+        yield from sorted(group, key=_reading_order, reverse=descending)
+
+    def execute(self, query: Dict, sort, skip: int, limit: int) -> Iterator[Dict]:
+        by_time = not sort or (sort[0][0] == "timestamp" and all(k in ("timestamp", "_id") for k, _ in sort))
+        descending = bool(sort) and sort[0][1] < 0
+        docs = self._unwind(query, descending)
+        if by_time:
+            return islice(docs, skip, skip + limit if limit else None)
+        docs = sort_documents(list(docs), sort)
+        return iter(docs[skip:skip + limit if limit else None])
+
+    def explain_plan(self, query: Dict, sort) -> Dict:
+        bucket_query, _ = self._bucket_query(query)
+        cursor = self.buckets.find(bucket_query).sort("start", DESCENDING).limit(1)
+        return cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+
+    def count_documents(self, query: Dict) -> int:
+        bucket_query, residual = self._bucket_query(query)
+        if residual:
+            return super().count_documents(query)
+        if "timestamp" not in query:
+            return self._sum_counts(bucket_query)
+        # Bucket yang seluruhnya di dalam rentang dihitung dari field count
+        total = 0
+        condition = {"timestamp": query["timestamp"]}
+        for bucket in self.buckets.find(bucket_query, {"readings": 0}):
+            if matches({"timestamp": bucket["first"]}, condition) and matches({"timestamp": bucket["last"]}, condition):
+                total += bucket["count"]
+            else:
+                full = self.buckets.find_one({"_id": bucket["_id"]})
+                total += sum(1 for d in bucket_documents(full) if matches(d, query))
+        return total
+
+    @staticmethod
+    def _summary_plan(pipeline: List[Dict]) -> Optional[Tuple[Dict, Dict, Optional[Dict]]]:
+        """(match, group, value filter) of a [$match, $group] pipeline over ``$value``, else None"""
+        if len(pipeline) != 2 or "$match" not in pipeline[0] or "$group" not in pipeline[1]:
+            return None
+        match, group = dict(pipeline[0]["$match"]), pipeline[1]["$group"]
+        key = group["_id"]
+        if key is not None and not (isinstance(key, str) and key[1:] in META_FIELDS and key[0] == "$"):
+            return None
+        accumulators = [next(iter(spec.items())) for name, spec in group.items() if name != "_id"]
+        if not all(op in _SUMMARY_ACCUMULATORS and (operand == "$value" or (op == "$sum" and operand == 1))
+                   for op, operand in accumulators):
+            return None
+        value = match.pop("value", None)
+        if value is not None:
+            # Filter nilai hanya cocok dengan ringkasan untuk $max: bucket dipilih lewat field max
+            if not (isinstance(value, dict) and len(value) == 1 and set(value) <= set(_LOWER_BOUNDS)
+                    and all(op == "$max" for op, _ in accumulators)):
+                return None
+        return match, group, value
+
+    def aggregate(self, pipeline: List[Dict], **kwargs) -> Iterator[Dict]:
+        """Grouped stats over ``$value`` from bucket summaries, other pipelines on unwound readings"""
+        plan = self._summary_plan(pipeline)
+        if plan is None:
+            return super().aggregate(pipeline, **kwargs)
+        match, group, value = plan
+        bucket_query, residual = self._bucket_query(match)
+        if residual:
+            return super().aggregate(pipeline, **kwargs)
+        if value is not None:
+            bucket_query["max"] = value
+        query = dict(match, value=value) if value is not None else match
+        condition = {"timestamp": match["timestamp"]} if "timestamp" in match else {}
+        needs_sum_sq = any("$stdDevPop" in spec for name, spec in group.items() if name != "_id")
+        key_field = group["_id"][1:] if group["_id"] else None
+        totals: Dict = {}
+
+        def add(key, count, total, total_sq, low, high):
+            entry = totals.setdefault(key, [0, 0.0, 0.0, low, high])
+            entry[0] += count
+            entry[1] += total
+            entry[2] += total_sq
+            entry[3] = min(entry[3], low)
+            entry[4] = max(entry[4], high)
+
+        for bucket in self.buckets.find(bucket_query, {"readings": 0}):
+            key = bucket.get(key_field) if key_field else None
+            if matches({"timestamp": bucket["first"]}, condition) and matches({"timestamp": bucket["last"]}, condition) \
+                    and (value is not None or not needs_sum_sq or "sum_sq" in bucket):
+                # Bucket sepenuhnya di dalam rentang: cukup field ringkasannya
+                add(key, bucket["count"], bucket["sum"], bucket.get("sum_sq", 0.0), bucket["min"], bucket["max"])
+                continue
+            # Bucket di tepi rentang (atau bucket lama tanpa sum_sq): bongkar pembacaannya
+            for document in bucket_documents(self.buckets.find_one({"_id": bucket["_id"]})):
+                if matches(document, query):
+                    v = document["value"]
+                    add(document.get(key_field) if key_field else key, 1, v, v * v, v, v)
+
+        results = []
+        for key, (count, total, total_sq, low, high) in totals.items():
+            row = {"_id": key}
+            mean = total / count
+            for name, spec in group.items():
+                if name == "_id":
+                    continue
+                op, operand = next(iter(spec.items()))
+                row[name] = {
+                    "$sum": count if operand == 1 else total,
+                    "$avg": mean,
+                    "$min": low,
+                    "$max": high,
+                    "$stdDevPop": max(total_sq / count - mean * mean, 0.0) ** 0.5,
+                }[op]
+            results.append(row)
+        return iter(results)
+
+    def _sum_counts(self, bucket_query: Dict) -> int:
+        rows = list(self.buckets.aggregate([
+            {"$match": bucket_query},
+            {"$group": {"_id": None, "count": {"$sum": "$count"}}},
+        ]))
+        return rows[0]["count"] if rows else 0
+
+    def estimated_document_count(self) -> int:
+        return self._sum_counts({})
+
+    def distinct(self, key: str, query: Optional[Dict] = None) -> List:
+        bucket_query, residual = self._bucket_query(query or {})
+        if key in META_FIELDS and not residual:
+            return self.buckets.distinct(key, bucket_query)
+        return super().distinct(key, query)
+
+    def latest_per(self, field: str) -> Dict[str, Dict]:
+        """Newest reading per value of a meta field, found through the bucket ``last`` field"""
+        rows = self.buckets.aggregate([
+            {"$sort": {field: ASCENDING, "last": DESCENDING}},
+            {"$group": {"_id": f"${field}", "bucket_id": {"$first": "$_id"}}},
+        ], allowDiskUse=True)
+        owners = {row["bucket_id"]: row["_id"] for row in rows if row["_id"] is not None}
+        latest = {}
+        for bucket in self.buckets.find({"_id": {"$in": list(owners)}}):
+            latest[owners[bucket["_id"]]] = max(bucket_documents(bucket), key=_reading_order)
+        return latest
+
+    # -- indexes ------------------------------------------------------------
+
+    def create_indexes(self, indexes) -> List[str]:
+        # Index per pembacaan tidak berlaku; bucket memakai index (meta, start)
+        return self.buckets.create_indexes(BUCKET_INDEXES)
+
+    def drop_index(self, name: str):
+        if name in self.buckets.index_information():
+            self.buckets.drop_index(name)
+
+    def index_information(self) -> Dict:
+        return self.buckets.index_information()
+
+    def drop(self):
+        self.buckets.drop()
+
+
+class ReadingsDatabase:
+    """Database wrapper whose ``sensor_readings`` collection uses another storage layout"""
+
+    def __init__(self, db, readings):
+        self.db = db
+        self.sensor_readings = readings
+
+    def __getitem__(self, name: str):
+        if name == READINGS_COLLECTION:
+            return self.sensor_readings
+        return self.db[name]
+
+    def __getattr__(self, name: str):
+        return getattr(self.db, name)
+
+
+def meta_key(key: str) -> str:
+    return f"meta.{key}" if key in META_FIELDS else key
+
+
+def meta_query(query: Dict) -> Dict:
+    """Rewrite a reading filter to the nested meta fields of the time-series layout"""
+    translated = {}
+    for key, condition in query.items():
+        if key in ("$and", "$or", "$nor"):
+            translated[key] = [meta_query(sub) for sub in condition]
+        else:
+            translated[meta_key(key)] = condition
+    return translated
+
+
+def meta_expression(expression):
+    """Rewrite ``$field`` references in an aggregation expression"""
+    if isinstance(expression, str) and expression.startswith("$") and expression[1:] in META_FIELDS:
+        return "$meta." + expression[1:]
+    if isinstance(expression, dict):
+        return {k: meta_expression(v) for k, v in expression.items()}
+    if isinstance(expression, list):
+        return [meta_expression(v) for v in expression]
+    return expression
+
+
+def meta_pipeline(pipeline: List[Dict]) -> List[Dict]:
+    translated = []
+    for stage in pipeline:
+        (name, spec), = stage.items()
+        if name == "$match":
+            spec = meta_query(spec)
+        elif name == "$sort":
+            spec = {meta_key(k): d for k, d in spec.items()}
+        else:
+            spec = meta_expression(spec)
+        translated.append({name: spec})
+    return translated
+
+
+def to_timeseries(reading: Dict) -> Dict:
+    document = {k: v for k, v in reading.items() if k not in META_FIELDS}
+    document["meta"] = {k: reading[k] for k in META_FIELDS if k in reading}
+    return document
+
+
+def from_timeseries(document: Dict) -> Dict:
+    reading = dict(document.get("meta") or {})
+    reading.update((k, v) for k, v in document.items() if k != "meta")
+    return reading
+
+
+class TimeSeriesReadings(BaseCollection):
+    """``sensor_readings`` API on top of a MongoDB time-series collection.
+
+    The device/sensor fields live in the ``meta`` object (the metaField), so
+    filters, sorts and aggregation expressions are rewritten to ``meta.*`` and
+    documents are flattened again on the way out. Compression, bucketing and
+    bucket-level pruning are done by the server.
+
+    Before MongoDB 7.0 a time-series delete may only filter on the metaField,
+    so deletes by timestamp (retention 'delete' mode) need 7.0 or the TTL mode.
+    """
+
+    def __init__(self, db, granularity: str = "minutes", name: str = TIMESERIES_COLLECTION):
+        super().__init__(READINGS_COLLECTION)
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Granularity tidak dikenal: {granularity} (pilihan: {', '.join(GRANULARITIES)})")
+        self.db = db
+        self.collection_name = name
+        self.granularity = granularity
+        self._server_version = None
+        self.ensure_collection()
+
+    def server_version(self) -> Optional[Tuple[int, ...]]:
+        """(major, minor) of the MongoDB server, None for in-memory storage"""
+        # Cek pada class: atribut tak dikenal pada MemoryDatabase adalah collection
+        client = getattr(type(self.db), "client", None) and self.db.client
+        if client is None:
+            return None
+        if self._server_version is None:
+            self._server_version = tuple(client.server_info()["versionArray"][:2])
+        return self._server_version
+
+    def supports_time_deletes(self) -> bool:
+        version = self.server_version()
+        return version is None or version >= TIMESERIES_DELETE_VERSION
+
+    @property
+    def collection(self):
+        return self.db[self.collection_name]
+
+    def ensure_collection(self):
+        """Create the time-series collection unless it already exists"""
+        if self.collection_name not in self.db.list_collection_names():
+            self.db.create_collection(self.collection_name, timeseries={
+                "timeField": "timestamp",
+                "metaField": "meta",
+                "granularity": self.granularity,
+            })
+
+    def insert_one(self, document: Dict) -> InsertOneResult:
+        document.setdefault("_id", ObjectId())
+        self.collection.insert_one(to_timeseries(document))
+        return InsertOneResult(document["_id"], True)
+
+    def insert_many(self, documents: List[Dict], ordered: bool = True) -> InsertManyResult:
+        documents = list(documents)
+        for document in documents:
+            document.setdefault("_id", ObjectId())
+        # Urutan dokumen sama, jadi index writeErrors tetap merujuk ke pembacaan asal
+        self.collection.insert_many([to_timeseries(d) for d in documents], ordered=ordered)
+        return InsertManyResult([d["_id"] for d in documents], True)
+
+    def delete_many(self, query: Dict) -> DeleteResult:
+        if any(key not in META_FIELDS for key in query) and not self.supports_time_deletes():
+            version = ".".join(map(str, self.server_version()))
+            raise OperationFailure(f"Delete time-series dengan filter {', '.join(query)} butuh MongoDB 7.0+ "
+                                   f"(server {version}); gunakan RETENTION_MODE=ttl")
+        return self.collection.delete_many(meta_query(query))
+
+    def execute(self, query: Dict, sort, skip: int, limit: int) -> Iterator[Dict]:
+        cursor = self.collection.find(meta_query(query))
+        if sort:
+            cursor = cursor.sort([(meta_key(k), d) for k, d in sort])
+        if skip:
+            cursor = cursor.skip(skip)
+        if limit:
+            cursor = cursor.limit(limit)
+        return (from_timeseries(d) for d in cursor)
+
+    def explain_plan(self, query: Dict, sort) -> Dict:
+        cursor = self.collection.find(meta_query(query))
+        if sort:
+            cursor = cursor.sort([(meta_key(k), d) for k, d in sort])
+        return cursor.limit(1).explain().get("queryPlanner", {}).get("winningPlan", {})
+
+    def count_documents(self, query: Dict) -> int:
+        return self.collection.count_documents(meta_query(query))
+
+    def estimated_document_count(self) -> int:
+        """Measurement count from the collection metadata ($collStats), without a scan"""
+        try:
+            stats = list(self.collection.aggregate([{"$collStats": {"count": {}}}]))
+        except OperationFailure:
+            # Server yang belum mendukung $collStats count pada time-series: hitung penuh
+            return self.collection.count_documents({})
+        # Satu dokumen per shard
+        return sum(s.get("count", 0) for s in stats)
+
+    def distinct(self, key: str, query: Optional[Dict] = None) -> List:
+        return self.collection.distinct(meta_key(key), meta_query(query or {}))
+
+    def aggregate(self, pipeline: List[Dict], **kwargs) -> Iterator[Dict]:
+        return self.collection.aggregate(meta_pipeline(pipeline), **kwargs)
+
+    def latest_per(self, field: str) -> Dict[str, Dict]:
+        """Newest reading per meta field value (served by the (meta.field, timestamp) index)"""
+        rows = self.collection.aggregate([
+            {"$sort": {meta_key(field): ASCENDING, "timestamp": DESCENDING}},
+            {"$group": {"_id": f"$meta.{field}", "reading": {"$first": "$$ROOT"}}},
+        ])
+        return {row["_id"]: from_timeseries(row["reading"]) for row in rows if row["_id"] is not None}
+
+    def create_indexes(self, indexes) -> List[str]:
+        # Index sekunder time-series: field meta dan timestamp saja, tanpa _id dan unique
+        models = []
+        for index in indexes:
+            document = index.document
+            keys = [(meta_key(k), d) for k, d in document["key"].items() if k != "_id"]
+            models.append(IndexModel(keys, name=document["name"]))
+        return self.collection.create_indexes(models) if models else []
+
+    def drop_index(self, name: str):
+        if name in self.collection.index_information():
+            self.collection.drop_index(name)
+
+    def index_information(self) -> Dict:
+        return self.collection.index_information()
+
+    def drop(self):
+        # Dibuat ulang agar insert berikutnya tidak membuat collection biasa
+        self.collection.drop()
+        self.ensure_collection()
+
+
+def version_day(timestamp: datetime) -> datetime:
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def bump_readings_version(db, readings: Optional[List[Dict]] = None):
+    """Count a change to the stored readings so cached readings responses are revalidated.
+
+    Written readings bump the version of each sensor and day they fall in, so
+    only responses whose window overlaps them change; without readings (seed,
+    retention) the global version is bumped and every response changes.
+    """
+    now = datetime.now(timezone.utc)
+    if readings is None:
+        db.metadata.update_one({"_id": READINGS_VERSION_ID},
+                               {"$inc": {"version": 1}, "$set": {"updated_at": now}}, upsert=True)
+        return
+    days = {}
+    for reading in readings:
+        day = version_day(reading["timestamp"])
+        days[(reading["sensor_id"], day)] = reading["device_id"]
+    if not days:
+        return
+    collection = db[READINGS_VERSIONS_COLLECTION]
+    collection.bulk_write(update_requests(collection, (
+        ({"_id": f"{sensor_id}:{day:%Y%m%d}"}, {
+            "$setOnInsert": {"sensor_id": sensor_id, "device_id": device_id, "day": day},
+            "$inc": {"version": 1},
+            "$set": {"updated_at": now},
+        }, True)
+        for (sensor_id, day), device_id in days.items()
+    )), ordered=False)
+
+
+def readings_window_version(db, query: Dict) -> Tuple[Tuple, Optional[datetime]]:
+    """Version parts and last change time of the readings a query can match.
+
+    Reads the global version and sums the per-day versions of the query's
+    device/sensor inside its timestamp window in one aggregation.
+    """
+    match = {k: query[k] for k in ("device_id", "sensor_id") if k in query and not isinstance(query[k], dict)}
+    bounds = query.get("timestamp") or {}
+    low = next((bounds[op] for op in ("$gte", "$gt") if op in bounds), None)
+    high = next((bounds[op] for op in ("$lte", "$lt") if op in bounds), None)
+    if low is not None or high is not None:
+        match["day"] = {}
+        if low is not None:
+            match["day"]["$gte"] = version_day(low)
+        if high is not None:
+            match["day"]["$lte"] = high
+    totals = next(db[READINGS_VERSIONS_COLLECTION].aggregate([
+        {"$match": match},
+        {"$group": {"_id": None, "version": {"$sum": "$version"}, "days": {"$sum": 1},
+                    "updated_at": {"$max": "$updated_at"}}},
+    ]), {})
+    epoch = db.metadata.find_one({"_id": READINGS_VERSION_ID}) or {}
+    changed = [t for t in (epoch.get("updated_at"), totals.get("updated_at")) if t is not None]
+    parts = (epoch.get("version", 0), totals.get("version", 0), totals.get("days", 0))
+    return parts, max(changed) if changed else None
+
+
+def configure_readings_storage(db, layout: str = "documents", granularity: str = "minutes"):
+    """Return ``db`` with ``sensor_readings`` served from the given layout"""
+    if layout == "documents":
+        return db
+    if layout == "buckets":
+        return ReadingsDatabase(db, BucketedReadings(db[BUCKETS_COLLECTION]))
+    if layout == "timeseries":
+        return ReadingsDatabase(db, TimeSeriesReadings(db, granularity))
+    raise ValueError(f"READINGS_STORAGE tidak dikenal: {layout} (pilihan: {', '.join(LAYOUTS)})")
+
+
+def _existing_ids(target, batch: List[Dict]) -> set:
+    """_ids of a batch that are already in the target layout, looked up per sensor and time span"""
+    spans: Dict[Tuple[str, str], List[datetime]] = {}
+    for document in batch:
+        timestamps = spans.setdefault((document["sensor_id"], document["device_id"]), [])
+        timestamps.append(document["timestamp"])
+    existing = set()
+    for (sensor_id, device_id), timestamps in spans.items():
+        query = {"sensor_id": sensor_id, "device_id": device_id,
+                 "timestamp": {"$gte": min(timestamps), "$lte": max(timestamps)}}
+        existing.update(document["_id"] for document in target.find(query, {"_id": 1}))
+    return existing
+
+
+def migrate(db, layout: str, batch_size: int = 5000, drop_source: bool = False, force: bool = False,
+            granularity: str = "minutes") -> int:
+    """Copy every reading of the documents layout into another layout.
+
+    With ``force`` the target may already hold readings; readings whose _id
+    is already there are skipped, so an interrupted migration can be re-run.
+    """
+    source = db[READINGS_COLLECTION]
+    target = configure_readings_storage(db, layout, granularity).sensor_readings
+    if target is source:
+        raise ValueError("Layout tujuan sama dengan layout sumber")
+    resume = target.find_one({}, {"_id": 1}) is not None
+    if resume and not force:
+        raise ValueError("Collection tujuan sudah berisi data, gunakan --force untuk melanjutkan")
+    target.create_indexes(MANAGED_INDEXES[READINGS_COLLECTION])
+
+    # Urutan (sensor_id, timestamp) mengikuti index dan mengisi bucket berurutan
+    cursor = source.find({}).sort([("sensor_id", DESCENDING), ("timestamp", ASCENDING)]).batch_size(batch_size)
+    migrated = 0
+    while True:
+        batch = list(islice(cursor, batch_size))
+        if not batch:
+            break
+        if resume:
+            existing = _existing_ids(target, batch)
+            batch = [document for document in batch if document["_id"] not in existing]
+        if batch:
+            target.insert_many(batch, ordered=False)
+        migrated += len(batch)
+        print(f"   {migrated} pembacaan dimigrasikan")
+    if drop_source:
+        source.drop()
+    return migrated
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Migrasi layout penyimpanan pembacaan sensor")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate_parser = subparsers.add_parser("migrate", help="Salin sensor_readings ke layout lain")
+    migrate_parser.add_argument("--to", choices=[l for l in LAYOUTS if l != "documents"], required=True)
+    migrate_parser.add_argument("--batch-size", type=int, default=5000)
+    migrate_parser.add_argument("--drop-source", action="store_true",
+                                help="Hapus sensor_readings setelah migrasi selesai")
+    migrate_parser.add_argument("--force", action="store_true",
+                                help="Lanjutkan migrasi ke collection tujuan yang sudah berisi data (pembacaan yang sudah ada dilewati)")
+    migrate_parser.add_argument("--granularity", choices=GRANULARITIES, default="minutes",
+                                help="Granularity time-series collection (hanya untuk --to timeseries)")
+    args = parser.parse_args(argv)
+
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"), serverSelectionTimeoutMS=5000)
+    db = client["iot_monitoring"]
+    print(f"🔄 Migrasi sensor_readings ke layout '{args.to}'...")
+    try:
+        migrated = migrate(db, args.to, args.batch_size, args.drop_source, args.force, args.granularity)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return 1
+    print(f"✅ {migrated} pembacaan dimigrasikan. Jalankan aplikasi dengan READINGS_STORAGE={args.to}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Mesin statistik laporan untuk Sistem Pemantauan Lingkungan IoT
+Menghitung rata-rata, min, max, dan standar deviasi dalam satu kali lintasan
+cursor (metode Welford) dengan memori konstan, berapa pun jumlah pembacaannya.
+"""
+
+from typing import Dict, Iterable, Optional
+
+
+class RunningStats:
+    """Single-pass count/mean/min/max/population stddev using Welford's update"""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        # Welford: stabil secara numerik, tanpa sum of squares yang besar
+        self.m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def stats(self) -> Dict:
+        """Report stats; avg/min/max/stddev are None when nothing was added"""
+        if not self.count:
+            return {"avg": None, "min": None, "max": None, "stddev": None, "count": 0}
+        return {
+            "avg": self.mean,
+            "min": self.min,
+            "max": self.max,
+            "stddev": (self.m2 / self.count) ** 0.5,
+            "count": self.count,
+        }
+
+
+def combine_stats(first: Optional[Dict], second: Optional[Dict]) -> Dict:
+    """Stats of two disjoint sets of readings from their separate stats (Chan et al.)"""
+    parts = [s for s in (first, second) if s and s.get("count")]
+    if len(parts) < 2:
+        return dict(parts[0]) if parts else RunningStats().stats()
+    a, b = parts
+    count = a["count"] + b["count"]
+    delta = b["avg"] - a["avg"]
+    m2 = a["stddev"] ** 2 * a["count"] + b["stddev"] ** 2 * b["count"] + delta * delta * a["count"] * b["count"] / count
+    return {
+        "avg": a["avg"] + delta * b["count"] / count,
+        "min": min(a["min"], b["min"]),
+        "max": max(a["max"], b["max"]),
+        "stddev": (m2 / count) ** 0.5,
+        "count": count,
+    }
+
+
+def stream_stats(readings: Iterable[Dict]) -> Dict:
+    """Stats over the ``value`` of every reading yielded by a cursor"""
+    running = RunningStats()
+    for reading in readings:
+        value = reading.get("value")
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            running.add(value)
+    return running.stats()
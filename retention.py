@@ -0,0 +1,379 @@
+#!/usr/bin/env python3
+"""
+Retensi data pembacaan untuk Sistem Pemantauan Lingkungan IoT
+Pembacaan yang lebih tua dari RETENTION_DAYS hari diarsipkan ke file kolumnar
+terkompresi (NumPy .npz) di disk lokal, dipartisi per perangkat per hari:
+
+    <RETENTION_ARCHIVE_DIR>/<device_id>/<YYYY-MM-DD>.npz
+
+File sensors.json di direktori yang sama memetakan sensor_id ke perangkatnya,
+sehingga query per sensor hanya membuka partisi perangkat yang relevan.
+
+Setelah diarsipkan, pembacaan dihapus dari database dengan delete bertahap
+per perangkat per hari (mode 'delete') atau dibiarkan kedaluwarsa lewat TTL
+(mode 'ttl'). Route baca memakai arsip untuk rentang waktu yang sudah keluar
+dari jendela data aktif.
+
+Menjalankan arsip secara manual:
+    python retention.py run --days 90
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+from urllib.parse import quote, unquote
+
+import numpy as np
+from bson import ObjectId
+from dotenv import load_dotenv
+from pymongo import ASCENDING, MongoClient
+from pymongo.errors import PyMongoError
+
+from readings_store import (BucketedReadings, READINGS_VERSIONS_COLLECTION, TIMESERIES_COLLECTION,
+                            TimeSeriesReadings, bump_readings_version, configure_readings_storage)
+from rollups import Rollups
+
+MODES = ("delete", "ttl")
+DAY = timedelta(days=1)
+
+# Kolom teks per pembacaan; timestamp dan value disimpan sebagai array numerik
+TEXT_COLUMNS = ("_id", "sensor_id", "device_id", "sensor_type", "unit")
+SENSOR_INDEX_FILE = "sensors.json"
+
+
+def day_start(timestamp: datetime) -> datetime:
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _time_mask(timestamps: np.ndarray, bounds: Dict) -> np.ndarray:
+    """Boolean mask of a MongoDB-style timestamp range over datetime64[us] values"""
+    mask = np.ones(len(timestamps), dtype=bool)
+    for op, bound in bounds.items():
+        bound = np.datetime64(bound, "us")
+        if op == "$gte":
+            mask &= timestamps >= bound
+        elif op == "$gt":
+            mask &= timestamps > bound
+        elif op == "$lte":
+            mask &= timestamps <= bound
+        elif op == "$lt":
+            mask &= timestamps < bound
+    return mask
+
+
+class Archive:
+    """Compressed per-device, per-day partitions of archived readings"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._sensor_index = None
+        self._sensor_index_mtime = None
+
+    def path(self, device_id: str, day: datetime) -> str:
+        # device_id di-quote agar selalu menjadi satu nama direktori yang aman
+        return os.path.join(self.directory, quote(device_id, safe=""), f"{day:%Y-%m-%d}.npz")
+
+    def load(self, path: str) -> Dict[str, np.ndarray]:
+        with np.load(path, allow_pickle=False) as data:
+            return {name: data[name] for name in data.files}
+
+    def write(self, device_id: str, day: datetime, readings: List[Dict]) -> int:
+        """Store readings of one device and day, merged with the existing partition"""
+        columns = {
+            "timestamp": np.array([r["timestamp"] for r in readings], dtype="datetime64[us]"),
+            "value": np.array([r["value"] for r in readings], dtype=np.float64),
+        }
+        for name in TEXT_COLUMNS:
+            columns[name] = np.array([str(r.get(name, "")) for r in readings], dtype=str)
+        path = self.path(device_id, day)
+        if os.path.exists(path):
+            existing = self.load(path)
+            columns = {name: np.concatenate((existing[name], column)) for name, column in columns.items()}
+        # Arsip ulang hari yang sama (mis. mode TTL) tidak menggandakan pembacaan
+        _, unique = np.unique(columns["_id"], return_index=True)
+        order = unique[np.argsort(columns["timestamp"][unique], kind="stable")]
+        columns = {name: column[order] for name, column in columns.items()}
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = path + ".tmp"
+        with open(temporary, "wb") as f:
+            np.savez_compressed(f, **columns)
+        os.replace(temporary, path)
+        self._index_sensors(device_id, np.unique(columns["sensor_id"]).tolist())
+        return len(order)
+
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, SENSOR_INDEX_FILE)
+
+    def sensor_index(self) -> Dict[str, List[str]]:
+        """sensor_id -> device_ids with archived readings, rebuilt from the partitions if missing"""
+        path = self._index_path()
+        if not os.path.exists(path):
+            if not self.devices():
+                return {}
+            self._save_index(self._scan_sensors())
+        mtime = os.path.getmtime(path)
+        if self._sensor_index is None or mtime != self._sensor_index_mtime:
+            with open(path, encoding="utf-8") as f:
+                self._sensor_index = json.load(f)
+            self._sensor_index_mtime = mtime
+        return self._sensor_index
+
+    def _scan_sensors(self) -> Dict[str, List[str]]:
+        # Arsip lama tanpa sensors.json: baca kolom sensor_id setiap partisi sekali
+        index: Dict[str, List[str]] = {}
+        for device in self.devices():
+            sensors = set()
+            for day in self.days(device):
+                with np.load(self.path(device, day), allow_pickle=False) as data:
+                    sensors.update(np.unique(data["sensor_id"]).tolist())
+            for sensor_id in sensors:
+                index.setdefault(sensor_id, []).append(device)
+        return index
+
+    def _save_index(self, index: Dict[str, List[str]]):
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = self._index_path() + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as f:
+            json.dump(index, f, sort_keys=True)
+        os.replace(temporary, self._index_path())
+
+    def _index_sensors(self, device_id: str, sensor_ids: List[str]):
+        index = self.sensor_index()
+        missing = [s for s in sensor_ids if device_id not in index.get(s, [])]
+        if missing:
+            index = {sensor_id: list(devices) for sensor_id, devices in index.items()}
+            for sensor_id in missing:
+                index.setdefault(sensor_id, []).append(device_id)
+            self._save_index(index)
+
+    def devices(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(unquote(name) for name in os.listdir(self.directory)
+                      if os.path.isdir(os.path.join(self.directory, name)))
+
+    def days(self, device_id: str) -> List[datetime]:
+        directory = os.path.join(self.directory, quote(device_id, safe=""))
+        if not os.path.isdir(directory):
+            return []
+        return sorted(datetime.strptime(name[:-4], "%Y-%m-%d")
+                      for name in os.listdir(directory) if name.endswith(".npz"))
+
+    def read(self, device_id: Optional[str] = None, sensor_id: Optional[str] = None,
+             bounds: Optional[Dict] = None, descending: bool = False,
+             limit: Optional[int] = None) -> Iterator[Dict]:
+        """Archived readings in timestamp order, shaped like stored reading documents"""
+        bounds = bounds or {}
+        low = next((bounds[op] for op in ("$gte", "$gt") if op in bounds), None)
+        high = next((bounds[op] for op in ("$lt", "$lte") if op in bounds), None)
+        if device_id:
+            devices = [device_id]
+        elif sensor_id:
+            devices = self.sensor_index().get(sensor_id, [])
+        else:
+            devices = self.devices()
+        partitions: Dict[datetime, List[str]] = {}
+        for device in devices:
+            for day in self.days(device):
+                if (low is None or day + DAY > low) and (high is None or day <= high):
+                    partitions.setdefault(day, []).append(self.path(device, day))
+
+        remaining = limit
+        for day in sorted(partitions, reverse=descending):
+            loaded = [self.load(path) for path in partitions[day]]
+            columns = {name: np.concatenate([part[name] for part in loaded]) for name in loaded[0]}
+            mask = _time_mask(columns["timestamp"], bounds)
+            if sensor_id:
+                mask &= columns["sensor_id"] == sensor_id
+            order = np.flatnonzero(mask)
+            order = order[np.argsort(columns["timestamp"][order], kind="stable")]
+            if descending:
+                order = order[::-1]
+            if remaining is not None:
+                order = order[:remaining]
+                remaining -= len(order)
+            timestamps = columns["timestamp"][order].tolist()
+            values = columns["value"][order].tolist()
+            texts = {name: columns[name][order].tolist() for name in TEXT_COLUMNS}
+            for i, (timestamp, value) in enumerate(zip(timestamps, values)):
+                _id = texts["_id"][i]
+                yield {
+                    "_id": ObjectId(_id) if ObjectId.is_valid(_id) else _id,
+                    "sensor_id": texts["sensor_id"][i],
+                    "device_id": texts["device_id"][i],
+                    "sensor_type": texts["sensor_type"][i],
+                    "unit": texts["unit"][i],
+                    "timestamp": timestamp,
+                    "value": value,
+                }
+            if remaining is not None and remaining <= 0:
+                return
+
+
+class Retention:
+    """Archives readings older than ``days`` and removes them from the hot collection.
+
+    In 'delete' mode each archived device-day is deleted right after its
+    partition is written. In 'ttl' mode a TTL index expires readings after
+    ``days`` plus two archive intervals, so every reading is archived by an
+    earlier run before the server removes it.
+
+    Rollups of removed readings are removed as well; stats over windows that
+    start before the hot data add the archived readings themselves.
+    """
+
+    def __init__(self, db, days: int, archive_dir: str, mode: str = "delete", interval_hours: float = 24,
+                 rollups: Optional[Rollups] = None, lookback_days: int = 7):
+        if mode not in MODES:
+            raise ValueError(f"RETENTION_MODE tidak dikenal: {mode} (pilihan: {', '.join(MODES)})")
+        self.db = db
+        if mode == "delete" and isinstance(self.readings, TimeSeriesReadings) \
+                and not self.readings.supports_time_deletes():
+            # MongoDB < 7.0 tidak bisa menghapus pembacaan time-series per rentang waktu
+            print("⚠️  Retensi delete pada time-series collection butuh MongoDB 7.0+, memakai mode ttl")
+            mode = "ttl"
+        self.days = days
+        self.mode = mode
+        self.interval_hours = interval_hours
+        self.lookback_days = lookback_days
+        self.archive = Archive(archive_dir)
+        self.rollups = rollups
+        self.run_lock = threading.Lock()
+        self.thread = None
+
+    @property
+    def readings(self):
+        return self.db.sensor_readings
+
+    def cutoff(self, now: Optional[datetime] = None) -> datetime:
+        """Start of the hot window; whole days before it are archived"""
+        return day_start((now or datetime.now()) - timedelta(days=self.days))
+
+    def ttl_seconds(self) -> int:
+        return int(self.days * 86400 + 2 * self.interval_hours * 3600)
+
+    def ensure_ttl(self):
+        """Create the TTL expiry matching the storage layout"""
+        seconds = self.ttl_seconds()
+        readings = self.readings
+        if isinstance(readings, TimeSeriesReadings):
+            self.db.command("collMod", TIMESERIES_COLLECTION, expireAfterSeconds=seconds)
+        elif isinstance(readings, BucketedReadings):
+            readings.buckets.create_index([("end", ASCENDING)], expireAfterSeconds=seconds, name="end_ttl")
+        else:
+            readings.create_index([("timestamp", ASCENDING)], expireAfterSeconds=seconds, name="timestamp_ttl")
+        if self.rollups:
+            # Rollup kedaluwarsa setelah pembacaan terakhir di periodenya
+            self.rollups.collection.create_index([("end", ASCENDING)], expireAfterSeconds=seconds, name="end_ttl")
+
+    def run(self, now: Optional[datetime] = None) -> Dict:
+        """Archive (and in 'delete' mode remove) every whole day before the cutoff"""
+        cutoff = self.cutoff(now)
+        summary = {"cutoff": cutoff, "partitions": 0, "archived": 0, "deleted": 0}
+        with self.run_lock:
+            for device_id in self.readings.distinct("device_id"):
+                oldest = next(self.readings.find(
+                    {"device_id": device_id, "timestamp": {"$lt": cutoff}}, {"timestamp": 1}
+                ).sort("timestamp", ASCENDING).limit(1), None)
+                if oldest is None:
+                    continue
+                day = day_start(oldest["timestamp"])
+                while day < cutoff:
+                    # Satu perangkat satu hari per batch: memori dan ukuran delete tetap kecil
+                    query = {"device_id": device_id, "timestamp": {"$gte": day, "$lt": day + DAY}}
+                    readings = list(self.readings.find(query).sort("timestamp", ASCENDING))
+                    if readings:
+                        self.archive.write(device_id, day, readings)
+                        summary["partitions"] += 1
+                        summary["archived"] += len(readings)
+                        if self.mode == "delete":
+                            summary["deleted"] += self.readings.delete_many(query).deleted_count
+                            if self.rollups:
+                                # Hari yang dihapus selaras dengan periode rollup 1d/1h/1m
+                                self.rollups.discard(device_id, day, day + DAY)
+                    day += DAY
+        if summary["deleted"]:
+            bump_readings_version(self.db)
+            # Versi hari yang sudah diarsipkan tidak dibutuhkan lagi; versi global sudah naik
+            self.db[READINGS_VERSIONS_COLLECTION].delete_many({"day": {"$lt": day_start(cutoff)}})
+        return summary
+
+    def archived(self, query: Dict, descending: bool = False, limit: Optional[int] = None) -> Iterator[Dict]:
+        """Archived readings of a readings query that are older than its oldest hot reading.
+
+        Without a lower timestamp bound only the ``lookback_days`` days before
+        the hot data are read, and nothing when there is no hot data, so an
+        open query never opens every partition of a device.
+        """
+        bounds = dict(query.get("timestamp") or {})
+        low = next((bounds[op] for op in ("$gte", "$gt") if op in bounds), None)
+        if low is not None and low >= self.cutoff():
+            return iter(())
+        # Pembacaan yang masih ada di database (belum dihapus/kedaluwarsa) tidak diambil dua kali
+        oldest = next(self.readings.find(query, {"timestamp": 1}).sort("timestamp", ASCENDING).limit(1), None)
+        if oldest is None and low is None:
+            # Tanpa data aktif dan tanpa batas bawah arsip tidak dibuka sama sekali
+            return iter(())
+        if oldest is not None:
+            upper = next((bounds[op] for op in ("$lt", "$lte") if op in bounds), None)
+            if upper is None or upper >= oldest["timestamp"]:
+                bounds.pop("$lte", None)
+                bounds["$lt"] = oldest["timestamp"]
+            if low is None:
+                upper = bounds.get("$lt", bounds.get("$lte"))
+                bounds["$gte"] = day_start(upper) - timedelta(days=self.lookback_days)
+        return self.archive.read(query.get("device_id"), query.get("sensor_id"), bounds, descending, limit)
+
+    def start(self, on_run=None):
+        """Run the archive job now and then every ``interval_hours`` in a background thread"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.thread = threading.Thread(target=self._loop, args=(on_run,), name="retention", daemon=True)
+        self.thread.start()
+
+    def _loop(self, on_run):
+        stop = threading.Event()
+        while True:
+            try:
+                summary = self.run()
+                if summary["archived"]:
+                    print(f"🗄️  Retensi: {summary['archived']} pembacaan diarsipkan, "
+                          f"{summary['deleted']} dihapus (sebelum {summary['cutoff']:%Y-%m-%d})")
+                    if on_run:
+                        on_run(summary)
+            except (PyMongoError, OSError) as e:
+                print(f"⚠️  Retensi gagal, dicoba lagi pada jadwal berikutnya: {e}")
+            stop.wait(self.interval_hours * 3600)
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Arsip dan retensi pembacaan sensor")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    run_parser = subparsers.add_parser("run", help="Arsipkan pembacaan yang lebih tua dari --days hari")
+    run_parser.add_argument("--days", type=int, default=int(os.getenv("RETENTION_DAYS", 90) or 90))
+    run_parser.add_argument("--mode", choices=MODES, default=os.getenv("RETENTION_MODE", "delete"))
+    run_parser.add_argument("--archive-dir", default=os.getenv("RETENTION_ARCHIVE_DIR", "archive"))
+    args = parser.parse_args(argv)
+
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"), serverSelectionTimeoutMS=5000)
+    db = configure_readings_storage(client["iot_monitoring"], os.getenv("READINGS_STORAGE", "documents"),
+                                    os.getenv("READINGS_TS_GRANULARITY", "minutes"))
+    retention = Retention(db, args.days, args.archive_dir, args.mode,
+                          float(os.getenv("RETENTION_INTERVAL_HOURS", 24)), Rollups(db))
+    if retention.mode == "ttl":
+        retention.ensure_ttl()
+    print(f"🗄️  Mengarsipkan pembacaan sebelum {retention.cutoff():%Y-%m-%d} ke {args.archive_dir}...")
+    summary = retention.run()
+    print(f"✅ {summary['archived']} pembacaan dalam {summary['partitions']} partisi diarsipkan, "
+          f"{summary['deleted']} dihapus")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Rollup pembacaan sensor untuk Sistem Pemantauan Lingkungan IoT
+Menyimpan count, sum, sum of squares, min, dan max per sensor pada resolusi
+1 menit, 1 jam, dan 1 hari. Rollup diperbarui saat ingest sehingga statistik
+rentang waktu yang lebar cukup menggabungkan beberapa dokumen rollup dan
+hanya membaca data mentah pada tepi rentang yang tidak selaras.
+
+Membangun ulang rollup dari data yang sudah ada:
+    python rollups.py rebuild
+"""
+
+import argparse
+import os
+import sys
+from datetime import datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from indexes import ensure_indexes
+from memory_store import update_requests
+from readings_store import configure_readings_storage
+
+ROLLUPS_COLLECTION = "sensor_rollups"
+# Dokumen di collection metadata yang mencatat sejak kapan rollup lengkap
+COVERAGE_ID = "rollups"
+
+# Dari resolusi terkasar ke terhalus, urutan ini dipakai saat memecah rentang
+RESOLUTIONS = (
+    ("1d", timedelta(days=1)),
+    ("1h", timedelta(hours=1)),
+    ("1m", timedelta(minutes=1)),
+)
+
+META_FIELDS = ("sensor_id", "device_id", "sensor_type", "unit")
+
+
+def truncate(timestamp: datetime, resolution: str) -> datetime:
+    """Start of the rollup period containing ``timestamp``"""
+    timestamp = timestamp.replace(second=0, microsecond=0)
+    if resolution in ("1h", "1d"):
+        timestamp = timestamp.replace(minute=0)
+    if resolution == "1d":
+        timestamp = timestamp.replace(hour=0)
+    return timestamp
+
+
+def _ceil(timestamp: datetime, resolution: str, span: timedelta) -> datetime:
+    start = truncate(timestamp, resolution)
+    return start if start == timestamp else start + span
+
+
+def split_window(start: datetime, end: datetime, levels=RESOLUTIONS) -> Tuple[List[Tuple], List[Tuple]]:
+    """Split ``[start, end)`` into aligned rollup ranges and raw edge ranges.
+
+    Returns ``(rollup_ranges, raw_ranges)`` where rollup ranges are
+    ``(resolution, range_start, range_end)``; the coarsest resolution that fits
+    is used in the middle and finer ones towards the edges.
+    """
+    if start >= end:
+        return [], []
+    if not levels:
+        return [], [(start, end)]
+    (resolution, span), finer = levels[0], levels[1:]
+    aligned_start, aligned_end = _ceil(start, resolution, span), truncate(end, resolution)
+    if aligned_start >= aligned_end:
+        return split_window(start, end, finer)
+    left_rollups, left_raw = split_window(start, aligned_start, finer)
+    right_rollups, right_raw = split_window(aligned_end, end, finer)
+    return (left_rollups + [(resolution, aligned_start, aligned_end)] + right_rollups,
+            left_raw + right_raw)
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class Totals:
+    """Count/sum/sum of squares/min/max that can merge single values and rollup documents"""
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.sum_sq = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        if not _is_number(value):
+            return
+        self.count += 1
+        self.sum += value
+        self.sum_sq += value * value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, rollup: Dict):
+        self.count += rollup["count"]
+        self.sum += rollup["sum"]
+        self.sum_sq += rollup["sum_sq"]
+        self.min = rollup["min"] if self.min is None else min(self.min, rollup["min"])
+        self.max = rollup["max"] if self.max is None else max(self.max, rollup["max"])
+
+    def stats(self) -> Optional[Dict]:
+        """avg/min/max/stddev (population)/count, or None when nothing was counted"""
+        if not self.count:
+            return None
+        mean = self.sum / self.count
+        return {
+            "avg": mean,
+            "min": self.min,
+            "max": self.max,
+            "stddev": max(self.sum_sq / self.count - mean * mean, 0.0) ** 0.5,
+            "count": self.count,
+        }
+
+
+class Rollups:
+    """Per-sensor rollups at 1m/1h/1d, updated with unordered bulk upserts on ingest"""
+
+    def __init__(self, db, collection_name: str = ROLLUPS_COLLECTION):
+        self.db = db
+        self.collection = db[collection_name]
+
+    def coverage(self) -> Optional[datetime]:
+        """Start of the time range the rollups are complete for, None when unknown.
+
+        ``datetime.min`` means every stored reading is rolled up (after a
+        rebuild, or when rollups were on before the first reading).
+        """
+        marker = self.db.metadata.find_one({"_id": COVERAGE_ID})
+        return marker.get("since") if marker else None
+
+    def mark_covered(self, since: datetime = datetime.min):
+        self.db.metadata.update_one({"_id": COVERAGE_ID}, {"$set": {"since": since}}, upsert=True)
+
+    def invalidate(self):
+        """Forget the coverage, e.g. after readings were written without rollups"""
+        self.db.metadata.delete_one({"_id": COVERAGE_ID})
+
+    def ensure_coverage(self):
+        """Start tracking coverage when no marker exists yet.
+
+        Without readings the rollups cover everything; otherwise only windows
+        starting after the next full minute are complete until a rebuild.
+        """
+        if self.coverage() is not None:
+            return
+        if self.db.sensor_readings.find_one({}, {"_id": 1}) is None:
+            since = datetime.min
+        else:
+            since = truncate(datetime.now(), "1m") + timedelta(minutes=1)
+        self.db.metadata.update_one({"_id": COVERAGE_ID}, {"$setOnInsert": {"since": since}}, upsert=True)
+
+    def covers(self, start: Optional[datetime]) -> bool:
+        """Whether stats for a window starting at ``start`` (None: all data) may use rollups"""
+        since = self.coverage()
+        if since is None:
+            return False
+        return since == datetime.min or (start is not None and start >= since)
+
+    def discard(self, device_id: str, start: datetime, end: datetime):
+        """Remove the rollups of one device inside ``[start, end)``, aligned to whole days"""
+        self.collection.delete_many({"device_id": device_id, "start": {"$gte": start, "$lt": end}})
+
+    def record(self, readings: Iterable[Dict]):
+        """Add readings that were just written to storage to their rollups"""
+        groups: Dict[str, Tuple[Dict, Totals]] = {}
+        for reading in readings:
+            if not _is_number(reading.get("value")):
+                continue
+            for resolution, span in RESOLUTIONS:
+                start = truncate(reading["timestamp"], resolution)
+                key = f"{resolution}:{reading['sensor_id']}:{reading['device_id']}:{start:%Y%m%d%H%M}"
+                if key not in groups:
+                    meta = {k: reading.get(k) for k in META_FIELDS}
+                    groups[key] = (dict(meta, resolution=resolution, start=start, end=start + span), Totals())
+                groups[key][1].add(reading["value"])
+        if not groups:
+            return
+        operations = update_requests(self.collection, (
+            ({"_id": key}, {
+                "$setOnInsert": meta,
+                "$inc": {"count": totals.count, "sum": totals.sum, "sum_sq": totals.sum_sq},
+                "$min": {"min": totals.min},
+                "$max": {"max": totals.max},
+            }, True)
+            for key, (meta, totals) in groups.items()
+        ))
+        try:
+            self.collection.bulk_write(operations, ordered=False)
+        except PyMongoError as e:
+            # Pembacaan sudah tersimpan; rollup yang tertinggal diperbaiki dengan rebuild
+            print(f"⚠️  Gagal memperbarui rollup: {e}")
+
+    def _rollups(self, query: Dict, start: Optional[datetime], end: Optional[datetime],
+                 projection: Dict) -> Tuple[Iterable[Dict], List[Tuple]]:
+        """Rollup documents covering the window plus the raw ranges left at the edges"""
+        if start is None or end is None:
+            # Tanpa rentang: rollup harian mencakup seluruh data
+            return self.collection.find(dict(query, resolution="1d"), projection), []
+        ranges, raw_ranges = split_window(start, end)
+        if not ranges:
+            return [], raw_ranges
+        rollup_query = dict(query, **{"$or": [
+            {"resolution": resolution, "start": {"$gte": range_start, "$lt": range_end}}
+            for resolution, range_start, range_end in ranges
+        ]})
+        return self.collection.find(rollup_query, projection), raw_ranges
+
+    def sensor_stats(self, device_id: str, sensor_id: str, start: Optional[datetime] = None,
+                     end: Optional[datetime] = None) -> Optional[Dict]:
+        """Stats of one sensor over ``[start, end)`` (all data when no window is given)"""
+        query = {"device_id": device_id, "sensor_id": sensor_id}
+        totals = Totals()
+        rollups, raw_ranges = self._rollups(query, start, end, {"_id": 0, "count": 1, "sum": 1,
+                                                                "sum_sq": 1, "min": 1, "max": 1})
+        for rollup in rollups:
+            totals.merge(rollup)
+        for range_start, range_end in raw_ranges:
+            edge_query = dict(query, timestamp={"$gte": range_start, "$lt": range_end})
+            for reading in self.db.sensor_readings.find(edge_query, {"_id": 0, "value": 1}):
+                totals.add(reading.get("value"))
+        return totals.stats()
+
+    def max_by_device(self, sensor_type: str, threshold: float, start: Optional[datetime] = None,
+                      end: Optional[datetime] = None) -> List[Dict]:
+        """Maximum value per device for devices whose sensors of a type exceeded ``threshold``"""
+        query = {"sensor_type": sensor_type}
+        maxima: Dict[str, float] = {}
+        rollups, raw_ranges = self._rollups(dict(query, max={"$gt": threshold}), start, end,
+                                            {"_id": 0, "device_id": 1, "max": 1})
+        readings = list(rollups)
+        for range_start, range_end in raw_ranges:
+            edge_query = dict(query, value={"$gt": threshold}, timestamp={"$gte": range_start, "$lt": range_end})
+            readings.extend(
+                {"device_id": r["device_id"], "max": r["value"]}
+                for r in self.db.sensor_readings.find(edge_query, {"_id": 0, "device_id": 1, "value": 1})
+            )
+        for row in readings:
+            device_id = row["device_id"]
+            if device_id not in maxima or row["max"] > maxima[device_id]:
+                maxima[device_id] = row["max"]
+        return [{"_id": device_id, "max_value": value} for device_id, value in maxima.items()]
+
+    def drop(self):
+        self.collection.drop()
+
+    def rebuild(self, batch_size: int = 5000) -> int:
+        """Recompute every rollup from stored readings; run while ingest is paused"""
+        # Statistik memakai data mentah selama rebuild berjalan
+        self.invalidate()
+        self.drop()
+        projection = {"_id": 0, "timestamp": 1, "value": 1, **{k: 1 for k in META_FIELDS}}
+        cursor = self.db.sensor_readings.find({}, projection).batch_size(batch_size)
+        processed = 0
+        while True:
+            batch = list(islice(cursor, batch_size))
+            if not batch:
+                break
+            self.record(batch)
+            processed += len(batch)
+            print(f"   {processed} pembacaan diproses")
+        self.mark_covered()
+        return processed
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Kelola rollup pembacaan sensor")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = subparsers.add_parser("rebuild", help="Bangun ulang rollup dari sensor_readings")
+    rebuild_parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args(argv)
+
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"), serverSelectionTimeoutMS=5000)
+    db = configure_readings_storage(client["iot_monitoring"], os.getenv("READINGS_STORAGE", "documents"),
+                                    os.getenv("READINGS_TS_GRANULARITY", "minutes"))
+    print("🔄 Membangun ulang rollup...")
+    rollups = Rollups(db)
+    processed = rollups.rebuild(args.batch_size)
+    ensure_indexes(db)
+    print(f"✅ Rollup dibangun dari {processed} pembacaan")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
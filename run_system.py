@@ -2,19 +2,290 @@
 """
 Script untuk menjalankan Sistem Pemantauan Lingkungan IoT
 Menjalankan semua komponen: Flask API, IoT Simulator, dan Dashboard
+
+Mode produksi (API pre-fork multi-proses, satu worker per core):
+    python run_system.py --production --workers 4 --threads 8
+    python run_system.py serve --workers 4 --threads 8 --bind 0.0.0.0:5000
 """
 
+import argparse
+import signal
+import socket
 import subprocess
+import tempfile
 import time
 import threading
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
+def make_worker_server(application, fd, host, threads, heartbeat_path, access_log=False):
+    """Werkzeug WSGI server on an inherited listening socket with a bounded thread pool.
+
+    Built inside the worker so werkzeug and the app are only imported after
+    the fork. process_request runs after accept: when every thread is busy
+    the accepted connection waits there for a free thread, and because the
+    accept loop is blocked meanwhile, further connections stay in the shared
+    backlog for the other workers.
+    """
+    from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+    class RequestHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            if access_log:
+                super().log_request(*args, **kwargs)
+
+    class Server(BaseWSGIServer):
+        def __init__(self):
+            super().__init__(host, 0, application, handler=RequestHandler, fd=fd)
+            self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="request")
+            self.slots = threading.BoundedSemaphore(threads)
+            self.active = 0
+            self.active_lock = threading.Lock()
+            self.last_beat = 0
+
+        def heartbeat(self):
+            now = time.monotonic()
+            if now - self.last_beat >= 1:
+                os.utime(heartbeat_path)
+                self.last_beat = now
+
+        def service_actions(self):
+            self.heartbeat()
+
+        def process_request(self, request, client_address):
+            # Semua thread sibuk (mis. stream SSE): tetap kirim heartbeat sambil menunggu
+            while not self.slots.acquire(timeout=1):
+                self.heartbeat()
+            with self.active_lock:
+                self.active += 1
+            self.executor.submit(self.handle_in_thread, request, client_address)
+
+        def handle_in_thread(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                with self.active_lock:
+                    self.active -= 1
+                self.slots.release()
+
+        def drain(self, timeout):
+            """Wait up to ``timeout`` seconds for in-flight requests"""
+            deadline = time.monotonic() + timeout
+            while self.active and time.monotonic() < deadline:
+                time.sleep(0.1)
+            self.executor.shutdown(wait=False)
+
+    return Server()
+
+
+# Exit code worker untuk konfigurasi yang tidak dapat diperbaiki dengan respawn
+CONFIG_ERROR_EXIT = 3
+MEMORY_WORKERS_ERROR = ("❌ Penyimpanan in-memory tidak dibagi antar worker: jalankan dengan --workers 1 "
+                        "atau pastikan MongoDB terhubung")
+
+
+class PreforkServer:
+    """Pre-fork master: binds the API socket once and supervises worker processes.
+
+    Workers import app.py after the fork, so every worker creates its own
+    MongoClient and background threads (pymongo clients are not fork-safe).
+    SIGHUP starts a fresh generation of workers (new code and configuration)
+    and then retires the old one gracefully; SIGTERM/SIGINT stop everything.
+    A worker whose heartbeat is older than ``timeout`` seconds is killed and
+    replaced, as is any worker that exits. Until a worker has imported the
+    app (and connected to MongoDB) it is judged against ``startup_timeout``
+    counted from its spawn instead.
+
+    The in-memory storage fallback lives inside each worker, so more than one
+    worker without MongoDB is refused: every worker would serve its own data.
+    """
+
+    def __init__(self, bind="0.0.0.0:5000", workers=None, threads=8, timeout=30.0,
+                 graceful_timeout=30.0, access_log=False, startup_timeout=60.0):
+        host, _, port = bind.rpartition(":")
+        self.host = host or "0.0.0.0"
+        self.port = int(port)
+        self.workers = workers or os.cpu_count() or 1
+        self.threads = threads
+        self.timeout = timeout
+        self.graceful_timeout = graceful_timeout
+        self.access_log = access_log
+        self.startup_timeout = max(startup_timeout, timeout)
+        self.socket = None
+        self.exit_code = 0
+        # pid -> (slot, heartbeat path); heartbeat kosong berarti worker belum siap
+        self.children = {}
+        # pid -> waktu spawn (time.time), untuk masa tenggang startup
+        self.spawned = {}
+        self.retiring = {}
+        self.reload_requested = False
+        self.stop_requested = False
+
+    def run(self) -> int:
+        if self.workers > 1 and os.getenv("STORAGE_BACKEND", "mongo") == "memory":
+            print(MEMORY_WORKERS_ERROR)
+            return CONFIG_ERROR_EXIT
+        self.socket = socket.create_server((self.host, self.port), backlog=2048)
+        print(f"🚀 Master {os.getpid()}: {self.workers} worker x {self.threads} thread "
+              f"di http://{self.host}:{self.port}")
+        signal.signal(signal.SIGHUP, lambda *_: setattr(self, "reload_requested", True))
+        signal.signal(signal.SIGTERM, lambda *_: setattr(self, "stop_requested", True))
+        signal.signal(signal.SIGINT, lambda *_: setattr(self, "stop_requested", True))
+        for slot in range(self.workers):
+            self.spawn(slot)
+        while not self.stop_requested:
+            time.sleep(1)
+            self.reap()
+            if self.reload_requested:
+                self.reload_requested = False
+                self.reload()
+            self.check_heartbeats()
+            self.respawn()
+        self.stop()
+        return self.exit_code
+
+    def spawn(self, slot):
+        fd, heartbeat = tempfile.mkstemp(prefix="iot-worker-")
+        os.close(fd)
+        pid = os.fork()
+        if pid == 0:
+            self.run_worker(slot, heartbeat)
+        self.children[pid] = (slot, heartbeat)
+        self.spawned[pid] = time.time()
+
+    def run_worker(self, slot, heartbeat):
+        """Worker body (runs in the child, never returns)"""
+        code = 0
+        application = None
+        try:
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            os.environ["WORKER_ID"] = str(slot)
+            # app.py membatasi /api/stream sesuai jumlah worker dan thread
+            os.environ["WEB_WORKERS"] = str(self.workers)
+            os.environ["WEB_THREADS"] = str(self.threads)
+            # Job latar (retensi) cukup berjalan di satu worker
+            os.environ["BACKGROUND_JOBS"] = "1" if slot == 0 else "0"
+            import app as application
+            if application.memory_backend and self.workers > 1:
+                print(MEMORY_WORKERS_ERROR)
+                code = CONFIG_ERROR_EXIT
+                return
+            # Isi heartbeat menandai worker siap; sejak itu berlaku --timeout biasa
+            with open(heartbeat, "w") as f:
+                f.write("ready")
+            server = make_worker_server(application.app, self.socket.fileno(), self.host, self.threads,
+                                    heartbeat, self.access_log)
+            signal.signal(signal.SIGTERM,
+                          lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+            server.serve_forever()
+            server.drain(max(self.graceful_timeout - 5, 1))
+        except BaseException as e:
+            print(f"❌ Worker {os.getpid()} gagal: {e}")
+            code = 1
+        finally:
+            # Proses hasil fork tidak boleh kembali ke loop master: flush antrian ingest secara eksplisit
+            if application is not None:
+                try:
+                    application.shutdown()
+                except Exception as e:
+                    print(f"⚠️  Worker {os.getpid()} gagal flush saat berhenti: {e}")
+            sys.stdout.flush()
+            os._exit(code)
+
+    def reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            for group in (self.children, self.retiring):
+                if pid in group:
+                    slot, heartbeat = group.pop(pid)
+                    self.spawned.pop(pid, None)
+                    os.unlink(heartbeat)
+                    if os.WIFEXITED(status) and os.WEXITSTATUS(status) == CONFIG_ERROR_EXIT:
+                        # Konfigurasi salah: respawn hanya akan gagal lagi
+                        self.stop_requested = True
+                        self.exit_code = CONFIG_ERROR_EXIT
+                    elif group is self.children and not self.stop_requested:
+                        print(f"⚠️  Worker {pid} (slot {slot}) berhenti dengan status {status}")
+
+    def respawn(self):
+        active = {slot for slot, _ in self.children.values()}
+        for slot in range(self.workers):
+            if slot not in active and not self.stop_requested:
+                self.spawn(slot)
+
+    def check_heartbeats(self):
+        now = time.time()
+        for pid, (slot, heartbeat) in list(self.children.items()):
+            try:
+                ready = os.path.getsize(heartbeat) > 0
+                age = now - os.path.getmtime(heartbeat)
+            except OSError:
+                continue
+            if not ready:
+                # Worker baru diberi waktu import app dan koneksi MongoDB sebelum dinilai
+                age = now - self.spawned.get(pid, now)
+                if age > self.startup_timeout:
+                    print(f"⚠️  Worker {pid} belum siap setelah {age:.0f} detik, dihentikan paksa")
+                    self.kill(pid, signal.SIGKILL)
+                continue
+            if age > self.timeout:
+                print(f"⚠️  Worker {pid} tidak merespons {age:.0f} detik, dihentikan paksa")
+                self.kill(pid, signal.SIGKILL)
+
+    def reload(self):
+        print("🔄 Reload: menjalankan generasi worker baru")
+        self.retire(list(self.children))
+        for slot in range(self.workers):
+            self.spawn(slot)
+
+    def retire(self, pids):
+        deadline = time.monotonic() + self.graceful_timeout
+        for pid in pids:
+            self.retiring[pid] = self.children.pop(pid)
+            self.kill(pid, signal.SIGTERM)
+        threading.Thread(target=self._kill_after, args=(pids, deadline), daemon=True).start()
+
+    def _kill_after(self, pids, deadline):
+        time.sleep(max(deadline - time.monotonic(), 0))
+        for pid in pids:
+            if pid in self.retiring:
+                self.kill(pid, signal.SIGKILL)
+
+    def stop(self):
+        print("🛑 Menghentikan worker...")
+        self.retire(list(self.children))
+        deadline = time.monotonic() + self.graceful_timeout + 1
+        while self.retiring and time.monotonic() < deadline:
+            time.sleep(0.2)
+            self.reap()
+        self.socket.close()
+
+    @staticmethod
+    def kill(pid, signum):
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+
 class IoTSystemRunner:
-    def __init__(self):
+    def __init__(self, production=False, serve_args=None):
         self.processes = {}
         self.running = False
+        self.production = production
+        # Argumen untuk 'run_system.py serve' pada mode produksi
+        self.serve_args = serve_args or []
         
     def check_dependencies(self):
         """Cek apakah semua dependensi terinstall"""
@@ -63,12 +334,9 @@ class IoTSystemRunner:
         print("\n🚀 Menjalankan Flask API...")
         
         try:
-            process = subprocess.Popen(
-                [sys.executable, 'app.py'],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
+            # Output diwariskan ke terminal: pipe yang tidak pernah dibaca akan penuh dan memblokir proses
+            command = ['run_system.py', 'serve'] + self.serve_args if self.production else ['app.py']
+            process = subprocess.Popen([sys.executable] + command)
             
             self.processes['flask'] = process
             
@@ -79,8 +347,7 @@ class IoTSystemRunner:
                 print("✅ Flask API berjalan di http://localhost:5000")
                 return True
             else:
-                stdout, stderr = process.communicate()
-                print(f"❌ Flask API gagal dijalankan: {stderr}")
+                print(f"❌ Flask API gagal dijalankan (exit code {process.returncode}), lihat log di atas")
                 return False
                 
         except Exception as e:
@@ -92,12 +359,7 @@ class IoTSystemRunner:
         print("\n🌐 Menjalankan IoT Simulator...")
         
         try:
-            process = subprocess.Popen(
-                [sys.executable, 'iot_simulator.py'],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
+            process = subprocess.Popen([sys.executable, 'iot_simulator.py'])
             
             self.processes['simulator'] = process
             
@@ -108,8 +370,7 @@ class IoTSystemRunner:
                 print("✅ IoT Simulator berjalan")
                 return True
             else:
-                stdout, stderr = process.communicate()
-                print(f"❌ IoT Simulator gagal dijalankan: {stderr}")
+                print(f"❌ IoT Simulator gagal dijalankan (exit code {process.returncode}), lihat log di atas")
                 return False
                 
         except Exception as e:
@@ -238,9 +499,50 @@ class IoTSystemRunner:
         
         print("✅ Sistem dihentikan!")
 
+def serve(args):
+    """Run the pre-fork API server in the foreground"""
+    if not hasattr(os, 'fork'):
+        # Windows: tidak ada fork, jalankan satu proses multi-thread
+        print("⚠️  os.fork tidak tersedia, API dijalankan sebagai satu proses")
+        from app import app
+        host, _, port = args.bind.rpartition(':')
+        app.run(host=host or '0.0.0.0', port=int(port), threaded=True)
+        return 0
+    return PreforkServer(args.bind, args.workers, args.threads, args.timeout,
+                         args.graceful_timeout, args.access_log, args.startup_timeout).run()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Menjalankan Sistem Pemantauan Lingkungan IoT")
+    parser.add_argument('command', nargs='?', choices=['all', 'serve'], default='all',
+                        help="all: API, simulator dan analisis; serve: hanya API pre-fork")
+    parser.add_argument('--production', action='store_true',
+                        help="Jalankan API dengan server pre-fork, bukan debug server")
+    parser.add_argument('--bind', default=os.getenv('WEB_BIND', '0.0.0.0:5000'))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_WORKERS', 0)) or None,
+                        help="Jumlah proses worker (default: jumlah core)")
+    parser.add_argument('--threads', type=int, default=int(os.getenv('WEB_THREADS', 8)),
+                        help="Thread per worker")
+    parser.add_argument('--timeout', type=float, default=float(os.getenv('WORKER_TIMEOUT', 30)),
+                        help="Detik tanpa heartbeat sebelum worker dihentikan paksa")
+    parser.add_argument('--graceful-timeout', type=float, default=float(os.getenv('WORKER_GRACEFUL_TIMEOUT', 30)))
+    parser.add_argument('--startup-timeout', type=float, default=float(os.getenv('WORKER_STARTUP_TIMEOUT', 60)),
+                        help="Detik maksimal worker baru mengimport app dan terhubung ke MongoDB")
+    parser.add_argument('--access-log', action='store_true')
+    return parser.parse_args(argv)
+
 def main():
     """Main function"""
-    runner = IoTSystemRunner()
+    args = parse_args()
+    if args.command == 'serve':
+        sys.exit(serve(args))
+    
+    serve_args = ['--bind', args.bind, '--threads', str(args.threads), '--timeout', str(args.timeout),
+                  '--graceful-timeout', str(args.graceful_timeout), '--startup-timeout', str(args.startup_timeout)]
+    if args.workers:
+        serve_args += ['--workers', str(args.workers)]
+    if args.access_log:
+        serve_args.append('--access-log')
+    runner = IoTSystemRunner(args.production, serve_args)
     
     try:
         runner.start_system()
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Seed dan backfill data untuk Sistem Pemantauan Lingkungan IoT
+Membangkitkan pembacaan sensor realistis dalam skala besar
+(perangkat × sensor × hari × interval). Nilai dibangkitkan per sensor dengan
+NumPy memakai pola harian yang sama dengan IoTSimulator, lalu disisipkan
+paralel per chunk dengan insert_many tidak berurutan.
+
+Tanpa --reset, seed bersifat idempoten: perangkat hanya ditambahkan jika
+belum ada, dan per sensor hanya slot waktu yang belum berisi pembacaan yang
+dibangkitkan, sehingga menjalankan ulang tidak menggandakan data, celah terisi,
+dan memperpanjang --days menjadi backfill.
+
+Contoh (~13 juta pembacaan):
+    python seed_data.py --devices 100 --sensors 3 --days 30 --interval 60 --workers 8
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from pymongo import MongoClient
+
+from indexes import ensure_indexes
+from iot_simulator import create_sample_devices, diurnal_offset, noise_amplitude
+from readings_store import bump_readings_version, configure_readings_storage
+from rollups import Rollups
+
+DAY_SECONDS = 86400
+DEFAULT_CHUNK_SIZE = 20000
+# Field khusus simulator yang tidak disimpan di registry perangkat
+SIMULATOR_FIELDS = ("interval", "base_value", "variation")
+
+
+def _numbered(identifier: str, number: int) -> str:
+    return identifier.rstrip("0123456789") + f"{number:03d}"
+
+
+def build_devices(count: int, sensors_per_device: Optional[int] = None) -> List[Dict]:
+    """``count`` device configs cloned round-robin from the simulator's samples.
+
+    The first templates keep their ids (dev001/temp001, ...); further devices
+    and extra sensors get new numbered ids.
+    """
+    templates = create_sample_devices()
+    devices = []
+    for index in range(count):
+        template = templates[index % len(templates)]
+        number = index + 1
+        sensors = []
+        for position in range(sensors_per_device or len(template["sensors"])):
+            sensor = dict(template["sensors"][position % len(template["sensors"])])
+            sensor["sensor_id"] = _numbered(sensor["sensor_id"], number)
+            if position >= len(template["sensors"]):
+                sensor["sensor_id"] += f"_{position // len(template['sensors'])}"
+            sensors.append(sensor)
+        device = dict(template, sensors=sensors, device_id=_numbered(template["device_id"], number))
+        if index >= len(templates):
+            device["device_name"] = f"{template['device_name']} {number:03d}"
+        devices.append(device)
+    return devices
+
+
+def registry_document(device: Dict) -> Dict:
+    """Device config without the simulator-only fields"""
+    document = {k: v for k, v in device.items() if k not in SIMULATOR_FIELDS}
+    document["sensors"] = [{k: v for k, v in sensor.items() if k not in SIMULATOR_FIELDS}
+                           for sensor in device["sensors"]]
+    return document
+
+
+def time_grid(end: datetime, days: float, interval: int) -> np.ndarray:
+    """Ascending datetime64[s] slots ending at ``end`` floored to the interval.
+
+    Flooring keeps the slots stable between runs, which is what makes the
+    idempotent mode line up with readings seeded earlier.
+    """
+    # Timestamp naive dipakai apa adanya, seperti datetime.now() di simulator
+    last = (np.datetime64(end.replace(tzinfo=None), "s").astype(np.int64) // interval) * interval
+    count = int(days * DAY_SECONDS) // interval
+    seconds = last - interval * np.arange(count - 1, -1, -1, dtype=np.int64)
+    return seconds.astype("datetime64[s]")
+
+
+def sensor_values(sensor: Dict, timestamps: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """Vectorized IoTSimulator.generate_sensor_value for every timestamp"""
+    offsets = np.array([diurnal_offset(sensor["type"], hour) for hour in range(24)], dtype=np.float64)
+    hours = timestamps.astype("datetime64[h]").astype(np.int64) % 24
+    amplitude = noise_amplitude(sensor["type"], sensor.get("variation", 0.1))
+    values = sensor["base_value"] + rng.uniform(-amplitude, amplitude, len(timestamps)) + offsets[hours]
+    return np.round(values, 2)
+
+
+def missing_slots(collection, device: Dict, sensor: Dict, grid: np.ndarray) -> np.ndarray:
+    """Grid slots this sensor has no reading for yet, including gaps inside the range"""
+    if not len(grid):
+        return grid
+    query = {
+        "device_id": device["device_id"],
+        "sensor_id": sensor["sensor_id"],
+        "timestamp": {"$gte": grid[0].item(), "$lte": grid[-1].item()},
+    }
+    cursor = collection.find(query, {"_id": 0, "timestamp": 1}).batch_size(DEFAULT_CHUNK_SIZE)
+    existing = np.array([reading["timestamp"] for reading in cursor], dtype="datetime64[s]")
+    if not len(existing):
+        return grid
+    return grid[~np.isin(grid, existing)]
+
+
+def _chunks(collection, devices: List[Dict], grid: np.ndarray, chunk_size: int,
+            idempotent: bool) -> Iterator[Tuple[Dict, Dict, np.ndarray]]:
+    for device in devices:
+        for sensor in device["sensors"]:
+            slots = missing_slots(collection, device, sensor, grid) if idempotent else grid
+            for start in range(0, len(slots), chunk_size):
+                yield device, sensor, slots[start:start + chunk_size]
+
+
+def _write_chunk(db, rollups: Optional[Rollups], device: Dict, sensor: Dict,
+                 timestamps: np.ndarray, rng: np.random.Generator) -> int:
+    values = sensor_values(sensor, timestamps, rng).tolist()
+    device_id, sensor_id, sensor_type, unit = device["device_id"], sensor["sensor_id"], sensor["type"], sensor["unit"]
+    readings = [
+        {"device_id": device_id, "sensor_id": sensor_id, "sensor_type": sensor_type,
+         "timestamp": timestamp, "value": value, "unit": unit}
+        for timestamp, value in zip(timestamps.astype("datetime64[us]").tolist(), values)
+    ]
+    db.sensor_readings.insert_many(readings, ordered=False)
+    if rollups:
+        rollups.record(readings)
+    return len(readings)
+
+
+def seed(db, devices: List[Dict], days: float = 1, interval: int = 300, end: Optional[datetime] = None,
+         reset: bool = False, workers: int = 4, chunk_size: int = DEFAULT_CHUNK_SIZE,
+         rollups: Optional[Rollups] = None, random_seed: Optional[int] = None,
+         progress: bool = False) -> Dict:
+    """Seed the registry and readings for ``devices`` over the last ``days``.
+
+    ``reset`` drops devices, readings and rollups first; otherwise existing
+    devices are kept and only missing time slots are generated. Chunks are
+    generated and inserted by ``workers`` threads, with at most two chunks
+    per worker in memory at a time.
+    """
+    started = time.time()
+    if reset:
+        db.devices.drop()
+        db.sensor_readings.drop()
+        db.sensor_rollups.drop()
+        if rollups:
+            rollups.mark_covered()
+    # Index (dibuat ulang setelah drop) harus ada sebelum cek slot yang sudah terisi
+    ensure_indexes(db)
+
+    added_devices = 0
+    for device in devices:
+        result = db.devices.update_one({"device_id": device["device_id"]},
+                                       {"$setOnInsert": registry_document(device)}, upsert=True)
+        added_devices += result.upserted_id is not None
+
+    grid = time_grid(end or datetime.now(), days, interval)
+    seeds = np.random.SeedSequence(random_seed)
+    inserted = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        for device, sensor, timestamps in _chunks(db.sensor_readings, devices, grid, chunk_size, not reset):
+            if len(pending) >= workers * 2:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                inserted += sum(future.result() for future in done)
+                if progress:
+                    print(f"   {inserted} pembacaan ({inserted / (time.time() - started):.0f}/detik)")
+            rng = np.random.default_rng(seeds.spawn(1)[0])
+            pending.add(executor.submit(_write_chunk, db, rollups, device, sensor, timestamps, rng))
+        inserted += sum(future.result() for future in pending)
+    if rollups is None and (reset or inserted):
+        # Statistik memakai data mentah sampai 'python rollups.py rebuild'
+        Rollups(db).invalidate()
+
+    sensors = sum(len(device["sensors"]) for device in devices)
+    return {
+        "devices": len(devices),
+        "devices_added": added_devices,
+        "sensors": sensors,
+        "inserted": inserted,
+        "skipped": sensors * len(grid) - inserted,
+        "seconds": round(time.time() - started, 2),
+    }
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Seed/backfill pembacaan sensor dalam skala besar")
+    parser.add_argument("--devices", type=int, default=2, help="Jumlah perangkat (default: 2)")
+    parser.add_argument("--sensors", type=int, help="Sensor per perangkat (default: sesuai contoh perangkat)")
+    parser.add_argument("--days", type=float, default=1, help="Rentang hari ke belakang (default: 1)")
+    parser.add_argument("--interval", type=int, default=300, help="Detik antar pembacaan (default: 300)")
+    parser.add_argument("--end", type=datetime.fromisoformat, help="Akhir rentang ISO 8601 (default: sekarang)")
+    parser.add_argument("--reset", action="store_true", help="Hapus perangkat, pembacaan dan rollup dulu")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--skip-rollups", action="store_true",
+                        help="Lewati rollup saat insert (jalankan 'python rollups.py rebuild' setelahnya)")
+    parser.add_argument("--seed", type=int, help="Seed random agar hasil dapat diulang")
+    args = parser.parse_args(argv)
+    if args.devices < 1 or args.interval < 1 or args.days <= 0 or args.chunk_size < 1:
+        parser.error("--devices, --interval, --days dan --chunk-size harus positif")
+
+    client = MongoClient(os.getenv("MONGO_URI", "mongodb://localhost:27017/"), serverSelectionTimeoutMS=5000,
+                         maxPoolSize=max(100, args.workers))
+    db = configure_readings_storage(client["iot_monitoring"], os.getenv("READINGS_STORAGE", "documents"),
+                                    os.getenv("READINGS_TS_GRANULARITY", "minutes"))
+    devices = build_devices(args.devices, args.sensors)
+    total = sum(len(device["sensors"]) for device in devices) * int(args.days * DAY_SECONDS // args.interval)
+    print(f"🌱 Seed {len(devices)} perangkat, hingga {total} pembacaan "
+          f"({'reset' if args.reset else 'idempoten'}, {args.workers} worker)...")
+    summary = seed(db, devices, args.days, args.interval, args.end, args.reset, args.workers, args.chunk_size,
+                   None if args.skip_rollups else Rollups(db), args.seed, progress=True)
+    db.metadata.update_one({"_id": "devices"},
+                           {"$inc": {"version": 1}, "$set": {"updated_at": datetime.now(timezone.utc)}}, upsert=True)
+    bump_readings_version(db)
+    print(f"✅ {summary['inserted']} pembacaan disisipkan, {summary['skipped']} sudah ada, "
+          f"{summary['devices_added']} perangkat baru ({summary['seconds']} detik)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
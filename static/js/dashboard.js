@@ -1,7 +1,12 @@
 document.addEventListener('DOMContentLoaded', function() {
     if (typeof loadDashboardData === 'function') {
         loadDashboardData();
-        setInterval(loadDashboardData, 30000);
+        // Update real-time lewat /api/stream, polling 30 detik hanya sebagai fallback
+        if (typeof startLiveUpdates === 'function') {
+            startLiveUpdates();
+        } else {
+            setInterval(loadDashboardData, 30000);
+        }
     }
     if (typeof updateSensorValues === 'function') {
         updateSensorValues();
@@ -9,6 +14,14 @@ document.addEventListener('DOMContentLoaded', function() {
     if (typeof addSortToTable === 'function') {
         addSortToTable();
     }
+    const prevBtn = document.getElementById('prevPageBtn');
+    if (prevBtn && typeof loadPrevReadings === 'function') {
+        prevBtn.addEventListener('click', loadPrevReadings);
+    }
+    const nextBtn = document.getElementById('nextPageBtn');
+    if (nextBtn && typeof loadNextReadings === 'function') {
+        nextBtn.addEventListener('click', loadNextReadings);
+    }
     if (typeof updateChartSelectFromDevices === 'function') {
         updateChartSelectFromDevices();
     }
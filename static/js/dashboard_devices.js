@@ -37,16 +37,16 @@ async function updateSensorValues() {
     try {
         const devicesResponse = await fetch('/api/devices');
         const devices = await devicesResponse.json();
+        // Satu request untuk nilai terbaru semua sensor
+        const latestResponse = await fetch('/api/latest');
+        const latest = latestResponse.ok ? await latestResponse.json() : {};
         for (const device of devices) {
             for (const sensor of device.sensors) {
-                const latestResponse = await fetch(`/api/sensors/${sensor.sensor_id}/latest`);
-                if (latestResponse.ok) {
-                    const reading = await latestResponse.json();
-                    const element = document.getElementById(`sensor-${sensor.sensor_id}`);
-                    if (element && reading && reading.value !== undefined) {
-                        element.textContent = reading.value;
-                        element.className = 'sensor-value ' + getStatusClass(reading.value, sensor.type);
-                    }
+                const reading = latest[sensor.sensor_id];
+                const element = document.getElementById(`sensor-${sensor.sensor_id}`);
+                if (element && reading && reading.value !== undefined) {
+                    element.textContent = reading.value;
+                    element.className = 'sensor-value ' + getStatusClass(reading.value, sensor.type);
                 }
             }
         }
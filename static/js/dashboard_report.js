@@ -1,4 +1,4 @@
-async function generateReport() {
+async function generateReport(page = 1) {
     const device_id = document.getElementById('reportDevice').value;
     const sensor_id = document.getElementById('reportSensor').value;
     const start = document.getElementById('reportStart').value;
@@ -9,7 +9,7 @@ async function generateReport() {
     const device = devices.find(d => d.device_id === device_id);
     const sensor = device ? device.sensors.find(s => s.sensor_id === sensor_id) : null;
     // Fetch laporan
-    let url = `/api/report?device_id=${device_id}&sensor_id=${sensor_id}&start=${start}&end=${end}&threshold=${threshold}`;
+    let url = `/api/report?device_id=${device_id}&sensor_id=${sensor_id}&start=${start}&end=${end}&threshold=${threshold}&include_readings=1&page=${page}&per_page=100`;
     const report = await (await fetch(url)).json();
     let html = '';
     // Info perangkat & sensor
@@ -84,6 +84,14 @@ async function generateReport() {
             </tr>`;
         });
         html += `</tbody></table></div>`;
+        // Data pembacaan dikirim per halaman (100 terbaru per halaman)
+        if (report.total_pages > 1) {
+            html += `<div class="d-flex justify-content-between align-items-center mb-2">
+                <button class="btn btn-sm btn-outline-secondary" ${report.page <= 1 ? 'disabled' : ''} onclick="generateReport(${report.page - 1})">Sebelumnya</button>
+                <span>Halaman ${report.page} dari ${report.total_pages} (${report.stats.count} pembacaan)</span>
+                <button class="btn btn-sm btn-outline-secondary" ${report.page >= report.total_pages ? 'disabled' : ''} onclick="generateReport(${report.page + 1})">Berikutnya</button>
+            </div>`;
+        }
     } else {
         html += `<div class="alert alert-info">Tidak ada data pembacaan pada periode ini.</div>`;
     }
@@ -91,7 +99,8 @@ async function generateReport() {
     document.getElementById('laporanSection').style.display = '';
     document.getElementById('reportResultBox').innerHTML = '';
     var modal = bootstrap.Modal.getInstance(document.getElementById('reportModal'));
-    modal.hide();
+    // Modal sudah tertutup saat berpindah halaman
+    if (modal) modal.hide();
 }
 function downloadReportCSV() {
     const device_id = document.getElementById('reportDevice').value;
@@ -1,6 +1,14 @@
+let totalReadingsCount = 0;
+
 function updateStatistics(stats) {
     document.getElementById('totalDevices').textContent = stats.total_devices;
-    document.getElementById('totalReadings').textContent = stats.total_readings.toLocaleString();
+    totalReadingsCount = stats.total_readings;
+    document.getElementById('totalReadings').textContent = totalReadingsCount.toLocaleString();
     document.getElementById('activeSensors').textContent = Object.keys(stats.latest_readings).length;
 }
-window.updateStatistics = updateStatistics; 
\ No newline at end of file
+function addReadingsToTotal(delta) {
+    totalReadingsCount += delta;
+    document.getElementById('totalReadings').textContent = totalReadingsCount.toLocaleString();
+}
+window.updateStatistics = updateStatistics;
+window.addReadingsToTotal = addReadingsToTotal; 
\ No newline at end of file
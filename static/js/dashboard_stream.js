@@ -0,0 +1,62 @@
+let liveSource = null;
+let pollTimer = null;
+let tableReloadTimer = null;
+
+function startLiveUpdates() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    liveSource = new EventSource('/api/stream');
+    liveSource.addEventListener('latest', function(event) {
+        applyLatestReadings(JSON.parse(event.data));
+    });
+    liveSource.addEventListener('stats', function(event) {
+        addReadingsToTotal(JSON.parse(event.data).total_readings_delta || 0);
+    });
+    liveSource.addEventListener('readings', function() {
+        // Tabel hanya dimuat ulang saat menampilkan halaman terbaru
+        if (!currentCursor) scheduleTableReload();
+    });
+    liveSource.addEventListener('devices', loadDashboardData);
+    liveSource.addEventListener('resync', loadDashboardData);
+    liveSource.onopen = function() {
+        document.getElementById('systemStatus').textContent = 'Online';
+        if (pollTimer) {
+            // Tersambung kembali: muat ulang data yang terlewat lalu hentikan polling
+            stopPolling();
+            loadDashboardData();
+        }
+    };
+    liveSource.onerror = function() {
+        // EventSource menyambung ulang sendiri; sementara itu pakai polling
+        startPolling();
+    };
+}
+function startPolling() {
+    if (!pollTimer) pollTimer = setInterval(loadDashboardData, 30000);
+}
+function stopPolling() {
+    if (pollTimer) {
+        clearInterval(pollTimer);
+        pollTimer = null;
+    }
+}
+function scheduleTableReload() {
+    if (tableReloadTimer) return;
+    tableReloadTimer = setTimeout(function() {
+        tableReloadTimer = null;
+        loadLatestReadings('', 'next');
+    }, 2000);
+}
+function applyLatestReadings(latest) {
+    for (const [sensorId, reading] of Object.entries(latest)) {
+        const element = document.getElementById(`sensor-${sensorId}`);
+        if (element) {
+            element.textContent = reading.value;
+            element.className = 'sensor-value ' + getStatusClass(reading.value, reading.sensor_type);
+        }
+    }
+}
+window.startLiveUpdates = startLiveUpdates;
+window.applyLatestReadings = applyLatestReadings;
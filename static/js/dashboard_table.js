@@ -1,3 +1,4 @@
+let currentPage = 1;
 function getStatusText(value, type) {
     if (type === 'temperature') {
         if (value > 30) return 'Panas';
@@ -37,33 +38,56 @@ function displayReadingsTable(readings) {
     });
     tbody.innerHTML = html;
 }
-function updatePaginationInfo(page, totalPages, total) {
-    document.getElementById('paginationInfo').textContent = `Halaman ${page} dari ${totalPages} | Total: ${total}`;
-    document.getElementById('prevPageBtn').disabled = page <= 1;
-    document.getElementById('nextPageBtn').disabled = page >= totalPages;
+let currentCursor = '';
+let currentDirection = 'next';
+let nextCursor = null;
+let prevCursor = null;
+function updatePaginationInfo(page, total) {
+    const totalText = total === null || total === undefined ? '-' : total;
+    document.getElementById('paginationInfo').textContent = `Halaman ${page} | Total: ${totalText}`;
+    document.getElementById('prevPageBtn').disabled = !prevCursor;
+    document.getElementById('nextPageBtn').disabled = !nextCursor;
 }
-async function loadLatestReadings(page = 1) {
+// Pagination berbasis cursor: token (timestamp, _id) dari server, tanpa skip()
+async function loadLatestReadings(cursor = currentCursor, direction = currentDirection) {
     const devicesResponse = await fetch('/api/devices');
     const devices = await devicesResponse.json();
     let device_id = devices.length > 0 ? devices[0].device_id : null;
     if (!device_id) {
+        nextCursor = null;
+        prevCursor = null;
         displayReadingsTable([]);
-        updatePaginationInfo(1, 1, 0);
+        updatePaginationInfo(1, 0);
         return;
     }
-    let url = `/api/devices/${device_id}/readings?page=${page}&per_page=10`;
+    let url = `/api/devices/${device_id}/readings?cursor=${encodeURIComponent(cursor || '')}&direction=${direction}&per_page=10`;
     const readingsResponse = await fetch(url);
     let allReadings = [];
-    let total = 0;
+    let total = null;
     if (readingsResponse.ok) {
         const result = await readingsResponse.json();
         allReadings = result.data;
-        currentPage = result.page;
-        totalPages = result.total_pages;
+        currentCursor = cursor || '';
+        currentDirection = direction;
+        nextCursor = result.next_cursor;
+        prevCursor = result.prev_cursor;
         total = result.total;
+        if (!prevCursor) currentPage = 1;
     }
     displayReadingsTable(allReadings);
-    updatePaginationInfo(currentPage, totalPages, total);
+    updatePaginationInfo(currentPage, total);
+}
+function loadNextReadings() {
+    if (nextCursor) {
+        currentPage += 1;
+        loadLatestReadings(nextCursor, 'next');
+    }
+}
+function loadPrevReadings() {
+    if (prevCursor) {
+        currentPage = Math.max(1, currentPage - 1);
+        loadLatestReadings(prevCursor, 'prev');
+    }
 }
 function addSortToTable() {
     document.querySelectorAll('th.sortable').forEach(th => {
@@ -128,5 +152,7 @@ window.getStatusText = getStatusText;
 window.displayReadingsTable = displayReadingsTable;
 window.updatePaginationInfo = updatePaginationInfo;
 window.loadLatestReadings = loadLatestReadings;
+window.loadNextReadings = loadNextReadings;
+window.loadPrevReadings = loadPrevReadings;
 window.addSortToTable = addSortToTable;
 window.applyAdvancedFilter = applyAdvancedFilter; 
\ No newline at end of file
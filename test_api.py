@@ -45,6 +45,17 @@ def test_get_sensor_readings():
             print(f"- {reading['timestamp']}: {reading['value']} {reading['unit']}")
     print()
 
+def test_get_downsampled_readings():
+    """Test seri pembacaan yang di-downsample"""
+    print("=== Testing GET /api/sensors/temp001/readings?max_points=50 ===")
+    for mode in ("lttb", "bucket"):
+        response = requests.get(f"{BASE_URL}/sensors/temp001/readings?max_points=50&mode={mode}")
+        print(f"Status ({mode}): {response.status_code}")
+        if response.status_code == 200:
+            points = response.json()
+            print(f"Jumlah titik: {len(points)}")
+    print()
+
 def test_get_device_readings():
     """Test mendapatkan pembacaan perangkat"""
     print("=== Testing GET /api/devices/dev001/readings ===")
@@ -76,6 +87,18 @@ def test_get_latest_reading():
         print(f"Waktu: {reading['timestamp']}")
     print()
 
+def test_get_all_latest_readings():
+    """Test mendapatkan pembacaan terbaru semua sensor"""
+    print("=== Testing GET /api/latest?device_id=dev001 ===")
+    response = requests.get(f"{BASE_URL}/latest", params={'device_id': 'dev001'})
+    print(f"Status: {response.status_code}")
+    if response.status_code == 200:
+        latest = response.json()
+        print(f"Jumlah sensor: {len(latest)}")
+        for sensor_id, reading in latest.items():
+            print(f"- {sensor_id}: {reading['value']} {reading['unit']}")
+    print()
+
 def test_add_reading():
     """Test menambah pembacaan baru"""
     print("=== Testing POST /api/readings ===")
@@ -88,11 +111,36 @@ def test_add_reading():
     }
     response = requests.post(f"{BASE_URL}/readings", json=new_reading)
     print(f"Status: {response.status_code}")
-    if response.status_code == 201:
+    if response.status_code in (201, 202):
         reading = response.json()
         print(f"Pembacaan berhasil ditambahkan: {reading['value']} {reading['unit']}")
     print()
 
+def test_add_readings_batch():
+    """Test menambah banyak pembacaan sekaligus"""
+    print("=== Testing POST /api/readings/batch ===")
+    readings = [
+        {
+            "device_id": "dev001",
+            "sensor_id": "temp001",
+            "sensor_type": "temperature",
+            "value": 25 + i * 0.1,
+            "unit": "°C"
+        }
+        for i in range(10)
+    ]
+    # Item tanpa field value harus dilaporkan sebagai error per-item
+    readings.append({"device_id": "dev001", "sensor_id": "temp001", "sensor_type": "temperature", "unit": "°C"})
+    response = requests.post(f"{BASE_URL}/readings/batch", json=readings)
+    print(f"Status: {response.status_code}")
+    if response.status_code in (201, 202, 207):
+        result = response.json()
+        # Mode write-behind mengembalikan 'queued' sebagai ganti 'inserted'
+        print(f"Berhasil: {result.get('inserted', result.get('queued'))}, Gagal: {result['failed']}")
+        for error in result['errors']:
+            print(f"- Item {error['index']}: {error['error']}")
+    print()
+
 def test_add_device():
     """Test menambah perangkat baru"""
     print("=== Testing POST /api/devices ===")
@@ -167,9 +215,12 @@ def run_all_tests():
         test_get_devices()
         test_get_device()
         test_get_sensor_readings()
+        test_get_downsampled_readings()
         test_get_device_readings()
         test_get_latest_reading()
+        test_get_all_latest_readings()
         test_add_reading()
+        test_add_readings_batch()
         test_add_device()
         test_get_stats()
         test_time_range_queries()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test API lewat Flask test client di atas memory store, berjalan tanpa MongoDB
+
+    python -m pytest test_app.py
+"""
+
+import os
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+# Konfigurasi harus ada sebelum app diimport
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ["INGEST_MODE"] = "write-through"
+os.environ["RETENTION_DAYS"] = "0"
+
+import app  # noqa: E402
+
+
+def reading(sensor_id, timestamp, value=20.0, device_id="dev001"):
+    return {"device_id": device_id, "sensor_id": sensor_id, "sensor_type": "temperature", "unit": "°C",
+            "timestamp": timestamp, "value": value}
+
+
+class AppTestCase(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        app.init_database(reset=True, devices=2, days=1, interval=300)
+
+    def setUp(self):
+        self.client = app.app.test_client()
+
+
+class KeysetPaginationTest(AppTestCase):
+    def page(self, **params):
+        response = self.client.get("/api/devices/dev001/readings", query_string=params)
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def test_cursor_walk_visits_every_reading_once(self):
+        seen = []
+        page = self.page(cursor="", per_page=50)
+        while True:
+            seen.extend((r["timestamp"], r["sensor_id"]) for r in page["data"])
+            if not page["next_cursor"]:
+                break
+            page = self.page(cursor=page["next_cursor"], per_page=50)
+        self.assertEqual(len(seen), len(set(seen)))
+        self.assertEqual(len(seen), app.db.sensor_readings.count_documents({"device_id": "dev001"}))
+
+    def test_prev_cursor_returns_the_previous_page(self):
+        first = self.page(cursor="", per_page=7)
+        self.assertIsNone(first["prev_cursor"])
+        second = self.page(cursor=first["next_cursor"], per_page=7)
+        back = self.page(cursor=second["prev_cursor"], per_page=7, direction="prev")
+        self.assertEqual(back["data"], first["data"])
+        self.assertEqual(back["next_cursor"], first["next_cursor"])
+
+    def test_malformed_cursor_is_rejected(self):
+        response = self.client.get("/api/devices/dev001/readings", query_string={"cursor": "bukan-cursor"})
+        self.assertEqual(response.status_code, 400)
+
+
+class DownsamplingTest(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.start = datetime.now() - timedelta(hours=12)
+        self.raw = list(app.db.sensor_readings.find(
+            {"sensor_id": "temp001", "timestamp": {"$gte": self.start}}, {"_id": 0}).sort("timestamp", 1))
+
+    def get(self, **params):
+        return self.client.get("/api/sensors/temp001/readings",
+                               query_string=dict(params, start_time=self.start.isoformat()))
+
+    def test_lttb_keeps_real_readings_and_the_endpoints(self):
+        points = self.get(max_points=20, mode="lttb").get_json()
+        self.assertEqual(len(points), 20)
+        self.assertEqual(points[0]["value"], self.raw[-1]["value"])
+        self.assertEqual(points[-1]["value"], self.raw[0]["value"])
+        self.assertTrue({p["value"] for p in points} <= {r["value"] for r in self.raw})
+
+    def test_buckets_account_for_every_reading(self):
+        points = self.get(max_points=10, mode="bucket").get_json()
+        self.assertLessEqual(len(points), 10)
+        self.assertEqual(sum(p["count"] for p in points), len(self.raw))
+        for p in points:
+            self.assertLessEqual(p["min"], p["value"])
+            self.assertLessEqual(p["value"], p["max"])
+
+    def test_invalid_parameters_are_rejected(self):
+        self.assertEqual(self.get(max_points=2).status_code, 400)
+        self.assertEqual(self.get(max_points=10, mode="median").status_code, 400)
+
+
+class WriteReadingsTest(AppTestCase):
+    def test_duplicates_on_a_retry_count_as_written(self):
+        readings = [reading("retry001", datetime(2026, 1, 1, 0, minute)) for minute in range(3)]
+        for r in readings:
+            r["_id"] = ObjectId()
+        # Percobaan pertama menyimpan sebagian batch sebelum koneksi putus
+        app.db.sensor_readings.insert_many([dict(r) for r in readings[:2]])
+        with mock.patch.object(app, "on_readings_written") as written:
+            with self.assertRaises(BulkWriteError):
+                app.write_readings([dict(r) for r in readings], retried=True)
+        self.assertEqual(len(written.call_args.args[0]), 3)
+
+    def test_duplicates_on_a_first_attempt_are_failures(self):
+        r = dict(reading("retry002", datetime(2026, 1, 1)), _id=ObjectId())
+        app.db.sensor_readings.insert_one(dict(r))
+        with mock.patch.object(app, "on_readings_written") as written:
+            with self.assertRaises(BulkWriteError):
+                app.write_readings([dict(r)])
+        self.assertEqual(written.call_args.args[0], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
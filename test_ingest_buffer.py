@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test buffer ingest write-behind, berjalan tanpa MongoDB
+
+    python -m pytest test_ingest_buffer.py
+"""
+
+import threading
+import unittest
+
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from ingest_buffer import IngestBuffer
+
+
+class RecordingWriter:
+    """write_fn that records batches and can fail the first attempts"""
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def __call__(self, batch, retried):
+        with self.lock:
+            self.calls.append((list(batch), retried))
+            if self.failures:
+                raise self.failures.pop(0)
+
+
+class IngestBufferTest(unittest.TestCase):
+    def test_flushes_full_batches_and_the_rest_on_stop(self):
+        writer = RecordingWriter()
+        buffer = IngestBuffer(writer, batch_size=2, flush_interval=60)
+        self.assertTrue(buffer.put([1, 2, 3]))
+        buffer.stop()
+        self.assertEqual(sorted(len(batch) for batch, _ in writer.calls), [1, 2])
+        self.assertEqual(buffer.pending(), 0)
+
+    def test_full_queue_refuses_after_timeout(self):
+        blocked = threading.Event()
+        release = threading.Event()
+
+        def slow(batch, retried):
+            blocked.set()
+            release.wait(5)
+
+        buffer = IngestBuffer(slow, batch_size=1, flush_interval=0.01, max_queue=2, put_timeout=0.05)
+        self.assertTrue(buffer.put([1]))
+        blocked.wait(5)
+        self.assertTrue(buffer.put([2, 3]))
+        self.assertFalse(buffer.put([4]))
+        release.set()
+        buffer.stop()
+
+    def test_oversized_batch_is_rejected(self):
+        buffer = IngestBuffer(RecordingWriter(), max_queue=2)
+        with self.assertRaises(ValueError):
+            buffer.put([1, 2, 3])
+
+    def test_transient_errors_are_retried_with_the_retry_flag(self):
+        writer = RecordingWriter([AutoReconnect("down")])
+        buffer = IngestBuffer(writer, batch_size=2, flush_interval=0.001, max_retries=2)
+        buffer.put([1, 2])
+        buffer.stop()
+        self.assertEqual([retried for _, retried in writer.calls], [False, True])
+        self.assertEqual(buffer.dropped, 0)
+
+    def test_exhausted_retries_go_to_dead_letters(self):
+        writer = RecordingWriter([AutoReconnect("down")] * 3)
+        buffer = IngestBuffer(writer, batch_size=2, flush_interval=0.001, max_retries=1)
+        buffer.put([1, 2])
+        buffer.stop()
+        self.assertEqual(buffer.dropped, 2)
+        self.assertEqual(len(buffer.dead_letters), 1)
+
+    def test_partial_bulk_failure_is_not_retried(self):
+        error = BulkWriteError({"writeErrors": [{"index": 0, "code": 121, "errmsg": "invalid"}], "nInserted": 1})
+        writer = RecordingWriter([error])
+        buffer = IngestBuffer(writer, batch_size=2, flush_interval=0.001)
+        buffer.put([1, 2])
+        buffer.stop()
+        self.assertEqual(len(writer.calls), 1)
+        self.assertEqual(buffer.dropped, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test gateway ingest line protocol di atas memory store, berjalan tanpa MongoDB
+
+    python -m pytest test_ingest_gateway.py
+"""
+
+import asyncio
+import unittest
+from datetime import datetime
+
+from ingest_gateway import Gateway, LineError, LineProtocol, Registry, parse_line
+from memory_store import MemoryDatabase
+
+LINE = b"dev001,temp001,temperature 25.4 \xc2\xb0C 1718000000000000000\n"
+
+
+class FakeTransport:
+    def __init__(self):
+        self.closed = False
+        self.reading = True
+
+    def close(self):
+        self.closed = True
+
+    def is_closing(self):
+        return self.closed
+
+    def pause_reading(self):
+        self.reading = False
+
+    def resume_reading(self):
+        self.reading = True
+
+
+class ParseLineTest(unittest.TestCase):
+    def test_epoch_precision(self):
+        reading = parse_line("dev001,temp001,temperature 25.4 °C 1718000000", "s")
+        self.assertEqual(reading["timestamp"], datetime.fromtimestamp(1718000000))
+        self.assertEqual((reading["value"], reading["unit"]), (25.4, "°C"))
+
+    def test_invalid_lines(self):
+        for line in ("dev001,temp001 25.4 °C", "dev001,temp001,temperature abc °C", "dev001,temp001,temperature nan °C",
+                     "dev001,temp001,temperature 25.4 °C kemarin"):
+            with self.assertRaises(LineError):
+                parse_line(line)
+
+
+class GatewayTestCase(unittest.TestCase):
+    def setUp(self):
+        self.db = MemoryDatabase()
+        self.db.devices.insert_one({"device_id": "dev001", "sensors": [
+            {"sensor_id": "temp001", "type": "temperature", "unit": "°C"}]})
+        registry = Registry(self.db)
+        registry.load()
+        self.gateway = Gateway(self.db, registry, batch_size=1000, max_line=64)
+
+    def tearDown(self):
+        self.gateway.executor.shutdown()
+
+
+class LineProtocolTest(GatewayTestCase):
+    def setUp(self):
+        super().setUp()
+        self.protocol = LineProtocol(self.gateway)
+        self.transport = FakeTransport()
+        self.protocol.connection_made(self.transport)
+
+    def test_lines_split_across_segments(self):
+        self.protocol.data_received(LINE[:20])
+        self.assertEqual(self.gateway.batch, [])
+        self.protocol.data_received(LINE[20:] + LINE[:5])
+        self.assertEqual(len(self.gateway.batch), 1)
+        self.assertEqual(self.protocol.buffer, LINE[:5])
+
+    def test_registry_mismatch_is_rejected(self):
+        self.protocol.data_received(b"dev001,temp001,humidity 40 % \ndev002,temp001,temperature 1 \xc2\xb0C\n")
+        self.assertEqual(self.gateway.stats["rejected"], 2)
+        self.assertEqual(self.gateway.batch, [])
+
+    def test_overlong_line_closes_the_connection(self):
+        self.protocol.data_received(b"x" * 65)
+        self.assertTrue(self.transport.closed)
+        self.assertEqual(self.protocol.buffer, b"")
+        self.assertEqual(self.gateway.stats["rejected"], 1)
+
+    def test_partial_line_is_dropped_on_disconnect(self):
+        self.protocol.data_received(LINE + LINE[:-1])
+        self.protocol.connection_lost(None)
+        self.assertEqual(len(self.gateway.batch), 1)
+        self.assertEqual(self.gateway.stats["dropped"], 1)
+
+
+class GatewayWriteTest(GatewayTestCase):
+    def test_drain_writes_the_batch(self):
+        async def run():
+            self.gateway.feed(LINE * 3)
+            await self.gateway.drain()
+
+        asyncio.run(run())
+        self.assertEqual(self.gateway.stats["written"], 3)
+        self.assertEqual(self.db.sensor_readings.count_documents({"sensor_id": "temp001"}), 3)
+        self.assertEqual(self.gateway.pending, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
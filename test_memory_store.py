@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test memory store (fallback tanpa MongoDB), berjalan tanpa server
+
+    python -m pytest test_memory_store.py
+"""
+
+import unittest
+from datetime import datetime, timedelta
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.operations import UpdateOne
+
+from memory_store import MemoryDatabase, update_requests
+
+
+def reading(minute, value=20.0, **fields):
+    return dict({"device_id": "dev001", "sensor_id": "temp001", "sensor_type": "temperature", "unit": "°C",
+                 "timestamp": datetime(2026, 1, 1) + timedelta(minutes=minute), "value": value}, **fields)
+
+
+class BulkWriteTest(unittest.TestCase):
+    def setUp(self):
+        self.collection = MemoryDatabase().sensor_rollups
+
+    def test_tuples_and_dicts_upsert(self):
+        self.collection.bulk_write([
+            ({"_id": "a"}, {"$inc": {"count": 1}}, True),
+            {"filter": {"_id": "a"}, "update": {"$inc": {"count": 2}}, "upsert": True},
+            ({"_id": "b"}, {"$inc": {"count": 1}}),
+        ])
+        self.assertEqual(self.collection.find_one({"_id": "a"})["count"], 3)
+        # Tanpa upsert dokumen yang belum ada tidak dibuat
+        self.assertIsNone(self.collection.find_one({"_id": "b"}))
+
+    def test_write_models_are_rejected(self):
+        with self.assertRaises(TypeError):
+            self.collection.bulk_write([UpdateOne({"_id": "a"}, {"$inc": {"count": 1}}, upsert=True)])
+
+    def test_update_requests_match_the_collection(self):
+        specs = [({"_id": "a"}, {"$set": {"x": 1}}, True)]
+        self.assertEqual(update_requests(self.collection, specs), specs)
+        self.assertIsInstance(update_requests(object(), specs)[0], UpdateOne)
+
+    def test_conflicting_upsert_reports_write_error(self):
+        self.collection.create_index([("sensor_id", 1)], unique=True)
+        self.collection.insert_one({"_id": "a", "sensor_id": "temp001"})
+        with self.assertRaises(BulkWriteError) as raised:
+            self.collection.bulk_write([
+                ({"_id": "b"}, {"$set": {"sensor_id": "temp001"}}, True),
+                ({"_id": "c"}, {"$set": {"sensor_id": "temp002"}}, True),
+            ], ordered=False)
+        self.assertEqual([e["index"] for e in raised.exception.details["writeErrors"]], [0])
+        self.assertIsNotNone(self.collection.find_one({"_id": "c"}))
+
+
+class ReadingsCollectionTest(unittest.TestCase):
+    def setUp(self):
+        self.readings = MemoryDatabase().sensor_readings
+
+    def test_duplicate_id_raises_e11000(self):
+        self.readings.insert_one(reading(0, _id="r0"))
+        with self.assertRaises(DuplicateKeyError):
+            self.readings.insert_one(reading(1, _id="r0"))
+
+    def test_unordered_insert_keeps_the_rest_of_the_batch(self):
+        self.readings.insert_one(reading(0, _id="r0"))
+        with self.assertRaises(BulkWriteError) as raised:
+            self.readings.insert_many([reading(1, _id="r1"), reading(2, _id="r0"), reading(3, _id="r3")],
+                                      ordered=False)
+        errors = raised.exception.details["writeErrors"]
+        self.assertEqual([(e["index"], e["code"]) for e in errors], [(1, 11000)])
+        self.assertEqual(self.readings.count_documents({}), 3)
+
+    def test_deleted_ids_can_be_reused(self):
+        self.readings.insert_one(reading(0, _id="r0"))
+        self.readings.delete_many({"sensor_id": "temp001"})
+        self.readings.insert_one(reading(0, _id="r0"))
+        self.assertEqual(self.readings.count_documents({}), 1)
+
+    def test_time_range_and_order(self):
+        self.readings.insert_many([reading(minute, float(minute)) for minute in (5, 1, 3)])
+        query = {"sensor_id": "temp001", "timestamp": {"$gte": reading(2)["timestamp"]}}
+        values = [r["value"] for r in self.readings.find(query).sort("timestamp", -1)]
+        self.assertEqual(values, [5.0, 3.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
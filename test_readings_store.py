@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test layout time-series terhadap MongoDB sungguhan
+Dilewati otomatis jika tidak ada server di MONGO_URI (default localhost:27017).
+
+    python -m pytest test_readings_store.py
+"""
+
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure, PyMongoError
+
+from readings_store import TIMESERIES_DELETE_VERSION, configure_readings_storage
+from retention import Retention
+
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
+
+
+def _connect():
+    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        client.close()
+        return None
+    return client
+
+
+CLIENT = _connect()
+
+
+@unittest.skipIf(CLIENT is None, f"MongoDB tidak tersedia di {MONGO_URI}")
+class TimeSeriesReadingsTest(unittest.TestCase):
+    def setUp(self):
+        self.db_name = f"iot_monitoring_test_{os.getpid()}"
+        self.db = configure_readings_storage(CLIENT[self.db_name], "timeseries")
+        self.readings = self.db.sensor_readings
+        now = datetime.now().replace(microsecond=0)
+        self.old = now - timedelta(days=3)
+        self.readings.insert_many([
+            {"device_id": "dev001", "sensor_id": "temp001", "sensor_type": "temperature", "unit": "°C",
+             "timestamp": timestamp, "value": 20.0 + i}
+            for i, timestamp in enumerate((self.old, now))
+        ])
+
+    def tearDown(self):
+        CLIENT.drop_database(self.db_name)
+
+    def test_readings_keep_their_flat_shape(self):
+        reading = self.readings.find_one({"sensor_id": "temp001"}, {"_id": 0})
+        self.assertEqual(reading["device_id"], "dev001")
+        self.assertNotIn("meta", reading)
+
+    def test_estimated_count_matches_measurements(self):
+        self.assertEqual(self.readings.estimated_document_count(), 2)
+
+    def test_delete_by_timestamp_needs_mongodb_7(self):
+        query = {"device_id": "dev001", "timestamp": {"$lt": self.old + timedelta(days=1)}}
+        if self.readings.server_version() >= TIMESERIES_DELETE_VERSION:
+            self.assertEqual(self.readings.delete_many(query).deleted_count, 1)
+        else:
+            with self.assertRaises(OperationFailure):
+                self.readings.delete_many(query)
+
+    def test_retention_falls_back_to_ttl_before_mongodb_7(self):
+        with tempfile.TemporaryDirectory() as archive_dir:
+            retention = Retention(self.db, 1, archive_dir, "delete")
+            expected = "delete" if self.readings.supports_time_deletes() else "ttl"
+            self.assertEqual(retention.mode, expected)
+            summary = retention.run()
+            self.assertEqual(summary["archived"], 1)
+            if expected == "delete":
+                self.assertEqual(self.readings.count_documents({}), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
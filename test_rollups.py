@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test rollup dan penanda cakupannya di atas memory store, berjalan tanpa MongoDB
+
+    python -m pytest test_rollups.py
+"""
+
+import unittest
+from datetime import datetime, timedelta
+
+from memory_store import MemoryDatabase
+from rollups import Rollups, split_window
+
+START = datetime(2026, 1, 1)
+
+
+def readings(count, step=timedelta(minutes=7)):
+    return [{"device_id": "dev001", "sensor_id": "temp001", "sensor_type": "temperature", "unit": "°C",
+             "timestamp": START + i * step, "value": float(i % 13)} for i in range(count)]
+
+
+class SplitWindowTest(unittest.TestCase):
+    def test_ranges_tile_the_window(self):
+        start, end = datetime(2026, 1, 1, 22, 30, 15), datetime(2026, 1, 3, 1, 5)
+        ranges, raw = split_window(start, end)
+        pieces = sorted([(s, e) for _, s, e in ranges] + raw)
+        self.assertEqual(pieces[0][0], start)
+        self.assertEqual(pieces[-1][1], end)
+        for (_, previous_end), (next_start, _) in zip(pieces, pieces[1:]):
+            self.assertEqual(previous_end, next_start)
+        self.assertIn(("1d", datetime(2026, 1, 2), datetime(2026, 1, 3)), ranges)
+
+
+class CoverageTest(unittest.TestCase):
+    def setUp(self):
+        self.db = MemoryDatabase()
+        self.rollups = Rollups(self.db)
+
+    def test_empty_storage_is_fully_covered(self):
+        self.rollups.ensure_coverage()
+        self.assertTrue(self.rollups.covers(None))
+        self.assertTrue(self.rollups.covers(START))
+
+    def test_existing_readings_are_covered_only_after_now(self):
+        self.db.sensor_readings.insert_many(readings(3))
+        self.rollups.ensure_coverage()
+        self.assertFalse(self.rollups.covers(None))
+        self.assertFalse(self.rollups.covers(START))
+        self.assertTrue(self.rollups.covers(datetime.now() + timedelta(minutes=2)))
+
+    def test_invalidate_then_rebuild(self):
+        self.rollups.mark_covered()
+        self.rollups.invalidate()
+        self.assertFalse(self.rollups.covers(None))
+        # ensure_coverage tidak menimpa penanda yang sudah ada
+        self.rollups.mark_covered(START)
+        self.rollups.ensure_coverage()
+        self.assertEqual(self.rollups.coverage(), START)
+        self.db.sensor_readings.insert_many(readings(3))
+        self.assertEqual(self.rollups.rebuild(), 3)
+        self.assertTrue(self.rollups.covers(None))
+
+
+class SensorStatsTest(unittest.TestCase):
+    def setUp(self):
+        self.db = MemoryDatabase()
+        self.rollups = Rollups(self.db)
+        self.data = readings(800)
+        self.db.sensor_readings.insert_many([dict(r) for r in self.data])
+        self.rollups.record(self.data)
+
+    def raw_stats(self, start, end):
+        values = [r["value"] for r in self.data if start <= r["timestamp"] < end]
+        mean = sum(values) / len(values)
+        return len(values), mean, min(values), max(values)
+
+    def test_unaligned_window_matches_raw_readings(self):
+        start, end = START + timedelta(hours=5, minutes=13), START + timedelta(days=3, hours=2, minutes=41)
+        stats = self.rollups.sensor_stats("dev001", "temp001", start, end)
+        count, mean, low, high = self.raw_stats(start, end)
+        self.assertEqual(stats["count"], count)
+        self.assertAlmostEqual(stats["avg"], mean)
+        self.assertEqual((stats["min"], stats["max"]), (low, high))
+
+    def test_whole_range_uses_daily_rollups(self):
+        stats = self.rollups.sensor_stats("dev001", "temp001")
+        self.assertEqual(stats["count"], len(self.data))
+
+    def test_max_by_device_only_lists_devices_above_threshold(self):
+        result = self.rollups.max_by_device("temperature", 11.5)
+        self.assertEqual(result, [{"_id": "dev001", "max_value": 12.0}])
+        self.assertEqual(self.rollups.max_by_device("temperature", 12.0), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
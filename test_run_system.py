@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test supervisor pre-fork run_system.py tanpa menjalankan worker sungguhan
+
+    python -m pytest test_run_system.py
+"""
+
+import os
+import signal
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from run_system import CONFIG_ERROR_EXIT, PreforkServer
+
+
+class MemoryBackendTest(unittest.TestCase):
+    def test_several_workers_are_refused_before_binding(self):
+        server = PreforkServer(bind="127.0.0.1:0", workers=2)
+        with mock.patch.dict(os.environ, {"STORAGE_BACKEND": "memory"}):
+            self.assertEqual(server.run(), CONFIG_ERROR_EXIT)
+        self.assertIsNone(server.socket)
+
+
+class HeartbeatTest(unittest.TestCase):
+    def setUp(self):
+        self.server = PreforkServer(workers=1, timeout=5, startup_timeout=20)
+        fd, self.heartbeat = tempfile.mkstemp(prefix="iot-worker-test-")
+        os.close(fd)
+        self.server.children[12345] = (0, self.heartbeat)
+        self.server.spawned[12345] = time.time()
+
+    def tearDown(self):
+        os.unlink(self.heartbeat)
+
+    def check(self):
+        with mock.patch.object(self.server, "kill") as kill:
+            self.server.check_heartbeats()
+        return kill
+
+    def test_starting_worker_gets_the_startup_grace(self):
+        # Heartbeat kosong yang mtime-nya lama tetap dinilai dari waktu spawn
+        os.utime(self.heartbeat, (time.time() - 60, time.time() - 60))
+        self.check().assert_not_called()
+        self.server.spawned[12345] -= 21
+        self.check().assert_called_once_with(12345, signal.SIGKILL)
+
+    def test_ready_worker_is_judged_by_its_heartbeat(self):
+        with open(self.heartbeat, "w") as f:
+            f.write("ready")
+        self.check().assert_not_called()
+        os.utime(self.heartbeat, (time.time() - 6, time.time() - 6))
+        self.check().assert_called_once_with(12345, signal.SIGKILL)
+
+
+class ReapTest(unittest.TestCase):
+    def test_config_error_exit_stops_the_master(self):
+        server = PreforkServer(workers=1)
+        fd, heartbeat = tempfile.mkstemp(prefix="iot-worker-test-")
+        os.close(fd)
+        pid = os.fork()
+        if pid == 0:
+            os._exit(CONFIG_ERROR_EXIT)
+        server.children[pid] = (0, heartbeat)
+        deadline = time.monotonic() + 5
+        while pid in server.children and time.monotonic() < deadline:
+            server.reap()
+            time.sleep(0.01)
+        self.assertTrue(server.stop_requested)
+        self.assertEqual(server.exit_code, CONFIG_ERROR_EXIT)
+        self.assertFalse(os.path.exists(heartbeat))
+
+
+if __name__ == "__main__":
+    unittest.main()